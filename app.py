@@ -1,178 +1,102 @@
-from flask import Flask, render_template, Response, request, flash, redirect, url_for
-from models import db, Attendee
+from flask import Flask, current_app, render_template, Response, request, flash, redirect, url_for, abort, stream_with_context
+from functools import partial
+from sqlalchemy import case, func, or_
+from models import db, Attendee, configure_sqlite, init_db
+from checkin import atomic_checkin, BAND_IN_USE, NOT_ELIGIBLE
+from checkin_journal import CheckinJournal, locking_available
+from attendee_cache import AttendeeCache, snapshot_of
 from config import Config
-import cv2
+from events import EventHub
+from stats import AttendanceStats
+import export_attendees
+from gates import Gate, make_state_store, parse_gates
+import metrics
+import atexit
 import logging
-import numpy as np
+import re
+import threading
 import time
 
-# Configure logging first
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# --- GLOBAL VARIABLES ---
-PYZBAR_AVAILABLE = False
-
-# Try to import pyzbar, but don't fail if it's not available
-try:
-    from pyzbar import pyzbar
-    PYZBAR_AVAILABLE = True
-    logging.info("pyzbar library loaded successfully")
-except ImportError as e:
-    PYZBAR_AVAILABLE = False
-    logging.warning(f"pyzbar not available: {e}. Using OpenCV only for QR detection.")
-
 # --- APPLICATION SETUP ---
-app = Flask(__name__)
-app.config.from_object(Config)
-db.init_app(app)
+# Worker roles and what they serve; see create_app() and ROUTES at the end of this file
+ROLES = ('scanner', 'dashboard', 'api')
 
-# --- QR CODE DETECTORS ---
-cv_qr_decoder = cv2.QRCodeDetector()
+# Set by create_app(): one application (and one set of gates, caches and
+# counters) per process, as the module-level helpers below expect
+app = None
+attendee_cache = None
+event_hub = None
+attendance_stats = None
+gate_store = None
+GATES = {}
+DEFAULT_GATE_ID = None
 
 # --- STATE MANAGEMENT ---
-STATE_WAITING_FOR_BARCODE = False
-STATE_CURRENT_ATTENDEE_ID = None
-STATE_FROZEN_FRAME = None
-STATE_LAST_QR_TIME = 0
+# Scan state is kept per gate (see gates.py); this is the shared cooldown
 STATE_QR_COOLDOWN = 2.0  # Seconds to wait before detecting new QR
-camera = None
-
-def get_camera():
-    global camera
-    if camera is None:
-        camera = cv2.VideoCapture(0)
-        if not camera.isOpened():
-            logging.error("Error: Could not open camera.")
-            camera = None
-        else:
-            # Set camera properties for better performance
-            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            camera.set(cv2.CAP_PROP_FPS, 30)
-            # Additional settings for better QR detection
-            try:
-                camera.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)
-                camera.set(cv2.CAP_PROP_EXPOSURE, -6)
-            except:
-                pass  # Some cameras don't support these settings
-    return camera
-
-def detect_qr_code_opencv(frame):
-    """Detect QR codes using OpenCV with multiple preprocessing methods"""
-    try:
-        # Method 1: Try on original frame
-        data, bbox, _ = cv_qr_decoder.detectAndDecode(frame)
-        if data and bbox is not None:
-            return data, bbox
-        
-        # Method 2: Convert to grayscale
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        data, bbox, _ = cv_qr_decoder.detectAndDecode(gray_frame)
-        if data and bbox is not None:
-            return data, bbox
-        
-        # Method 3: Apply preprocessing
-        blurred = cv2.GaussianBlur(gray_frame, (3, 3), 0)
-        
-        # Try different threshold methods
-        threshold_methods = [
-            cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2),
-            cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 15, 4),
-            cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        ]
-        
-        for thresh_frame in threshold_methods:
-            data, bbox, _ = cv_qr_decoder.detectAndDecode(thresh_frame)
-            if data and bbox is not None:
-                return data, bbox
-                
-        # Method 4: Morphological operations
-        kernel = np.ones((3, 3), np.uint8)
-        morph_frame = cv2.morphologyEx(gray_frame, cv2.MORPH_CLOSE, kernel)
-        data, bbox, _ = cv_qr_decoder.detectAndDecode(morph_frame)
-        if data and bbox is not None:
-            return data, bbox
-            
-        # Method 5: Contrast and brightness adjustments
-        for alpha in [0.7, 1.3, 1.5]:  # contrast
-            for beta in [-20, 0, 20, 40]:  # brightness
-                adjusted = cv2.convertScaleAbs(gray_frame, alpha=alpha, beta=beta)
-                data, bbox, _ = cv_qr_decoder.detectAndDecode(adjusted)
-                if data and bbox is not None:
-                    return data, bbox
-                    
-    except Exception as e:
-        logging.error(f"Error in OpenCV QR detection: {e}")
-        
-    return None, None
 
-def detect_qr_code_pyzbar(frame):
-    """Detect QR codes using pyzbar library as fallback"""
-    global PYZBAR_AVAILABLE
-    
-    if not PYZBAR_AVAILABLE:
-        return None, None
-        
-    try:
-        # Convert to grayscale for pyzbar
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Try pyzbar detection
-        qr_codes = pyzbar.decode(gray_frame)
-        if qr_codes:
-            # Return the first QR code found
-            qr_code = qr_codes[0]
-            data = qr_code.data.decode('utf-8')
-            # Convert pyzbar rect to OpenCV bbox format
-            rect = qr_code.rect
-            bbox = np.array([[[rect.left, rect.top],
-                            [rect.left + rect.width, rect.top],
-                            [rect.left + rect.width, rect.top + rect.height],
-                            [rect.left, rect.top + rect.height]]], dtype=np.float32)
-            return data, bbox
-            
-        # Try with preprocessing for pyzbar
-        blurred = cv2.GaussianBlur(gray_frame, (3, 3), 0)
-        qr_codes = pyzbar.decode(blurred)
-        if qr_codes:
-            qr_code = qr_codes[0]
-            data = qr_code.data.decode('utf-8')
-            rect = qr_code.rect
-            bbox = np.array([[[rect.left, rect.top],
-                            [rect.left + rect.width, rect.top],
-                            [rect.left + rect.width, rect.top + rect.height],
-                            [rect.left, rect.top + rect.height]]], dtype=np.float32)
-            return data, bbox
-            
-    except Exception as e:
-        logging.error(f"Error in pyzbar QR detection: {e}")
-        
-    return None, None
+# --- VISION STACK ---
+_vision = None
+_vision_lock = threading.Lock()
 
-def detect_qr_code(frame):
+def get_vision():
     """
-    Comprehensive QR code detection using multiple methods
-    Returns the decoded data, bbox, and processed frame
+    The QR detection module (vision.py), imported on first use so that only
+    workers that actually stream video load OpenCV and pyzbar
     """
-    global PYZBAR_AVAILABLE
-    
-    # Try OpenCV first (faster)
-    data, bbox = detect_qr_code_opencv(frame)
-    if data and bbox is not None:
-        logging.info(f"QR Code detected (OpenCV): '{data}'")
-        return data, bbox, frame
-    
-    # Try pyzbar as fallback if available
-    if PYZBAR_AVAILABLE:
-        data, bbox = detect_qr_code_pyzbar(frame)
-        if data and bbox is not None:
-            logging.info(f"QR Code detected (pyzbar): '{data}'")
-            return data, bbox, frame
-        
-    return None, None, frame
+    global _vision
+    if _vision is None:
+        with _vision_lock:
+            if _vision is None:
+                started = time.perf_counter()
+                import vision
+                vision.configure(app.config)
+                logging.info(f"Vision stack loaded in {time.perf_counter() - started:.2f}s")
+                _vision = vision
+    return _vision
 
-def verify_qr_code(qr_data):
-    """Verify QR code format and return attendee if valid"""
+def get_camera(gate=None):
+    """
+    Open (once) and return the frame source of a gate - its camera, or the
+    FRAME_SOURCE override - or None if it is not available
+    """
+    gate = gate or get_gate()
+    if gate.camera is None:
+        from frame_sources import open_frame_source
+        spec = app.config['FRAME_SOURCE'] or gate.source
+        camera = open_frame_source(spec, app.config['CAMERA_WIDTH'], app.config['CAMERA_HEIGHT'],
+                                   app.config['FRAME_SOURCE_FPS'] or app.config['CAMERA_FPS'])
+        if camera is None:
+            logging.error(f"Error: Could not open frame source {spec} for gate {gate.id}.")
+            return None
+        gate.camera = camera
+    return gate.camera
+
+# --- GATES ---
+def get_gate(gate_id=None):
+    """Return the Gate for gate_id (the default gate if None); 404 for unknown gates"""
+    gate = GATES.get(gate_id or DEFAULT_GATE_ID)
+    if gate is None:
+        abort(404, description=f"Unknown gate: {gate_id}")
+    return gate
+
+# --- ATTENDEE LOOKUPS ---
+def load_attendee(attendee_id):
+    """Cache loader: fetch one attendee by id as a snapshot"""
+    with metrics.DB_SECONDS.time(op="load_attendee"):
+        return snapshot_of(Attendee.query.get(attendee_id))
+
+def load_attendee_by_band(band_id):
+    """Cache loader: fetch the attendee holding band_id as a snapshot"""
+    with metrics.DB_SECONDS.time(op="load_attendee_by_band"):
+        return snapshot_of(Attendee.query.filter_by(band_id=band_id).first())
+
+def get_attendee(attendee_id):
+    """Return the AttendeeSnapshot for attendee_id (None if unknown), served from the cache"""
+    return attendee_cache.get_by_id(attendee_id, load_attendee)
+
+def parse_qr_attendee_id(qr_data):
+    """Extract the attendee ID from a QR payload; returns None if the format is invalid"""
     if not qr_data:
         logging.warning("Empty QR code data")
         return None
@@ -198,7 +122,6 @@ def verify_qr_code(qr_data):
             attendee_id = int(parts[-1].strip())
         else:
             # Try to extract numbers from the string
-            import re
             numbers = re.findall(r'\d+', qr_string)
             if numbers:
                 attendee_id = int(numbers[-1])  # Take the last number found
@@ -207,41 +130,230 @@ def verify_qr_code(qr_data):
                 return None
                 
         logging.info(f"Extracted attendee ID: {attendee_id}")
-        attendee = Attendee.query.get(attendee_id)
-        if attendee:
-            logging.info(f"Found attendee: {attendee.first_name} {attendee.last_name}")
-        else:
-            logging.warning(f"No attendee found with ID: {attendee_id}")
-        return attendee
+        return attendee_id
         
     except (ValueError, IndexError) as e:
         logging.warning(f"Invalid QR code format: '{qr_string}'. Error: {e}")
         return None
 
-def process_qr_result(attendee, qr_data):
-    """Process the QR scan result and update state accordingly"""
-    global STATE_WAITING_FOR_BARCODE, STATE_CURRENT_ATTENDEE_ID, STATE_LAST_QR_TIME
-    
+def verify_qr_code(qr_data):
+    """Verify QR code format and return attendee if valid"""
+    attendee_id = parse_qr_attendee_id(qr_data)
+    if attendee_id is None:
+        return None
+        
+    with metrics.DB_SECONDS.time(op="verify_qr_code"):
+        attendee = get_attendee(attendee_id)
+    if attendee:
+        logging.info(f"Found attendee: {attendee.first_name} {attendee.last_name}")
+    else:
+        logging.warning(f"No attendee found with ID: {attendee_id}")
+    return attendee
+
+def load_attendees(attendee_ids):
+    """Cache loader: fetch many attendees in one query, as {id: snapshot}"""
+    with metrics.DB_SECONDS.time(op="load_attendees"):
+        attendees = Attendee.query.filter(Attendee.id.in_(attendee_ids)).all()
+    return {attendee.id: snapshot_of(attendee) for attendee in attendees}
+
+# --- LIVE DASHBOARD EVENTS ---
+# LIVE_EVENTS=local: the stats and dashboard events come from this process's
+# own check-ins (record_checkin). LIVE_EVENTS=db: from a poll of the
+# checkin_events table, which sees the check-ins of every worker
+_stats_load_lock = threading.Lock()
+_checkin_poller = None
+
+def live_events_from_db():
+    return app.config['LIVE_EVENTS'] == 'db'
+
+def get_attendance_stats():
+    """
+    The attendance counters, (re)loaded from the database on first use and
+    every STATS_RELOAD_INTERVAL seconds; with LIVE_EVENTS=db this also starts
+    the check-in poller
+    """
+    global _checkin_poller
+    interval = app.config['STATS_RELOAD_INTERVAL']
+    loaded_at = attendance_stats.loaded_at
+    if loaded_at is None or (interval > 0 and time.time() - loaded_at >= interval):
+        with _stats_load_lock:
+            if attendance_stats.loaded_at == loaded_at:
+                with metrics.DB_SECONDS.time(op="stats_load"):
+                    attendance_stats.load()
+            if live_events_from_db() and _checkin_poller is None:
+                _checkin_poller = threading.Thread(target=_poll_checkins_forever, name="checkin-poller",
+                                                   args=(app, app.config['CHECKIN_POLL_INTERVAL']), daemon=True)
+                _checkin_poller.start()
+    return attendance_stats
+
+def publish_checkin(attendee, gate_id, band_id=None):
+    """Tell connected dashboards the attendee is now present"""
+    event_hub.publish("checkin", {"id": attendee.id, "first_name": attendee.first_name,
+                                  "last_name": attendee.last_name, "institute": attendee.institute,
+                                  "band_id": band_id or attendee.band_id, "gate": gate_id})
+
+def record_checkin(attendee, gate_id):
+    """
+    Count a check-in (attendee snapshot, after check-in) in the attendance
+    stats and tell connected dashboards; with LIVE_EVENTS=db the poller
+    does both once the check-in is committed
+    """
+    if live_events_from_db():
+        return
+    attendance_stats.record_checkin(attendee.institute, gate_id)
+    publish_checkin(attendee, gate_id)
+
+def poll_checkins():
+    """Count and publish the check-ins committed by any worker since the last poll (needs an app context)"""
+    with _stats_load_lock:
+        with metrics.DB_SECONDS.time(op="poll_checkins"):
+            counted = attendance_stats.poll_events()
+    for event, attendee in counted:
+        publish_checkin(attendee, event.gate, event.band_id)
+    return len(counted)
+
+def _poll_checkins_forever(poll_app, interval):
+    # Runs until create_app() replaces the app this poller was started for
+    while True:
+        time.sleep(interval)
+        if app is not poll_app:
+            return
+        try:
+            with poll_app.app_context():
+                poll_checkins()
+        except Exception as e:
+            logging.error(f"Error polling check-ins: {e}")
+
+# --- WRITE-BEHIND CHECK-IN ---
+def journal_failed(entry, result):
+    """
+    A journaled check-in the database rejected (band in use, or the attendee
+    checked in elsewhere first): forget what the cache was told at
+    acknowledgement, and take back the count and dashboard update made then
+    """
+    metrics.CHECKINS.inc(result=f"journal_{result}")
+    attendee_cache.invalidate(attendee_id=entry["attendee_id"], band_id=entry["band_id"])
+    if live_events_from_db():
+        return  # Nothing was counted at acknowledgement
+    with app.app_context():
+        attendee = get_attendee(entry["attendee_id"])
+    if attendee:
+        attendance_stats.record_reverted(attendee.institute, entry.get("gate"), entry.get("ts"))
+    # The attendee may still be present, checked in by another gate
+    present = bool(attendee and attendee.entry)
+    event_hub.publish("checkin_reverted", {"id": entry["attendee_id"], "band_id": entry["band_id"], "present": present,
+                                           "current_band_id": attendee.band_id if present else None})
+
+checkin_journal = None
+_checkin_journal_lock = threading.Lock()
+
+def get_checkin_journal():
+    """
+    The write-behind journal, started (and crashed journals replayed) on first
+    use; None unless CHECKIN_WRITE_BEHIND is on
+    """
+    global checkin_journal
+    if not app.config['CHECKIN_WRITE_BEHIND']:
+        return None
+    with _checkin_journal_lock:
+        if checkin_journal is None:
+            journal = CheckinJournal(
+                app, app.config['CHECKIN_JOURNAL_DIR'],
+                batch_size=app.config['CHECKIN_JOURNAL_BATCH'],
+                flush_interval=app.config['CHECKIN_JOURNAL_FLUSH_INTERVAL'],
+                fsync=app.config['CHECKIN_JOURNAL_FSYNC'],
+                on_failed=journal_failed,
+            )
+            journal.start()
+            atexit.register(journal.stop)
+            checkin_journal = journal
+        return checkin_journal
+
+def checkin_batch(items):
+    """
+    Verify and check in a batch of {"qr_payload", "band_id"} items in one transaction
+    Every item is verified with the same QR parsing as the camera path; all
+    attendees are loaded with a single query (or from the cache), each
+    check-in runs in its own savepoint, and the batch is committed once
+    Returns one result dict per item, in order
+    """
+    results = []
+    pending = []  # (result, attendee_id, band_id) for items that passed parsing
+    seen_bands, seen_ids = set(), set()
+
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        qr_payload = item.get("qr_payload")
+        band_id = str(item.get("band_id") or "").strip()
+        result = {"index": index, "qr_payload": qr_payload, "band_id": band_id, "attendee_id": None}
+        results.append(result)
+
+        attendee_id = parse_qr_attendee_id(qr_payload)
+        if attendee_id is None:
+            result.update(status="invalid_qr", message="QR Code Not Recognized")
+        elif not band_id:
+            result.update(status="invalid_band", message="Barcode cannot be empty.")
+        elif attendee_id in seen_ids or band_id in seen_bands:
+            result.update(status="duplicate_in_batch", message="Attendee or barcode repeated in this batch")
+        else:
+            seen_ids.add(attendee_id)
+            seen_bands.add(band_id)
+            pending.append((result, attendee_id, band_id))
+        result["attendee_id"] = attendee_id
+
+    attendees = attendee_cache.get_many_by_id([attendee_id for _, attendee_id, _ in pending], load_attendees)
+
+    checked_in = []
+    for result, attendee_id, band_id in pending:
+        attendee = attendees.get(attendee_id)
+        if not attendee:
+            result.update(status="not_found", message="Attendee not found.")
+            continue
+        name = f"{attendee.first_name} {attendee.last_name}"
+        if attendee.entry:
+            result.update(status="already_checked_in", message=f"{name} is already checked in.")
+            continue
+        status = atomic_checkin(attendee_id, band_id, commit=False, gate="api")
+        if status == BAND_IN_USE:
+            result.update(status=status, message="Barcode already assigned.")
+        elif status == NOT_ELIGIBLE:
+            result.update(status="already_checked_in", message=f"{name} is already checked in.")
+            attendee_cache.invalidate(attendee_id=attendee_id)
+        else:
+            result.update(status=status, message=f"{name} is checked in.")
+            checked_in.append(attendee._replace(band_id=band_id, entry=True))
+
+    with metrics.DB_SECONDS.time(op="checkin_batch_commit"):
+        db.session.commit()
+    for snapshot in checked_in:
+        attendee_cache.put(snapshot)
+        record_checkin(snapshot, "api")
+    for result in results:
+        metrics.CHECKINS.inc(result=result["status"])
+    logging.info(f"Batch check-in: {len(checked_in)} of {len(results)} items checked in")
+    return results
+
+def process_qr_result(gate, attendee, qr_data):
+    """Process the QR scan result and update the gate's state accordingly"""
     # Don't freeze frame here - will be done after drawing info
-    STATE_LAST_QR_TIME = time.time()
-    
     if not attendee:
+        gate.update(last_qr_time=time.time())
         return {"status": "Error", "message": "QR Code Not Recognized", "details": f"Data: {qr_data}"}
     
     if attendee.entry:
+        gate.update(last_qr_time=time.time())
         return {"status": "Warning", "message": "Already Checked In", "details": f"{attendee.first_name} {attendee.last_name}"}
     
     # Valid attendee, not yet checked in
-    STATE_WAITING_FOR_BARCODE = True
-    STATE_CURRENT_ATTENDEE_ID = attendee.id
+    gate.update(last_qr_time=time.time(), waiting_for_barcode=True, current_attendee_id=attendee.id)
     return {"status": "Success", "message": "QR Verified - Enter Barcode", "details": f"{attendee.first_name} {attendee.last_name}"}
 
-def get_display_info():
-    """Get current display information based on state"""
-    global STATE_WAITING_FOR_BARCODE, STATE_CURRENT_ATTENDEE_ID
+def get_display_info(gate):
+    """Get current display information based on the gate's state"""
+    state = gate.state()
     
-    if STATE_WAITING_FOR_BARCODE and STATE_CURRENT_ATTENDEE_ID:
-        attendee = Attendee.query.get(STATE_CURRENT_ATTENDEE_ID)
+    if state.waiting_for_barcode and state.current_attendee_id:
+        attendee = get_attendee(state.current_attendee_id)
         if attendee:
             return {
                 "status": "Success", 
@@ -251,209 +363,471 @@ def get_display_info():
     
     return {"status": "Info", "message": "Please Scan QR Code", "details": ""}
 
-def link_barcode(barcode_value):
-    """Link barcode to current attendee and check them in"""
-    global STATE_CURRENT_ATTENDEE_ID
+def link_barcode(gate, barcode_value):
+    """Link barcode to the gate's current attendee and check them in"""
+    # Read the shared state directly: the QR may have been scanned by another worker
+    current_attendee_id = gate.store.get(gate.id).current_attendee_id
     
-    if not STATE_CURRENT_ATTENDEE_ID:
+    if not current_attendee_id:
         flash("Error: No attendee selected. Please scan QR code first.", "error")
+        metrics.CHECKINS.inc(result="no_attendee_selected")
         return
         
-    attendee = Attendee.query.get(STATE_CURRENT_ATTENDEE_ID)
+    # Usually a cache hit: the attendee was loaded when their QR code was verified
+    attendee = get_attendee(current_attendee_id)
     if not attendee:
         flash("Error: Attendee not found.", "error")
-        reset_state()
+        metrics.CHECKINS.inc(result="attendee_not_found")
+        reset_state(gate)
         return
 
-    # Check if barcode already exists
-    existing_attendee = Attendee.query.filter_by(band_id=barcode_value).first()
+    # Check if barcode already exists; bands the cache does not know about are
+    # caught by the unique constraint on commit instead of a separate query
+    existing_attendee = attendee_cache.cached_band_holder(barcode_value)
     if existing_attendee:
         flash(f"Error: Barcode already assigned to {existing_attendee.first_name} {existing_attendee.last_name}.", "error")
-        reset_state()
+        metrics.CHECKINS.inc(result="barcode_in_use")
+        reset_state(gate)
         return
 
-    # Link barcode and check in
-    attendee.band_id = barcode_value
-    attendee.entry = True 
-    db.session.commit()
-    flash(f"Success! {attendee.first_name} {attendee.last_name} is checked in.", "success")
-    logging.info(f"Checked in: {attendee.first_name} {attendee.last_name} with barcode: {barcode_value}")
-    reset_state()
-
-def draw_qr_detection_box(frame, bbox):
-    """Draw a box around detected QR code"""
-    if bbox is not None:
-        bbox = bbox.astype(int)
-        cv2.polylines(frame, [bbox], True, (0, 255, 0), 3)
-    return frame
-
-def generate_frames():
-    """Generate video frames with QR code detection"""
-    global STATE_FROZEN_FRAME, STATE_WAITING_FOR_BARCODE, STATE_LAST_QR_TIME, PYZBAR_AVAILABLE
-    
-    cam = get_camera()
-    if not cam:
-        logging.error("Camera not available")
+    # Link barcode and check in with a single conditional UPDATE, or journal it
+    # for the write-behind committer and acknowledge straight away
+    journal = get_checkin_journal()
+    if journal is not None:
+        with metrics.DB_SECONDS.time(op="link_barcode_journal"):
+            result = journal.submit(attendee.id, barcode_value, gate=gate.id)
+    else:
+        with metrics.DB_SECONDS.time(op="link_barcode_commit"):
+            result = atomic_checkin(attendee.id, barcode_value, gate=gate.id)
+    if result == NOT_ELIGIBLE:
+        # Another gate checked this attendee in since their QR code was verified
+        attendee_cache.invalidate(attendee_id=attendee.id)
+        flash(f"Error: {attendee.first_name} {attendee.last_name} is already checked in.", "error")
+        metrics.CHECKINS.inc(result="already_checked_in")
+        reset_state(gate)
+        return
+    if result == BAND_IN_USE:
+        existing_attendee = attendee_cache.get_by_band(barcode_value, load_attendee_by_band)
+        holder = f"{existing_attendee.first_name} {existing_attendee.last_name}" if existing_attendee else "another attendee"
+        flash(f"Error: Barcode already assigned to {holder}.", "error")
+        metrics.CHECKINS.inc(result="barcode_in_use")
+        reset_state(gate)
         return
+    checked_in = attendee._replace(band_id=barcode_value, entry=True)
+    attendee_cache.put(checked_in)
+    record_checkin(checked_in, gate.id)
+    metrics.CHECKINS.inc(result="checked_in")
+    flash(f"Success! {attendee.first_name} {attendee.last_name} is checked in.", "success")
+    logging.info(f"Checked in at gate {gate.id}: {attendee.first_name} {attendee.last_name} with barcode: {barcode_value}")
+    reset_state(gate)
 
-    while True:
-        success, frame = cam.read()
-        if not success:
-            logging.error("Failed to read from camera")
-            break
-            
-        display_frame = frame.copy()
-        current_info = {"status": "Info", "message": "Please Scan QR Code", "details": ""}
-        current_time = time.time()
-        should_freeze_frame = False
+def scanning_active(state):
+    """True when live frames should be checked for QR codes"""
+    return not state.waiting_for_barcode and (time.time() - state.last_qr_time) > STATE_QR_COOLDOWN
+
+def analyze_frame(gate, frame):
+    """Detection stage: look for a QR code in a live frame and update the gate's state"""
+    if not scanning_active(gate.state()):
+        return
         
-        try:
-            # Use frozen frame if we're waiting for barcode (should stay frozen until barcode is processed)
-            if STATE_FROZEN_FRAME is not None and STATE_WAITING_FOR_BARCODE:
-                # Use the original frozen frame (already has info drawn on it)
-                display_frame = STATE_FROZEN_FRAME.copy()
-                with app.app_context():
-                    current_info = get_display_info()
-                    
-            # Show frozen frame during cooldown period after error/warning
-            elif STATE_FROZEN_FRAME is not None and (current_time - STATE_LAST_QR_TIME) < STATE_QR_COOLDOWN:
-                display_frame = STATE_FROZEN_FRAME.copy()
-                # Don't redraw info, it's already on the frozen frame
-                
-            else:
-                # Live feed - process new frames
-                if not STATE_WAITING_FOR_BARCODE and (current_time - STATE_LAST_QR_TIME) > STATE_QR_COOLDOWN:
-                    # Clear any old frozen frame when resuming live feed
-                    if STATE_FROZEN_FRAME is not None and not STATE_WAITING_FOR_BARCODE:
-                        STATE_FROZEN_FRAME = None
-                        
-                    # Detect QR codes on live frame
-                    qr_data, bbox, processed_frame = detect_qr_code(frame)
+    vision = get_vision()
+    qr_data, bbox, _ = vision.detect_qr_code(frame, tracker=gate.tracker)
+    if not qr_data:
+        return
+        
+    with app.app_context():
+        attendee = verify_qr_code(qr_data)
+        with gate.lock:
+            # Another worker (or a reset) may have changed the state while we were decoding
+            if not scanning_active(gate.store.get(gate.id)):
+                return
+            current_info = process_qr_result(gate, attendee, qr_data)
+            # Freeze the frame the code was found in, with the result drawn on it
+            display_frame = vision.draw_qr_detection_box(frame.copy(), bbox)
+            with metrics.DRAW_SECONDS.time():
+                gate.frozen_frame = vision.draw_status_overlay(display_frame, current_info,
+                                                               gate.state().waiting_for_barcode)
+    logging.info(f"Gate {gate.id}: frame frozen with QR information displayed")
+
+def render_frame(gate, frame):
+    """Encode stage: return the image to display for the gate's latest camera frame"""
+    vision = get_vision()
+    try:
+        state = gate.state()
+        frozen_frame = gate.frozen_frame
+        if frozen_frame is not None:
+            # Frozen frame stays up while waiting for a barcode and during the cooldown
+            # after an error/warning; it already has the info drawn on it
+            if state.waiting_for_barcode or (time.time() - state.last_qr_time) < STATE_QR_COOLDOWN:
+                return frozen_frame
+            # Clear the old frozen frame when resuming live feed
+            with gate.lock:
+                if gate.frozen_frame is frozen_frame:
+                    gate.frozen_frame = None
                     
-                    if qr_data:
-                        with app.app_context():
-                            attendee = verify_qr_code(qr_data)
-                            current_info = process_qr_result(attendee, qr_data)
-                            should_freeze_frame = True  # Flag to freeze after drawing info
-                            
-                            # Draw detection box on the frame
-                            if bbox is not None:
-                                display_frame = draw_qr_detection_box(display_frame, bbox)
-                    else:
-                        # No QR detected, show live feed with default message
-                        current_info = {"status": "Info", "message": "Please Scan QR Code", "details": ""}
-            
-            # Only draw information if we're not using a frozen frame that already has info
-            if not (STATE_FROZEN_FRAME is not None and not should_freeze_frame):
-                # Draw information on frame
-                status_colors = {
-                    "Info": (255, 200, 0),      # Blue
-                    "Success": (0, 255, 0),     # Green
-                    "Error": (0, 0, 255),       # Red
-                    "Warning": (0, 165, 255)    # Orange
-                }
-                
-                color = status_colors.get(current_info["status"], (255, 255, 255))
-                
-                # Add semi-transparent background for text
-                overlay = display_frame.copy()
-                cv2.rectangle(overlay, (5, 5), (635, 120), (0, 0, 0), -1)
-                display_frame = cv2.addWeighted(display_frame, 0.7, overlay, 0.3, 0)
-                
-                # Draw main message
-                cv2.putText(display_frame, current_info["message"], (10, 35), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2)
-                
-                # Draw details if available
-                if current_info.get("details"):
-                    cv2.putText(display_frame, current_info["details"], (10, 70), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-                
-                # Add status indicator
-                status_text = f"Status: {current_info['status']}"
-                cv2.putText(display_frame, status_text, (10, 95), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-                
-                # Add frame state indicator
-                if STATE_WAITING_FOR_BARCODE:
-                    cv2.putText(display_frame, "WAITING FOR BARCODE", (10, 115), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
-            
-            # Freeze the frame after all information has been drawn
-            if should_freeze_frame:
-                STATE_FROZEN_FRAME = display_frame.copy()
-                logging.info("Frame frozen with QR information displayed")
-                       
-        except Exception as e:
-            logging.error(f"Error in generate_frames: {e}")
-            cv2.putText(display_frame, "Error processing frame", (10, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        # Waiting without a frozen frame happens when another worker scanned the QR
+        current_info = get_display_info(gate) if state.waiting_for_barcode else \
+            {"status": "Info", "message": "Please Scan QR Code", "details": ""}
+        with metrics.DRAW_SECONDS.time():
+            return vision.draw_status_overlay(frame, current_info, state.waiting_for_barcode)
+    except Exception as e:
+        logging.error(f"Error rendering frame: {e}")
+        return vision.draw_error_message(frame, "Error processing frame")
 
-        # Encode frame
-        try:
-            _, buffer = cv2.imencode('.jpg', display_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            frame_bytes = buffer.tobytes()
-            
+def get_pipeline(gate):
+    """
+    Return the gate's shared scan pipeline, creating it on first use: this is
+    where a scanner worker loads the vision stack and opens the camera
+    """
+    with gate.lock:
+        if gate.pipeline is None:
+            vision = get_vision()
+            from pipeline import ScanPipeline
+            cam = get_camera(gate)
+            if not cam:
+                return None
+            if gate.tracker is None:
+                gate.tracker = vision.make_tracker()
+            gate.pipeline = ScanPipeline(cam, partial(analyze_frame, gate), partial(render_frame, gate),
+                                         workers=app.config['DETECTION_WORKERS'],
+                                         jpeg_quality=app.config['JPEG_QUALITY'],
+                                         buffer_size=app.config['STREAM_BUFFER_SIZE'],
+                                         idle_poll=app.config['STREAM_IDLE_POLL'])
+        return gate.pipeline
+
+def generate_frames(gate):
+    """
+    Generate video frames with QR code detection for one gate
+    All viewers of a gate share one pipeline: the camera is read, detected and
+    encoded once, and each viewer streams the latest JPEG from its ring buffer
+    """
+    pipeline = get_pipeline(gate)
+    if not pipeline:
+        logging.error(f"Camera not available for gate {gate.id}")
+        return
+
+    broadcaster = pipeline.attach()
+    try:
+        for frame_bytes in broadcaster.stream(keepalive=app.config['STREAM_KEEPALIVE_INTERVAL']):
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        except Exception as e:
-            logging.error(f"Error encoding frame: {e}")
-            break
-
-def reset_state():
-    """Reset all state variables"""
-    global STATE_WAITING_FOR_BARCODE, STATE_CURRENT_ATTENDEE_ID, STATE_FROZEN_FRAME, STATE_LAST_QR_TIME
-    STATE_WAITING_FOR_BARCODE = False
-    STATE_CURRENT_ATTENDEE_ID = None
-    STATE_FROZEN_FRAME = None
-    STATE_LAST_QR_TIME = 0
-    logging.info("State reset")
-
-# --- FLASK ROUTES ---
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-@app.route('/dashboard')
+    finally:
+        pipeline.detach()
+
+def reset_state(gate=None):
+    """Reset a gate's scan state (the default gate if none given)"""
+    (gate or get_gate()).reset()
+
+# --- DASHBOARD ---
+# Sortable dashboard columns; text columns sort case-insensitively (on their lower() indexes)
+DASHBOARD_SORTS = {
+    'id': Attendee.id,
+    'first_name': func.lower(Attendee.first_name),
+    'last_name': func.lower(Attendee.last_name),
+    'email': func.lower(Attendee.email),
+    'institute': func.lower(Attendee.institute),
+    'band_id': Attendee.band_id,
+}
+DASHBOARD_STATUSES = ('all', 'present', 'absent')
+
+def _prefix(column, prefix):
+    """column starts with prefix, as a range so the column's index can be used"""
+    return (column >= prefix) & (column < prefix + '\U0010ffff')
+
+def search_attendees(q='', status='all', sort='first_name', direction='asc'):
+    """
+    Dashboard query: every whitespace-separated term of q must prefix-match
+    (case-insensitively) the first name, last name, email or institute, or
+    the band ID, or equal the attendee ID
+    """
+    query = Attendee.query
+    if status == 'present':
+        query = query.filter(Attendee.entry.is_(True))
+    elif status == 'absent':
+        query = query.filter(Attendee.entry.is_(False))
+
+    for term in q.split():
+        lowered = term.lower()
+        conditions = [_prefix(func.lower(column), lowered)
+                      for column in (Attendee.first_name, Attendee.last_name, Attendee.email, Attendee.institute)]
+        conditions.append(_prefix(Attendee.band_id, term))
+        if term.isdigit():
+            conditions.append(Attendee.id == int(term))
+        query = query.filter(or_(*conditions))
+
+    order = DASHBOARD_SORTS.get(sort, DASHBOARD_SORTS['first_name'])
+    if direction == 'desc':
+        return query.order_by(order.desc(), Attendee.id.desc())
+    return query.order_by(order.asc(), Attendee.id.asc())
+
+def attendee_counts():
+    """Total, present and absent attendee counts from one aggregate query"""
+    with metrics.DB_SECONDS.time(op="attendee_counts"):
+        total, present = db.session.query(
+            func.count(Attendee.id), func.sum(case((Attendee.entry.is_(True), 1), else_=0))).one()
+    present = present or 0
+    return {"total": total, "present": present, "absent": total - present}
+
+# --- VIEWS ---
+def index(gate_id):
+    gate = get_gate(gate_id)
+    return render_template('index.html', gate_id=gate.id, gates=list(GATES))
+
 def dashboard():
-    present_attendees = Attendee.query.filter_by(entry=True).order_by(Attendee.first_name).all()
-    absent_attendees = Attendee.query.filter_by(entry=False).order_by(Attendee.first_name).all()
-    return render_template('dashboard.html', present_attendees=present_attendees, absent_attendees=absent_attendees)
+    q = request.args.get('q', '').strip()
+    status = request.args.get('status', 'all')
+    status = status if status in DASHBOARD_STATUSES else 'all'
+    sort = request.args.get('sort', 'first_name')
+    sort = sort if sort in DASHBOARD_SORTS else 'first_name'
+    direction = 'desc' if request.args.get('dir') == 'desc' else 'asc'
+    per_page = request.args.get('per_page', app.config['DASHBOARD_PER_PAGE'], type=int)
+    page = request.args.get('page', 1, type=int)
+
+    with metrics.DB_SECONDS.time(op="dashboard_page"):
+        pagination = search_attendees(q, status, sort, direction).paginate(
+            page=page, per_page=per_page, max_per_page=app.config['DASHBOARD_MAX_PER_PAGE'], error_out=False)
+    return render_template('dashboard.html', pagination=pagination, attendees=pagination.items,
+                           counts=attendee_counts(), q=q, status=status, sort=sort, direction=direction,
+                           per_page=pagination.per_page)
+
+def dashboard_stream():
+    """Server-Sent Events: current counts on connect, then check-in deltas as they happen"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    get_attendance_stats()  # Starts the check-in poller with LIVE_EVENTS=db
+    subscription = event_hub.subscribe(last_event_id)
+    initial = [] if last_event_id is not None else [("counts", attendee_counts())]
+    stream = event_hub.stream(subscription, initial, keepalive=app.config['DASHBOARD_KEEPALIVE_INTERVAL'])
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def export():
+    """
+    Stream attendees and check-in status as CSV or JSONL
+    Query: format=csv|jsonl, status=all|present|absent, institute=...
+    """
+    fmt = request.args.get('format', 'csv')
+    status = request.args.get('status', 'all')
+    if fmt not in export_attendees.FORMATS or status not in export_attendees.STATUSES:
+        abort(400, description="format must be csv or jsonl; status must be all, present or absent")
+    query = export_attendees.export_query(status, request.args.get('institute') or None)
+    chunks = export_attendees.iter_export(
+        export_attendees.iter_records(query, app.config['EXPORT_YIELD_PER']), fmt)
+    return Response(stream_with_context(chunks), mimetype=export_attendees.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename=attendance-{status}.{fmt}'})
 
-@app.route('/video_feed')
-def video_feed():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+def video_feed(gate_id):
+    gate = get_gate(gate_id)
+    return Response(generate_frames(gate), mimetype='multipart/x-mixed-replace; boundary=frame')
 
-@app.route('/attach_barcode_manual', methods=['POST'])
-def attach_barcode_manual():
-    if not STATE_WAITING_FOR_BARCODE:
+def attach_barcode_manual(gate_id):
+    gate = get_gate(gate_id)
+    if not gate.store.get(gate.id).waiting_for_barcode:
         flash("Please scan a QR code first.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('index', gate_id=gate.id))
         
     barcode_value = request.form.get("barcode", "").strip()
     if not barcode_value:
         flash("Barcode cannot be empty.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('index', gate_id=gate.id))
         
-    link_barcode(barcode_value)
-    return redirect(url_for('index'))
+    link_barcode(gate, barcode_value)
+    return redirect(url_for('index', gate_id=gate.id))
+
+def api_checkins():
+    """
+    Batched check-in for handheld scanners
+    Body: {"items": [{"qr_payload": "...", "band_id": "..."}, ...]}, a bare
+    list of items, or a single item; returns a per-item result list
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict) and "items" in payload:
+        items = payload["items"]
+    elif isinstance(payload, dict):
+        items = [payload]
+    else:
+        items = payload
+    if not isinstance(items, list) or not items:
+        return {"status": "error", "message": "Expected a JSON list of {qr_payload, band_id} items"}, 400
+    if len(items) > app.config['CHECKIN_BATCH_MAX']:
+        return {"status": "error", "message": f"Batch larger than {app.config['CHECKIN_BATCH_MAX']} items"}, 413
+
+    results = checkin_batch(items)
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"status": "success", "summary": summary, "results": results}
 
-@app.route('/reset', methods=['POST'])
-def reset():
-    reset_state()
+def reset(gate_id):
+    gate = get_gate(gate_id)
+    reset_state(gate)
     flash("System reset. Ready for next QR code.", "info")
-    return redirect(url_for('index'))
+    return redirect(url_for('index', gate_id=gate.id))
+
+def checkins_journal():
+    """Write-behind journal status: check-ins not yet committed and recent commit failures"""
+    journal = get_checkin_journal()
+    if journal is None:
+        return {"write_behind": False}
+    return {"write_behind": True, "path": journal.path, "pending": journal.pending_count(),
+            "failures": journal.recent_failures()}
+
+def api_stats():
+    """Live attendance statistics, served from in-memory counters"""
+    return get_attendance_stats().snapshot()
+
+def api_stats_reload():
+    """Rebuild the attendance counters from the database (e.g. after an import)"""
+    with metrics.DB_SECONDS.time(op="stats_load"):
+        attendance_stats.load()
+    return attendance_stats.snapshot()
 
-@app.route('/test_camera')
-def test_camera():
+def gates():
+    """State of every gate served by this app"""
+    return {"gates": [{"gate": gate.id, "source": gate.source,
+                       **gate.store.get(gate.id)._asdict()} for gate in GATES.values()]}
+
+def qr_stats():
+    """Current adaptive preprocessing order and per-stage success statistics"""
+    return {"adaptive": app.config['QR_ADAPTIVE_ORDER'], **get_vision().stage_order.snapshot()}
+
+def qr_stats_reset():
+    get_vision().stage_order.reset()
+    return {"status": "success", "message": "Stage statistics reset"}
+
+def metrics_endpoint():
+    """Hot-path counters and latency histograms in Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def profiler_report():
+    """Collapsed stacks collected by the sampling profiler (flamegraph input format)"""
+    return Response(metrics.profiler.report(), mimetype='text/plain')
+
+def profiler_start():
+    interval = request.args.get('interval', type=float) or app.config['PROFILER_INTERVAL']
+    metrics.profiler.start(interval)
+    return {"status": "success", "message": f"Profiler sampling every {interval}s"}
+
+def profiler_stop():
+    metrics.profiler.stop()
+    return {"status": "success", "message": "Profiler stopped"}
+
+def test_camera(gate_id):
     """Test route to check camera availability"""
-    cam = get_camera()
+    cam = get_camera(get_gate(gate_id))
     if cam and cam.isOpened():
         return {"status": "success", "message": "Camera is working"}
     else:
         return {"status": "error", "message": "Camera not available"}, 500
 
+# --- ROUTES ---
+# (rule, view, roles that serve it, add_url_rule options); roles None = every worker
+ROUTES = [
+    ('/', index, ('scanner',), {'defaults': {'gate_id': None}}),
+    ('/gate/<gate_id>', index, ('scanner',), {}),
+    ('/video_feed', video_feed, ('scanner',), {'defaults': {'gate_id': None}}),
+    ('/video_feed/<gate_id>', video_feed, ('scanner',), {}),
+    ('/attach_barcode_manual', attach_barcode_manual, ('scanner',), {'methods': ['POST'], 'defaults': {'gate_id': None}}),
+    ('/attach_barcode_manual/<gate_id>', attach_barcode_manual, ('scanner',), {'methods': ['POST']}),
+    ('/reset', reset, ('scanner',), {'methods': ['POST'], 'defaults': {'gate_id': None}}),
+    ('/reset/<gate_id>', reset, ('scanner',), {'methods': ['POST']}),
+    ('/gates', gates, ('scanner',), {}),
+    ('/qr_stats', qr_stats, ('scanner',), {}),
+    ('/qr_stats/reset', qr_stats_reset, ('scanner',), {'methods': ['POST']}),
+    ('/test_camera', test_camera, ('scanner',), {'defaults': {'gate_id': None}}),
+    ('/test_camera/<gate_id>', test_camera, ('scanner',), {}),
+    ('/dashboard', dashboard, ('dashboard',), {}),
+    ('/dashboard/stream', dashboard_stream, ('dashboard',), {}),
+    ('/export', export, ('dashboard', 'api'), {}),
+    ('/api/stats', api_stats, ('dashboard', 'api'), {}),
+    ('/api/stats/reload', api_stats_reload, ('dashboard', 'api'), {'methods': ['POST']}),
+    ('/api/checkins', api_checkins, ('api',), {'methods': ['POST']}),
+    ('/checkins/journal', checkins_journal, ('scanner', 'api'), {}),
+    ('/metrics', metrics_endpoint, None, {}),
+    ('/profiler', profiler_report, None, {'methods': ['GET']}),
+    ('/profiler/start', profiler_start, None, {'methods': ['POST']}),
+    ('/profiler/stop', profiler_stop, None, {'methods': ['POST']}),
+]
+
+def has_route(endpoint):
+    """Template helper: True if this worker serves endpoint (links to other roles are hidden otherwise)"""
+    return endpoint in current_app.view_functions
+
+def parse_roles(value):
+    """'scanner,dashboard,api' (or any subset, or a sequence of roles) as a tuple of roles"""
+    if isinstance(value, str):
+        value = value.split(',')
+    roles = tuple(role.strip() for role in value if role.strip())
+    unknown = [role for role in roles if role not in ROLES]
+    if unknown or not roles:
+        raise ValueError(f"APP_ROLES must be a comma-separated subset of {', '.join(ROLES)}; got {value!r}")
+    return roles
+
+def create_app(roles=None, config=Config):
+    """
+    Build the application for a worker serving roles (default: APP_ROLES)
+    Only the routes of those roles are registered, and only scanner workers
+    set up gates. Nothing here imports OpenCV or opens a camera: a gate
+    loads the vision stack and its frame source on its first video stream
+    (see get_pipeline)
+    """
+    global app, attendee_cache, event_hub, attendance_stats, gate_store, GATES, DEFAULT_GATE_ID, _checkin_poller
+    global checkin_journal
+    started = time.perf_counter()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    flask_app = Flask(__name__)
+    flask_app.config.from_object(config)
+    roles = parse_roles(roles or flask_app.config['APP_ROLES'])
+    flask_app.config['APP_ROLES'] = ','.join(roles)
+    if not flask_app.config['LIVE_EVENTS']:
+        # Without gates, this worker's own check-ins are not the ones that matter
+        flask_app.config['LIVE_EVENTS'] = 'local' if 'scanner' in roles else 'db'
+    if flask_app.config['LIVE_EVENTS'] not in ('local', 'db'):
+        raise ValueError(f"LIVE_EVENTS must be local or db; got {flask_app.config['LIVE_EVENTS']!r}")
+    if flask_app.config['CHECKIN_WRITE_BEHIND'] and not locking_available():
+        logging.error("CHECKIN_WRITE_BEHIND needs file locks (fcntl), which this platform lacks; "
+                      "check-ins are committed synchronously")
+        flask_app.config['CHECKIN_WRITE_BEHIND'] = False
+    db.init_app(flask_app)
+    configure_sqlite(flask_app)
+    init_db(flask_app)
+
+    attendee_cache = AttendeeCache(
+        maxsize=flask_app.config['ATTENDEE_CACHE_SIZE'],
+        ttl=flask_app.config['ATTENDEE_CACHE_TTL'],
+        negative_ttl=flask_app.config['ATTENDEE_CACHE_NEGATIVE_TTL'],
+    )
+    event_hub = EventHub(queue_size=flask_app.config['DASHBOARD_EVENT_QUEUE'],
+                         history=flask_app.config['DASHBOARD_EVENT_HISTORY'])
+    attendance_stats = AttendanceStats(window_minutes=flask_app.config['STATS_WINDOW_MINUTES'])
+    _checkin_poller = None
+    if checkin_journal is not None:
+        # The journal commits through the app it was started for
+        checkin_journal.stop()
+        checkin_journal = None
+
+    gate_store, GATES, DEFAULT_GATE_ID = None, {}, None
+    if 'scanner' in roles:
+        gate_store = make_state_store(flask_app.config['GATE_STATE_STORE'])
+        for gate_id, source in parse_gates(flask_app.config['GATES']).items():
+            GATES[gate_id] = Gate(gate_id, source, gate_store,
+                                  poll_interval=flask_app.config['GATE_STATE_POLL_INTERVAL'])
+        DEFAULT_GATE_ID = next(iter(GATES))
+
+    for rule, view, view_roles, options in ROUTES:
+        if view_roles is None or any(role in roles for role in view_roles):
+            flask_app.add_url_rule(rule, view_func=view, **options)
+    flask_app.jinja_env.globals['has_route'] = has_route
+
+    app = flask_app
+    logging.info(f"App ready for {', '.join(roles)} in {time.perf_counter() - started:.2f}s")
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
+    # Replay crashed journals before the stats are counted from the database
+    get_checkin_journal()
     with app.app_context():
-        db.create_all()
-    app.run(debug=True, threaded=True)
\ No newline at end of file
+        get_attendance_stats()
+    app.run(debug=True, threaded=True)
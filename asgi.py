@@ -0,0 +1,254 @@
+"""
+Async (ASGI) serving mode.
+
+The long-lived streams - the MJPEG video feeds and the dashboard's
+Server-Sent Events - are served natively on the event loop, so an open
+viewer costs a coroutine instead of a blocked OS thread. Every other route
+is the normal Flask app, run on a pool of ASGI_THREADS threads only for the
+duration of the request (asgiref's plain WsgiToAsgi would serialize them all
+on one thread, so a slow export would hold up every check-in). QR detection
+and JPEG encoding stay on the ScanPipeline's worker threads; the loop only
+moves finished JPEGs.
+
+Streams are latest-only: a viewer waits for the network to accept one frame
+(the server applies TCP flow control to send()), then sends whatever frame
+is newest at that point. A slow client therefore skips frames instead of
+buffering them, and memory per viewer stays at one frame.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import app as gate_app
+from app import app, get_pipeline, attendee_counts, get_attendance_stats, get_checkin_journal
+from events import SSE_PREAMBLE, format_sse
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """
+    WsgiToAsgi that runs each WSGI request on its own executor thread.
+    asgiref runs WSGI apps with thread_sensitive=True, i.e. every request on
+    the one shared sync thread, one after the other
+    """
+
+    def __init__(self, wsgi_application, threads=32):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        instance = _PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit, self.executor)
+        await instance(scope, receive, send)
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    """
+    WsgiToAsgiInstance whose request runs on the given executor. The runner
+    is our own copy of asgiref's run_wsgi_app: that one is already wrapped in
+    a thread-sensitive sync_to_async, and the plain function is not public
+    """
+
+    def __init__(self, wsgi_application, duplicate_header_limit, executor):
+        super().__init__(wsgi_application, duplicate_header_limit)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run, thread_sensitive=False, executor=self.executor)(body)
+
+    def _run(self, body):
+        """Run the WSGI app on this thread, so start_response and the body share it"""
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Too many duplicate headers
+            self.sync_send({'type': 'http.response.start', 'status': 400,
+                            'headers': [(b'content-type', b'text/plain')]})
+            self.sync_send({'type': 'http.response.body', 'body': b"Bad Request: Too many duplicate headers"})
+            return
+        response = self.wsgi_application(environ, self.start_response)
+        try:
+            bytes_sent = 0
+            for output in response:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                # Never send more than the Content-Length the app declared
+                if self.response_content_length is not None:
+                    output = output[:self.response_content_length - bytes_sent]
+                self.sync_send({'type': 'http.response.body', 'body': output, 'more_body': True})
+                bytes_sent += len(output)
+                if bytes_sent == self.response_content_length:
+                    break
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+flask_app = ThreadPoolWsgiToAsgi(app, threads=app.config['ASGI_THREADS'])
+
+MJPEG_HEADERS = [(b'content-type', b'multipart/x-mixed-replace; boundary=frame'),
+                 (b'cache-control', b'no-cache')]
+SSE_HEADERS = [(b'content-type', b'text/event-stream'),
+               (b'cache-control', b'no-cache'),
+               (b'x-accel-buffering', b'no')]
+
+
+async def _text_response(send, status, text):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': text.encode()})
+
+async def _until_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def _stream_until_disconnect(stream, receive):
+    """Run a streaming coroutine until it finishes or the client disconnects"""
+    stream_task = asyncio.ensure_future(stream)
+    disconnect_task = asyncio.ensure_future(_until_disconnect(receive))
+    done, pending = await asyncio.wait({stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    if stream_task in done and stream_task.exception() is not None:
+        logging.error(f"Stream ended with an error: {stream_task.exception()}")
+
+
+async def video_feed(scope, receive, send, gate_id):
+    """MJPEG stream of a gate's shared pipeline, latest frame only"""
+    gate = gate_app.GATES.get(gate_id or gate_app.DEFAULT_GATE_ID)
+    if gate is None:
+        return await _text_response(send, 404, f"Unknown gate: {gate_id}")
+
+    loop = asyncio.get_running_loop()
+    # Opening the camera blocks; keep it off the event loop
+    pipeline = await loop.run_in_executor(None, get_pipeline, gate)
+    if pipeline is None:
+        logging.error(f"Camera not available for gate {gate.id}")
+        return await _text_response(send, 503, f"Camera not available for gate {gate.id}")
+    broadcaster = await loop.run_in_executor(None, pipeline.attach)
+
+    ready = asyncio.Event()
+    def listener():
+        loop.call_soon_threadsafe(ready.set)
+    broadcaster.add_listener(listener)
+    ready.set()  # Send the current frame right away, even if the display is frozen
+    keepalive = app.config['STREAM_KEEPALIVE_INTERVAL']
+
+    async def stream():
+        await send({'type': 'http.response.start', 'status': 200, 'headers': MJPEG_HEADERS})
+        seq = 0
+        while not broadcaster.closed:
+            try:
+                await asyncio.wait_for(ready.wait(), keepalive)
+                timed_out = False
+            except asyncio.TimeoutError:
+                timed_out = True
+            ready.clear()
+            new_seq, data = broadcaster.latest()
+            if data is None or (new_seq == seq and not timed_out):
+                continue
+            # Newest frame only; on a timeout (frozen display) the last frame is re-sent as a keep-alive
+            seq = new_seq
+            await send({'type': 'http.response.body', 'more_body': True,
+                        'body': b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + data + b'\r\n'})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    try:
+        await _stream_until_disconnect(stream(), receive)
+    finally:
+        broadcaster.remove_listener(listener)
+        await loop.run_in_executor(None, pipeline.detach)
+
+
+async def dashboard_stream(scope, receive, send):
+    """Server-Sent Events for the dashboard, served on the event loop"""
+    loop = asyncio.get_running_loop()
+    headers = dict(scope.get('headers') or [])
+    try:
+        last_event_id = int(headers.get(b'last-event-id', b''))
+    except ValueError:
+        last_event_id = None
+
+    ready = asyncio.Event()
+    subscription = gate_app.event_hub.subscribe(last_event_id, notify=lambda: loop.call_soon_threadsafe(ready.set))
+    keepalive = app.config['DASHBOARD_KEEPALIVE_INTERVAL']
+
+    def initial_counts():
+        with app.app_context():
+            get_attendance_stats()  # Starts the check-in poller with LIVE_EVENTS=db
+            return attendee_counts()
+
+    async def stream():
+        await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+        await send({'type': 'http.response.body', 'body': SSE_PREAMBLE.encode(), 'more_body': True})
+        if last_event_id is None:
+            counts = await loop.run_in_executor(None, initial_counts)
+            await send({'type': 'http.response.body', 'more_body': True,
+                        'body': format_sse(None, "counts", counts).encode()})
+        while True:
+            chunks = []
+            while not subscription.queue.empty():
+                chunks.append(format_sse(*subscription.queue.get_nowait()))
+            if chunks:
+                await send({'type': 'http.response.body', 'body': "".join(chunks).encode(), 'more_body': True})
+                continue
+            try:
+                await asyncio.wait_for(ready.wait(), keepalive)
+                ready.clear()
+            except asyncio.TimeoutError:
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+
+    try:
+        await _stream_until_disconnect(stream(), receive)
+    finally:
+        gate_app.event_hub.unsubscribe(subscription)
+
+
+async def lifespan(scope, receive, send):
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            def startup():
+                # The schema was created by create_app; replay crashed journals before counting
+                get_checkin_journal()
+                with app.app_context():
+                    get_attendance_stats()
+            await loop.run_in_executor(None, startup)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for gate in gate_app.GATES.values():
+                if gate.pipeline is not None:
+                    gate.pipeline.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: native streams, everything else through Flask"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        path = scope['path'].rstrip('/')
+        # Native streams only for the roles this worker serves; otherwise Flask answers 404
+        if 'video_feed' in app.view_functions:
+            if path == '/video_feed':
+                return await video_feed(scope, receive, send, None)
+            if path.startswith('/video_feed/') and path.count('/') == 2:
+                return await video_feed(scope, receive, send, path.rsplit('/', 1)[1])
+        if path == '/dashboard/stream' and 'dashboard_stream' in app.view_functions:
+            return await dashboard_stream(scope, receive, send)
+    return await flask_app(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=8000)
@@ -0,0 +1,178 @@
+"""
+In-process attendee lookup cache for the scan hot path.
+
+Entries are immutable AttendeeSnapshot tuples (safe to share between threads
+and independent of any SQLAlchemy session), indexed by id and by band_id,
+with LRU eviction and a TTL. Lookups that find nothing are cached too
+(negative entries, with a shorter TTL), so a bad QR code held in front of
+the camera does not hit the database on every decode.
+
+The cache is per process: a check-in made through another worker leaves
+this worker's entry stale until it expires. That only affects what is
+displayed; correctness comes from the conditional UPDATE in
+checkin.atomic_checkin, which refuses a second check-in whatever the cache
+says, after which the caller drops the stale entry.
+"""
+from collections import OrderedDict, namedtuple
+import threading
+import time
+
+import metrics
+
+AttendeeSnapshot = namedtuple(
+    'AttendeeSnapshot', ['id', 'first_name', 'last_name', 'email', 'institute', 'band_id', 'entry'])
+
+def snapshot_of(attendee):
+    """Build an AttendeeSnapshot from an Attendee model instance (or None)"""
+    if attendee is None:
+        return None
+    return AttendeeSnapshot(attendee.id, attendee.first_name, attendee.last_name, attendee.email,
+                            attendee.institute, attendee.band_id, bool(attendee.entry))
+
+_MISSING = object()
+
+CACHE_REQUESTS = metrics.REGISTRY.counter("gate_attendee_cache_requests_total",
+                                          "Attendee cache lookups, by index and result")
+
+
+class AttendeeCache:
+    """Bounded LRU/TTL cache of attendee snapshots keyed by id and by band_id"""
+
+    def __init__(self, maxsize=10000, ttl=300.0, negative_ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._by_id = OrderedDict()    # id -> (snapshot or None, expires_at)
+        self._by_band = OrderedDict()  # band_id -> (id or None, expires_at)
+
+    def _get(self, index, key):
+        entry = index.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del index[key]
+            return _MISSING
+        index.move_to_end(key)
+        return value
+
+    def _set(self, index, key, value, ttl):
+        index[key] = (value, time.monotonic() + ttl)
+        index.move_to_end(key)
+        while len(index) > self.maxsize:
+            index.popitem(last=False)
+
+    def get_by_id(self, attendee_id, loader):
+        """
+        Return the snapshot for attendee_id, or None if no such attendee
+        loader(attendee_id) is called on a miss and returns a snapshot or None
+        """
+        with self._lock:
+            cached = self._get(self._by_id, attendee_id)
+        if cached is not _MISSING:
+            CACHE_REQUESTS.inc(index="id", result="hit" if cached else "negative_hit")
+            return cached
+
+        CACHE_REQUESTS.inc(index="id", result="miss")
+        snapshot = loader(attendee_id)
+        if snapshot is None:
+            with self._lock:
+                self._set(self._by_id, attendee_id, None, self.negative_ttl)
+        else:
+            self.put(snapshot)
+        return snapshot
+
+    def get_many_by_id(self, attendee_ids, loader):
+        """
+        Return {id: snapshot} for the ids that exist
+        loader(ids) is called once with all missed ids and returns {id: snapshot}
+        """
+        found, missed = {}, []
+        with self._lock:
+            for attendee_id in attendee_ids:
+                cached = self._get(self._by_id, attendee_id)
+                if cached is _MISSING:
+                    missed.append(attendee_id)
+                elif cached is not None:
+                    found[attendee_id] = cached
+        CACHE_REQUESTS.inc(len(attendee_ids) - len(missed), index="id", result="hit")
+        if not missed:
+            return found
+
+        CACHE_REQUESTS.inc(len(missed), index="id", result="miss")
+        loaded = loader(missed)
+        for attendee_id in missed:
+            snapshot = loaded.get(attendee_id)
+            if snapshot is None:
+                with self._lock:
+                    self._set(self._by_id, attendee_id, None, self.negative_ttl)
+            else:
+                self.put(snapshot)
+                found[attendee_id] = snapshot
+        return found
+
+    def get_by_band(self, band_id, loader):
+        """
+        Return the snapshot holding band_id, or None if the band is unassigned
+        loader(band_id) is called on a miss and returns a snapshot or None
+        """
+        with self._lock:
+            attendee_id = self._get(self._by_band, band_id)
+            if attendee_id is not _MISSING and attendee_id is not None:
+                cached = self._get(self._by_id, attendee_id)
+                if cached is not _MISSING and cached is not None and cached.band_id == band_id:
+                    CACHE_REQUESTS.inc(index="band", result="hit")
+                    return cached
+            elif attendee_id is None:
+                CACHE_REQUESTS.inc(index="band", result="negative_hit")
+                return None
+
+        CACHE_REQUESTS.inc(index="band", result="miss")
+        snapshot = loader(band_id)
+        if snapshot is None:
+            with self._lock:
+                self._set(self._by_band, band_id, None, self.negative_ttl)
+        else:
+            self.put(snapshot)
+        return snapshot
+
+    def cached_band_holder(self, band_id):
+        """Return the cached snapshot holding band_id, or None if the cache does not know one (never loads)"""
+        with self._lock:
+            attendee_id = self._get(self._by_band, band_id)
+            if attendee_id is _MISSING or attendee_id is None:
+                return None
+            cached = self._get(self._by_id, attendee_id)
+            if cached is _MISSING or cached is None or cached.band_id != band_id:
+                return None
+            return cached
+
+    def put(self, snapshot):
+        """Insert or replace (write through) an attendee snapshot"""
+        with self._lock:
+            previous = self._get(self._by_id, snapshot.id)
+            if previous not in (_MISSING, None) and previous.band_id and previous.band_id != snapshot.band_id:
+                self._by_band.pop(previous.band_id, None)
+            self._set(self._by_id, snapshot.id, snapshot, self.ttl)
+            if snapshot.band_id:
+                self._set(self._by_band, snapshot.band_id, snapshot.id, self.ttl)
+
+    def invalidate(self, attendee_id=None, band_id=None):
+        """Drop the entries for an attendee id and/or a band id"""
+        with self._lock:
+            if attendee_id is not None:
+                entry = self._by_id.pop(attendee_id, None)
+                if entry and entry[0] is not None and entry[0].band_id:
+                    self._by_band.pop(entry[0].band_id, None)
+            if band_id is not None:
+                self._by_band.pop(band_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_band.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"ids": len(self._by_id), "bands": len(self._by_band), "maxsize": self.maxsize}
@@ -0,0 +1,254 @@
+"""
+Offline benchmark for the QR detection cascade in vision.py.
+
+Generates a repeatable corpus of synthetic gate frames (clean, blurred, dark,
+overexposed, rotated, small-in-frame and frames with no code at all) and
+reports, per frame category:
+
+* latency percentiles of detect_qr_code, detect_qr_code_opencv and
+  detect_qr_code_pyzbar
+* decode hit rate, and which cascade stage produced the decode
+* latency and hit rate of every individual preprocessing stage
+* latency and candidate rate of the localize gate ('finder' and 'detect')
+
+Usage:
+    python bench_qr.py                      # 20 frames per category
+    python bench_qr.py --frames 50 --json bench.json
+    python bench_qr.py --localize off       # compare against the ungated cascade
+"""
+import argparse
+import json
+import logging
+import time
+
+import cv2
+import numpy as np
+
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+CATEGORIES = ["clean", "blurred", "dark", "overexposed", "rotated", "small", "no_code"]
+
+
+# --- CORPUS GENERATION ---
+def render_qr(payload, size):
+    """Render a QR code for payload as a white-bordered grayscale square of roughly size pixels"""
+    encoder = cv2.QRCodeEncoder.create()
+    qr = encoder.encode(payload)
+    return cv2.resize(qr, (size, size), interpolation=cv2.INTER_NEAREST)
+
+def make_background(rng):
+    """Make a cluttered lobby-like BGR background so no-code frames are not trivially flat"""
+    gradient = np.linspace(60, 180, FRAME_WIDTH, dtype=np.float32)
+    frame = np.tile(gradient, (FRAME_HEIGHT, 1))
+    frame = np.dstack([frame, frame * 0.9, frame * 0.8])
+    frame += rng.normal(0, 12, frame.shape)
+    for _ in range(6):
+        x, y = rng.randint(0, FRAME_WIDTH - 80), rng.randint(0, FRAME_HEIGHT - 80)
+        w, h = rng.randint(20, 160), rng.randint(20, 160)
+        color = [int(c) for c in rng.randint(0, 255, 3)]
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+def paste_qr(frame, qr, rng):
+    """Paste a grayscale QR image onto a random position of a BGR frame"""
+    h, w = qr.shape[:2]
+    x = rng.randint(0, FRAME_WIDTH - w)
+    y = rng.randint(0, FRAME_HEIGHT - h)
+    frame[y:y + h, x:x + w] = cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+    return frame
+
+def make_frame(category, payload, rng):
+    """Build one synthetic frame of the given category"""
+    frame = make_background(rng)
+    if category == "no_code":
+        return frame
+
+    size = rng.randint(50, 70) if category == "small" else rng.randint(160, 240)
+    qr = render_qr(payload, size)
+    if category == "rotated":
+        # Pad first so the rotated code is not clipped
+        pad = size // 3
+        qr = cv2.copyMakeBorder(qr, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=255)
+        center = (qr.shape[1] / 2, qr.shape[0] / 2)
+        matrix = cv2.getRotationMatrix2D(center, rng.uniform(20, 70), 1.0)
+        qr = cv2.warpAffine(qr, matrix, (qr.shape[1], qr.shape[0]), borderValue=255)
+    frame = paste_qr(frame, qr, rng)
+
+    if category == "blurred":
+        frame = cv2.GaussianBlur(frame, (9, 9), 0)
+    elif category == "dark":
+        frame = cv2.convertScaleAbs(frame, alpha=0.25, beta=0)
+    elif category == "overexposed":
+        frame = cv2.convertScaleAbs(frame, alpha=0.5, beta=150)
+    return frame
+
+def generate_corpus(frames_per_category, seed=0):
+    """Return a list of (category, expected_payload, frame) tuples"""
+    rng = np.random.RandomState(seed)
+    corpus = []
+    for category in CATEGORIES:
+        for i in range(frames_per_category):
+            payload = None if category == "no_code" else f"ID:{rng.randint(1, 100000)}"
+            corpus.append((category, payload, make_frame(category, payload, rng)))
+    return corpus
+
+
+# --- MEASUREMENT ---
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(latencies_ms, hits, total):
+    return {
+        "n": total,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 3) if latencies_ms else 0.0,
+        "hit_rate": round(hits / total, 3) if total else 0.0,
+    }
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000.0
+
+def is_hit(data, expected):
+    if expected is None:
+        return False
+    return data == expected
+
+def run_benchmark(corpus, qr):
+    """
+    Run every detector and every stage over the corpus
+    qr is the module providing the detection functions (normally vision)
+    """
+    detectors = {
+        "detect_qr_code": lambda f: qr.detect_qr_code(f)[0],
+        "detect_qr_code_opencv": lambda f: qr.detect_qr_code_opencv(f)[0],
+        "detect_qr_code_pyzbar": lambda f: qr.detect_qr_code_pyzbar(f)[0],
+    }
+    report = {"detectors": {}, "stages": {}, "winning_stage": {}, "localize": {}}
+
+    for category in CATEGORIES:
+        frames = [(payload, frame) for cat, payload, frame in corpus if cat == category]
+
+        detector_report = {}
+        for name, detector in detectors.items():
+            latencies, hits = [], 0
+            for payload, frame in frames:
+                data, elapsed = time_call(detector, frame)
+                latencies.append(elapsed)
+                hits += is_hit(data, payload)
+            detector_report[name] = summarize(latencies, hits, len(frames))
+        report["detectors"][category] = detector_report
+
+        stage_report = {}
+        for stage_name, stage in qr.OPENCV_STAGES:
+            latencies, hits = [], 0
+            for payload, frame in frames:
+                cache = {}
+                start = time.perf_counter()
+                data, bbox, _ = qr.qr_decoder().detectAndDecode(stage(frame, cache))
+                latencies.append((time.perf_counter() - start) * 1000.0)
+                hits += is_hit(data if bbox is not None else None, payload)
+            stage_report[stage_name] = summarize(latencies, hits, len(frames))
+        report["stages"][category] = stage_report
+
+        winners = {}
+        for payload, frame in frames:
+            _, _, stage_name = qr.run_opencv_cascade(frame)
+            key = stage_name or "none"
+            winners[key] = winners.get(key, 0) + 1
+        report["winning_stage"][category] = winners
+
+        localize_report = {}
+        for mode in ("finder", "detect"):
+            latencies, candidates = [], 0
+            for payload, frame in frames:
+                bbox, elapsed = time_call(qr.localize_qr_code, frame, {}, mode)
+                latencies.append(elapsed)
+                candidates += bbox is not None
+            # For the localize gate, "hit" means a candidate was reported
+            localize_report[mode] = summarize(latencies, candidates, len(frames))
+        report["localize"][category] = localize_report
+
+    return report
+
+
+# --- OUTPUT ---
+def print_report(report):
+    print("\n=== Detector latency (ms) and hit rate per category ===")
+    header = f"{'category':<12} {'detector':<24} {'p50':>8} {'p95':>8} {'p99':>8} {'mean':>8} {'hit':>6}"
+    print(header)
+    print("-" * len(header))
+    for category, detectors in report["detectors"].items():
+        for name, s in detectors.items():
+            print(f"{category:<12} {name:<24} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} "
+                  f"{s['p99_ms']:>8.2f} {s['mean_ms']:>8.2f} {s['hit_rate']:>6.2f}")
+
+    print("\n=== Per-stage latency (ms, preprocess + detectAndDecode) and hit rate ===")
+    for category, stages in report["stages"].items():
+        print(f"\n[{category}]")
+        for name, s in stages.items():
+            print(f"  {name:<20} p50={s['p50_ms']:>7.2f} p95={s['p95_ms']:>7.2f} "
+                  f"p99={s['p99_ms']:>7.2f} hit={s['hit_rate']:.2f}")
+
+    print("\n=== Localize gate latency (ms) and candidate rate ===")
+    for category, modes in report["localize"].items():
+        for mode, s in modes.items():
+            print(f"  {category:<12} {mode:<8} p50={s['p50_ms']:>7.2f} p95={s['p95_ms']:>7.2f} "
+                  f"p99={s['p99_ms']:>7.2f} candidates={s['hit_rate']:.2f}")
+
+    print("\n=== Stage that produced the decode in the OpenCV cascade ===")
+    for category, winners in report["winning_stage"].items():
+        summary = ", ".join(f"{name}={count}" for name, count in sorted(winners.items(), key=lambda kv: -kv[1]))
+        print(f"  {category:<12} {summary}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the QR detection cascade on a synthetic corpus")
+    parser.add_argument("--frames", type=int, default=20, help="frames per category (default: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="corpus random seed (default: 0)")
+    parser.add_argument("--json", metavar="PATH", help="also write the full report as JSON")
+    parser.add_argument("--localize", choices=["finder", "detect", "off"],
+                        help="localize gate used by detect_qr_code (default: app config)")
+    parser.add_argument("--pyramid", type=int, choices=[0, 1, 2],
+                        help="pyramid levels used by detect_qr_code (default: app config)")
+    parser.add_argument("--adaptive", choices=["on", "off"],
+                        help="adaptive stage ordering in detect_qr_code_opencv (default: app config)")
+    args = parser.parse_args()
+
+    # Detection logs every hit at INFO level, which would swamp the timings
+    logging.disable(logging.INFO)
+    import vision as qr
+    if args.localize:
+        qr.settings['QR_LOCALIZE_MODE'] = args.localize
+    if args.pyramid is not None:
+        qr.settings['QR_PYRAMID_LEVELS'] = args.pyramid
+    if args.adaptive:
+        qr.settings['QR_ADAPTIVE_ORDER'] = args.adaptive == "on"
+
+    print(f"Generating corpus: {args.frames} frames x {len(CATEGORIES)} categories (seed={args.seed})")
+    corpus = generate_corpus(args.frames, args.seed)
+    print(f"pyzbar available: {qr.PYZBAR_AVAILABLE}, localize gate: {qr.settings['QR_LOCALIZE_MODE']}")
+
+    report = run_benchmark(corpus, qr)
+    report["config"] = {"frames_per_category": args.frames, "seed": args.seed,
+                        "localize": qr.settings['QR_LOCALIZE_MODE'],
+                        "adaptive": qr.settings['QR_ADAPTIVE_ORDER'],
+                        "pyramid_levels": qr.settings['QR_PYRAMID_LEVELS'],
+                        "pyzbar_available": qr.PYZBAR_AVAILABLE}
+    report["learned_order"] = qr.stage_order.snapshot()
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+if __name__ == "__main__":
+    main()
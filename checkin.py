@@ -0,0 +1,75 @@
+"""
+Atomic check-in against the attendees table.
+
+A check-in is a single conditional statement:
+
+    UPDATE attendees SET band_id = :band, entry = 1 WHERE id = :id AND entry = 0
+
+so two gates submitting at once cannot both check in the same attendee, and a
+band already linked to someone else is rejected by the band_id unique
+constraint instead of a separate lookup query. A successful check-in also
+records a CheckinEvent (time, gate, band) in the same transaction.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Attendee, CheckinEvent
+
+# Results of atomic_checkin
+CHECKED_IN = "checked_in"
+NOT_ELIGIBLE = "not_eligible"   # no such attendee, or already checked in
+BAND_IN_USE = "barcode_in_use"
+
+def checkin_statement(attendee_id, band_id):
+    """The conditional UPDATE that checks one attendee in"""
+    return (update(Attendee)
+            .where(Attendee.id == attendee_id, Attendee.entry.is_(False))
+            .values(band_id=band_id, entry=True))
+
+def checkin_event_statement(attendee_id, band_id, gate=None, at=None):
+    """The INSERT recording a successful check-in; at is a Unix timestamp (default: now)"""
+    when = datetime.fromtimestamp(at, timezone.utc) if at is not None else datetime.now(timezone.utc)
+    return insert(CheckinEvent).values(attendee_id=attendee_id, band_id=band_id, gate=gate,
+                                       checked_in_at=when.replace(tzinfo=None))
+
+def _checkin(attendee_id, band_id, gate, at):
+    result = db.session.execute(checkin_statement(attendee_id, band_id))
+    if result.rowcount != 1:
+        return NOT_ELIGIBLE
+    db.session.execute(checkin_event_statement(attendee_id, band_id, gate, at))
+    return CHECKED_IN
+
+def _begin_batch():
+    """
+    Make sure the batch runs in one database transaction. pysqlite only sends
+    BEGIN before INSERT/UPDATE/DELETE, not before SAVEPOINT, so otherwise the
+    first savepoint opens the transaction and its RELEASE commits the item on
+    its own. IMMEDIATE takes the write lock up front (waiting busy_timeout)
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def atomic_checkin(attendee_id, band_id, commit=True, gate=None, at=None):
+    """
+    Check an attendee in with one conditional UPDATE and record the event
+    With commit=False the statements run in a savepoint of the current
+    transaction, so a failed item does not abort the rest of a batch; the
+    batch becomes visible to other connections at the caller's commit
+    Returns CHECKED_IN, NOT_ELIGIBLE or BAND_IN_USE
+    """
+    try:
+        if commit:
+            status = _checkin(attendee_id, band_id, gate, at)
+            db.session.commit()
+        else:
+            _begin_batch()
+            with db.session.begin_nested():
+                status = _checkin(attendee_id, band_id, gate, at)
+    except IntegrityError:
+        if commit:
+            db.session.rollback()
+        return BAND_IN_USE
+    return status
@@ -0,0 +1,259 @@
+"""
+Write-behind check-in journal with group commit.
+
+In write-behind mode a check-in is appended to a local append-only journal
+(one JSON line per check-in) and acknowledged immediately. A background
+thread then applies pending check-ins to the attendees table in batches -
+one transaction and one commit per batch, using the same conditional UPDATE
+as the synchronous path - and appends a commit marker to the journal.
+
+Each worker process writes its own journal file in the journal directory and
+holds an exclusive lock on it; the lock is what tells a live worker's
+journal from a crashed one, so write-behind needs fcntl (not on Windows).
+At startup, journals left behind by crashed processes (and this process's
+own committed-but-unmarked entries) are replayed; replay is idempotent because a check-in only applies to an
+attendee that is not yet checked in.
+
+Conflicts that can only be detected by the database (a band linked by
+another machine since the last cache refresh) surface at group-commit time;
+they are logged, counted and listed by recent_failures().
+"""
+from collections import deque
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so no write-behind
+    fcntl = None
+
+from models import db
+from checkin import atomic_checkin, CHECKED_IN, NOT_ELIGIBLE, BAND_IN_USE
+import metrics
+
+JOURNAL_PENDING = metrics.REGISTRY.counter("gate_journal_entries_total", "Journal entries, by outcome")
+GROUP_COMMIT_SECONDS = metrics.REGISTRY.histogram("gate_journal_group_commit_seconds",
+                                                  "Time per journal group commit")
+
+
+def locking_available():
+    """True if journals can be locked, i.e. write-behind can run on this platform"""
+    return fcntl is not None
+
+def _try_lock(handle):
+    """Take an exclusive non-blocking lock on an open file; True if we hold it"""
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _still_linked(handle, path):
+    """True if path still names the open file, i.e. no other worker replayed and removed it"""
+    try:
+        return os.path.samestat(os.fstat(handle.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+def read_journal(path):
+    """Return the entries of a journal file that have no commit marker, in order"""
+    entries, committed = {}, 0
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-append
+                continue
+            if 'committed' in record:
+                committed = max(committed, record['committed'])
+            else:
+                entries[record['seq']] = record
+    return [entries[seq] for seq in sorted(entries) if seq > committed]
+
+
+class CheckinJournal:
+    """
+    Append-only journal plus a background group-commit thread
+    on_committed(entry) and on_failed(entry, result) are called for the
+    check-ins this journal acknowledged, once the database applied or
+    rejected them; replayed entries were acknowledged by another process
+    """
+
+    def __init__(self, app, directory, batch_size=200, flush_interval=0.05, fsync=False,
+                 compact_bytes=1 << 20, on_committed=None, on_failed=None):
+        self.app = app
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self.on_committed = on_committed
+        self.on_failed = on_failed
+        self.path = os.path.join(directory, f"checkins-{os.getpid()}.jsonl")
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []
+        self._pending_attendees = set()
+        self._pending_bands = set()
+        self._seq = 0
+        self._failures = deque(maxlen=100)
+        self._file = None
+        self._thread = None
+        self.running = False
+
+    # --- lifecycle ---
+    def start(self):
+        """Replay orphaned journals, open this process's journal and start the committer"""
+        if not locking_available():
+            # Every other worker's live journal would look orphaned
+            raise RuntimeError("Write-behind check-ins need file locks (fcntl), which this platform lacks")
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        # Lock our own journal before reading it: a previous process with the
+        # same pid may have left entries behind
+        self._file = open(self.path, 'a+')
+        if not _try_lock(self._file):
+            logging.warning(f"Check-in journal {self.path} is locked by another journal")
+        self._replay(self.path)
+        self._file.truncate(0)
+        self.replay_orphans()
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="checkin-journal", daemon=True)
+        self._thread.start()
+        logging.info(f"Write-behind check-in journal at {self.path}")
+
+    def stop(self):
+        """Commit everything still pending and stop the committer"""
+        self.running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._commit_pending()
+
+    def replay_orphans(self):
+        """Apply the uncommitted entries of journals not held by a live process"""
+        for path in sorted(glob.glob(os.path.join(self.directory, "checkins-*.jsonl"))):
+            if path == self.path:
+                continue
+            with open(path, 'a+') as handle:
+                if not _try_lock(handle):
+                    continue  # Owned by a running worker, or being replayed by one
+                if not _still_linked(handle, path):
+                    continue  # Replayed and removed by another worker while we waited
+                self._replay(path)
+                os.remove(path)
+
+    def _replay(self, path):
+        entries = read_journal(path)
+        if entries:
+            logging.info(f"Replaying {len(entries)} check-ins from {path}")
+            self._apply(entries, acknowledged=False)
+
+    # --- producers ---
+    def submit(self, attendee_id, band_id, gate=None):
+        """
+        Journal a check-in and acknowledge it without waiting for the database
+        Returns CHECKED_IN, or NOT_ELIGIBLE / BAND_IN_USE if it clashes with a
+        check-in that is still pending
+        """
+        with self._lock:
+            if attendee_id in self._pending_attendees:
+                return NOT_ELIGIBLE
+            if band_id in self._pending_bands:
+                return BAND_IN_USE
+            self._seq += 1
+            entry = {"seq": self._seq, "attendee_id": attendee_id, "band_id": band_id,
+                     "gate": gate, "ts": time.time()}
+            self._write(entry)
+            self._pending.append(entry)
+            self._pending_attendees.add(attendee_id)
+            self._pending_bands.add(band_id)
+            full = len(self._pending) >= self.batch_size
+        JOURNAL_PENDING.inc(outcome="queued")
+        if full:
+            self._wake.set()
+        return CHECKED_IN
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    # --- committer ---
+    def _run(self):
+        while self.running:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._commit_pending()
+            except Exception as e:
+                logging.error(f"Error in check-in group commit: {e}")
+                time.sleep(self.flush_interval)
+
+    def _commit_pending(self):
+        with self._lock:
+            batch = self._pending[:self.batch_size]
+        if not batch:
+            return
+
+        self._apply(batch)
+
+        with self._lock:
+            del self._pending[:len(batch)]
+            for entry in batch:
+                self._pending_attendees.discard(entry["attendee_id"])
+                self._pending_bands.discard(entry["band_id"])
+            self._write({"committed": batch[-1]["seq"]})
+            if not self._pending and self._file.tell() > self.compact_bytes:
+                # Everything is in the database; start the journal afresh
+                self._file.truncate(0)
+                self._file.seek(0)
+
+    def _apply(self, entries, acknowledged=True):
+        """Apply journal entries to the database in one transaction"""
+        with self.app.app_context():
+            with GROUP_COMMIT_SECONDS.time():
+                try:
+                    results = [atomic_checkin(entry["attendee_id"], entry["band_id"], commit=False,
+                                              gate=entry.get("gate"), at=entry.get("ts"))
+                               for entry in entries]
+                    db.session.commit()
+                except Exception:
+                    # Entries stay pending (and journaled) and are retried next round
+                    db.session.rollback()
+                    raise
+
+        for entry, result in zip(entries, results):
+            JOURNAL_PENDING.inc(outcome=result)
+            if result == CHECKED_IN:
+                if self.on_committed and acknowledged:
+                    self.on_committed(entry)
+                continue
+            if result == NOT_ELIGIBLE and self._replayed_own(entry):
+                continue
+            logging.error(f"Journaled check-in failed ({result}): attendee {entry['attendee_id']} "
+                          f"band {entry['band_id']}")
+            self._failures.append({**entry, "result": result})
+            if self.on_failed and acknowledged:
+                self.on_failed(entry, result)
+
+    def _replayed_own(self, entry):
+        """True if a NOT_ELIGIBLE result just means the entry was already applied before a crash"""
+        with self.app.app_context():
+            from models import Attendee
+            attendee = Attendee.query.get(entry["attendee_id"])
+            return attendee is not None and attendee.entry and attendee.band_id == entry["band_id"]
+
+    # --- introspection ---
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def recent_failures(self):
+        return list(self._failures)
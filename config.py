@@ -3,6 +3,30 @@ import os
 # Get the absolute path of the directory where this file is located
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+def is_sqlite_file(uri):
+    """True for a file-backed SQLite URI (not sqlite://, :memory: or mode=memory)"""
+    if not uri.startswith('sqlite'):
+        return False
+    database = uri.split('://', 1)[1].lstrip('/')
+    return database.split('?', 1)[0] not in ('', ':memory:') and ':memory:' not in database \
+        and 'mode=memory' not in database
+
+def engine_options(uri):
+    """
+    SQLAlchemy engine options for a database URI. Only file-backed SQLite gets
+    a sized connection pool; in-memory SQLite runs on a StaticPool, which
+    rejects the pool size options
+    """
+    if is_sqlite_file(uri):
+        return {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': 10,
+            'pool_pre_ping': True,
+            'connect_args': {'timeout': 5, 'check_same_thread': False},
+        }
+    return {'pool_pre_ping': True}
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-hard-to-guess-secret-key'
     
@@ -11,4 +35,156 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI') or \
         'sqlite:///' + os.path.join(basedir, 'instance', 'attendees.db')
         
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite tuning for several gates sharing one database file: WAL lets
+    # readers run alongside the writer, busy_timeout makes a blocked writer
+    # wait instead of failing with "database is locked", and synchronous=NORMAL
+    # is durable under WAL while skipping an fsync per commit
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'synchronous': 'NORMAL',
+    }
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # In-process attendee cache used by QR verification and check-in:
+    # max entries, TTL in seconds, and TTL for "no such attendee" results.
+    # Each worker has its own cache, so a check-in made through another
+    # worker shows up here once the entry expires; the conditional UPDATE
+    # still refuses the second check-in before that
+    ATTENDEE_CACHE_SIZE = int(os.environ.get('ATTENDEE_CACHE_SIZE', 10000))
+    ATTENDEE_CACHE_TTL = float(os.environ.get('ATTENDEE_CACHE_TTL', 60))
+    ATTENDEE_CACHE_NEGATIVE_TTL = float(os.environ.get('ATTENDEE_CACHE_NEGATIVE_TTL', 30))
+
+    # Largest batch accepted by the JSON check-in API (/api/checkins)
+    CHECKIN_BATCH_MAX = int(os.environ.get('CHECKIN_BATCH_MAX', 500))
+
+    # Dashboard page size (?per_page= is capped at DASHBOARD_MAX_PER_PAGE)
+    DASHBOARD_PER_PAGE = int(os.environ.get('DASHBOARD_PER_PAGE', 50))
+    DASHBOARD_MAX_PER_PAGE = int(os.environ.get('DASHBOARD_MAX_PER_PAGE', 200))
+
+    # Live dashboard (/dashboard/stream): events buffered per connected
+    # dashboard before it is told to reload, events kept for reconnecting
+    # clients, and seconds between keep-alive comments
+    DASHBOARD_EVENT_QUEUE = int(os.environ.get('DASHBOARD_EVENT_QUEUE', 100))
+    DASHBOARD_EVENT_HISTORY = int(os.environ.get('DASHBOARD_EVENT_HISTORY', 500))
+    DASHBOARD_KEEPALIVE_INTERVAL = float(os.environ.get('DASHBOARD_KEEPALIVE_INTERVAL', 15.0))
+
+    # Attendance statistics (/api/stats): minutes of per-minute check-in
+    # counts kept, and seconds between reloads from the database (0 = only at
+    # startup and on POST /api/stats/reload)
+    STATS_WINDOW_MINUTES = int(os.environ.get('STATS_WINDOW_MINUTES', 60))
+    STATS_RELOAD_INTERVAL = float(os.environ.get('STATS_RELOAD_INTERVAL', 0))
+
+    # Where the live dashboard and /api/stats learn about check-ins: 'local'
+    # counts the check-ins this process makes itself, 'db' polls the
+    # checkin_events table every CHECKIN_POLL_INTERVAL seconds and so sees the
+    # check-ins of every worker. Default: 'local' for workers with the scanner
+    # role, 'db' for dashboard/api-only workers; use 'db' whenever several
+    # workers take check-ins
+    LIVE_EVENTS = os.environ.get('LIVE_EVENTS', '')
+    CHECKIN_POLL_INTERVAL = float(os.environ.get('CHECKIN_POLL_INTERVAL', 1.0))
+
+    # Rows fetched per round trip by /export (memory stays bounded by this)
+    EXPORT_YIELD_PER = int(os.environ.get('EXPORT_YIELD_PER', 1000))
+
+    # Write-behind check-in: link_barcode appends to a journal file in
+    # CHECKIN_JOURNAL_DIR and acknowledges at once; a background thread commits
+    # up to CHECKIN_JOURNAL_BATCH check-ins per transaction every
+    # CHECKIN_JOURNAL_FLUSH_INTERVAL seconds. CHECKIN_JOURNAL_FSYNC=1 also
+    # fsyncs every append (survives power loss, not just a process crash)
+    CHECKIN_WRITE_BEHIND = os.environ.get('CHECKIN_WRITE_BEHIND', '0') == '1'
+    CHECKIN_JOURNAL_DIR = os.environ.get('CHECKIN_JOURNAL_DIR', os.path.join(basedir, 'instance', 'journal'))
+    CHECKIN_JOURNAL_BATCH = int(os.environ.get('CHECKIN_JOURNAL_BATCH', 200))
+    CHECKIN_JOURNAL_FLUSH_INTERVAL = float(os.environ.get('CHECKIN_JOURNAL_FLUSH_INTERVAL', 0.05))
+    CHECKIN_JOURNAL_FSYNC = os.environ.get('CHECKIN_JOURNAL_FSYNC', '0') == '1'
+
+    # What this worker serves, as a comma-separated subset of scanner (gate
+    # pages, video feeds, barcode entry), dashboard (dashboard, live stream,
+    # stats, export) and api (batched check-ins, stats, export). Only scanner
+    # workers set up gates, and even they load OpenCV and open a camera on the
+    # first video stream, so dashboard/API workers start fast and stay small
+    APP_ROLES = os.environ.get('APP_ROLES', 'scanner,dashboard,api')
+
+    # Gates (scanning lanes) served by this app as "gate_id:source,...", where
+    # source is a camera index or a frame source spec (see frame_sources.py),
+    # and where their scan state lives: memory:// (single worker),
+    # sqlite:///path (all workers on this machine) or redis://host:port/db.
+    # Shared state is re-read at most every GATE_STATE_POLL_INTERVAL seconds
+    # by the video pipeline
+    GATES = os.environ.get('GATES', 'main:0')
+    GATE_STATE_STORE = os.environ.get('GATE_STATE_STORE', 'memory://')
+    GATE_STATE_POLL_INTERVAL = float(os.environ.get('GATE_STATE_POLL_INTERVAL', 0.2))
+
+    # Camera capture settings (raise to e.g. 1280x720 for far-away phones and
+    # enable QR_PYRAMID_LEVELS to keep the per-frame cost down)
+    CAMERA_WIDTH = int(os.environ.get('CAMERA_WIDTH', 640))
+    CAMERA_HEIGHT = int(os.environ.get('CAMERA_HEIGHT', 480))
+    CAMERA_FPS = int(os.environ.get('CAMERA_FPS', 30))
+
+    # Frame source used by every gate instead of its camera, e.g. "synthetic",
+    # "video:/clips/lobby.mp4" or "images:/frames" (for testing without
+    # cameras), replayed at FRAME_SOURCE_FPS (default: CAMERA_FPS)
+    FRAME_SOURCE = os.environ.get('FRAME_SOURCE', '')
+    FRAME_SOURCE_FPS = int(os.environ.get('FRAME_SOURCE_FPS', 0))
+
+    # QR detection: cheap localization gate run before the decode cascade.
+    # 'finder' looks for finder patterns, 'detect' uses QRCodeDetector.detect(),
+    # 'off' always runs the full cascade.
+    QR_LOCALIZE_MODE = os.environ.get('QR_LOCALIZE_MODE', 'finder')
+    QR_FINDER_MIN_PATTERNS = int(os.environ.get('QR_FINDER_MIN_PATTERNS', 2))
+
+    # QR detection: locate candidates on the grayscale frame downscaled
+    # 2**QR_PYRAMID_LEVELS times (0 = off, 1 = 2x, 2 = 4x) and decode only the
+    # candidate crop at native resolution. Use 1: at 4x the finder patterns of
+    # rotated and small codes get too small to locate, and in bench_qr.py
+    # level 2 drops recall on rotated codes from 1.0 to 0.6-0.8 and on small
+    # codes to 0 (levels 0 and 1 read every rotated code)
+    QR_PYRAMID_LEVELS = int(os.environ.get('QR_PYRAMID_LEVELS', 0))
+
+    # QR detection: adaptive ordering of the OpenCV preprocessing cascade,
+    # learned from per-stage success counts (see /qr_stats). A stage is pruned
+    # once its decayed attempt count reaches QR_ADAPTIVE_PRUNE_AFTER (capped at
+    # half of 1 / (1 - QR_ADAPTIVE_DECAY), the most it can reach) with a success
+    # rate under QR_ADAPTIVE_PRUNE_RATE. A pruned stage only runs on the
+    # exploration frames (every QR_ADAPTIVE_EXPLORE_EVERY frames) until it
+    # decodes again; the best-ranked stage is never pruned
+    QR_ADAPTIVE_ORDER = os.environ.get('QR_ADAPTIVE_ORDER', '1') == '1'
+    QR_ADAPTIVE_EXPLORE_EVERY = int(os.environ.get('QR_ADAPTIVE_EXPLORE_EVERY', 25))
+    QR_ADAPTIVE_DECAY = float(os.environ.get('QR_ADAPTIVE_DECAY', 0.995))
+    QR_ADAPTIVE_PRUNE_AFTER = int(os.environ.get('QR_ADAPTIVE_PRUNE_AFTER', 200))
+    QR_ADAPTIVE_PRUNE_RATE = float(os.environ.get('QR_ADAPTIVE_PRUNE_RATE', 0.01))
+
+    # QR detection: skip frames whose 80x60 thumbnail differs from the last
+    # failed frame by less than QR_MOTION_THRESHOLD (mean abs grey levels in
+    # the most-changed 10x10 tile), but decode at least every
+    # QR_MOTION_MAX_SKIP-th frame; off by default until benchmarked on small
+    # codes. After a decode, decode only a crop around the code (bbox grown by
+    # QR_ROI_MARGIN on each side) for QR_ROI_TTL frames, each decode there
+    # renewing it, before going back to the full frame
+    QR_MOTION_GATE = os.environ.get('QR_MOTION_GATE', '0') == '1'
+    QR_MOTION_THRESHOLD = float(os.environ.get('QR_MOTION_THRESHOLD', 3.0))
+    QR_MOTION_MAX_SKIP = int(os.environ.get('QR_MOTION_MAX_SKIP', 10))
+    QR_ROI_TRACKING = os.environ.get('QR_ROI_TRACKING', '1') == '1'
+    QR_ROI_MARGIN = float(os.environ.get('QR_ROI_MARGIN', 0.5))
+    QR_ROI_TTL = int(os.environ.get('QR_ROI_TTL', 15))
+
+    # Video pipeline: detection worker threads, stream JPEG quality and the
+    # number of encoded frames kept in the shared viewer ring buffer
+    DETECTION_WORKERS = int(os.environ.get('DETECTION_WORKERS', 1))
+    JPEG_QUALITY = int(os.environ.get('JPEG_QUALITY', 85))
+    STREAM_BUFFER_SIZE = int(os.environ.get('STREAM_BUFFER_SIZE', 4))
+
+    # While the display is frozen (waiting for a barcode / error cooldown) the
+    # frame is encoded once; viewers re-send it every STREAM_KEEPALIVE_INTERVAL
+    # seconds and the encode stage re-checks the state every STREAM_IDLE_POLL
+    STREAM_KEEPALIVE_INTERVAL = float(os.environ.get('STREAM_KEEPALIVE_INTERVAL', 1.0))
+    STREAM_IDLE_POLL = float(os.environ.get('STREAM_IDLE_POLL', 0.1))
+
+    # Async mode (asgi.py): threads that run the regular Flask routes, so
+    # that many requests (check-ins, dashboard pages, exports) run at once
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+
+    # Default sampling interval (seconds) for the runtime profiler (/profiler/start)
+    PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.005))
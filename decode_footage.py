@@ -0,0 +1,203 @@
+"""
+Offline QR audit of recorded gate footage.
+
+Decodes every frame (or every --stride'th frame) of a video file or image
+directory with the same detect_qr_code cascade as the live gates, spread
+over a process pool, then verifies each decoded payload with verify_qr_code
+against the attendee table. Consecutive decodes of the same payload are
+merged into one sighting, and sightings are streamed to JSONL as soon as
+they end:
+
+    {"payload": "ID:12", "start_s": 61.2, "end_s": 62.9, "first_frame": 1836,
+     "last_frame": 1887, "decodes": 41, "attendee_id": 12, "name": "Aisha Khan",
+     "checked_in": true, "band_id": "B-0012"}
+
+Frames are read one chunk at a time and at most --in-flight chunks are
+queued for the workers, so memory stays bounded however long the footage is.
+
+Usage:
+    python decode_footage.py gate-north.mp4 -o north.jsonl
+    python decode_footage.py frames/ --fps 10 --workers 8 --stride 2
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import os
+import sys
+import time
+
+import cv2
+
+from frame_sources import IMAGE_EXTENSIONS
+
+_detect = None
+
+
+def iter_frames(path, fps=None, stride=1):
+    """
+    Yield (frame_index, seconds, frame) for every stride'th frame of a video
+    file or image directory, streaming; seconds come from the video's frame
+    rate (or fps) and, for image directories, from fps (default 1)
+    """
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+        rate = fps or 1.0
+        for index in range(0, len(names), stride):
+            frame = cv2.imread(os.path.join(path, names[index]))
+            if frame is not None:
+                yield index, index / rate, frame
+        return
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise OSError(f"Cannot open video: {path}")
+    rate = fps or capture.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    try:
+        while True:
+            if index % stride:
+                # grab() skips decoding the pixels of frames we do not look at
+                if not capture.grab():
+                    return
+            else:
+                success, frame = capture.read()
+                if not success:
+                    return
+                yield index, index / rate, frame
+            index += 1
+    finally:
+        capture.release()
+
+def iter_chunks(frames, size):
+    chunk = []
+    for item in frames:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- WORKERS ---
+def _init_worker():
+    """Load the detection cascade (just vision.py, not the web app) once per worker process"""
+    global _detect
+    cv2.setNumThreads(1)  # Parallelism comes from the pool; avoid oversubscribing cores
+    import vision
+    logging.getLogger().setLevel(logging.WARNING)
+    _detect = vision.detect_qr_code
+
+def _decode_chunk(chunk):
+    """Decode a chunk of (index, seconds, frame); returns [(index, seconds, payload or None)]"""
+    results = []
+    for index, seconds, frame in chunk:
+        data, _, _ = _detect(frame, tracker=None)
+        results.append((index, seconds, data or None))
+    return results
+
+def decode_parallel(frames, workers, chunk_size=8, in_flight=None):
+    """
+    Yield (index, seconds, payload or None) in frame order, decoding chunks of
+    frames on a process pool with at most in_flight chunks outstanding
+    """
+    in_flight = in_flight or workers * 2
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for chunk in iter_chunks(frames, chunk_size):
+            pending.append(pool.submit(_decode_chunk, chunk))
+            if len(pending) >= in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+# --- SIGHTINGS ---
+def iter_sightings(decodes, max_gap):
+    """
+    Merge consecutive decodes of the same payload into sightings; a sighting
+    ends when another payload is decoded or nothing is decoded for max_gap seconds
+    """
+    current = None
+    for index, seconds, payload in decodes:
+        if current is not None and (payload not in (None, current["payload"])
+                                    or seconds - current["end_s"] > max_gap):
+            yield current
+            current = None
+        if payload is None:
+            continue
+        if current is None:
+            current = {"payload": payload, "start_s": seconds, "end_s": seconds,
+                       "first_frame": index, "last_frame": index, "decodes": 0}
+        current["end_s"], current["last_frame"] = seconds, index
+        current["decodes"] += 1
+    if current is not None:
+        yield current
+
+def audit(sighting, verify):
+    """Add the attendee and check-in status of a sighting's payload"""
+    attendee = verify(sighting["payload"])
+    sighting["start_s"] = round(sighting["start_s"], 3)
+    sighting["end_s"] = round(sighting["end_s"], 3)
+    if attendee is None:
+        sighting.update(attendee_id=None, name=None, checked_in=None, band_id=None)
+    else:
+        sighting.update(attendee_id=attendee.id, name=f"{attendee.first_name} {attendee.last_name}",
+                        checked_in=attendee.entry, band_id=attendee.band_id)
+    return sighting
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode QR codes in recorded gate footage and audit them against check-ins")
+    parser.add_argument("path", help="Video file or directory of images")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode processes (default: all cores)")
+    parser.add_argument("--stride", type=int, default=1, help="Decode every Nth frame (default: 1)")
+    parser.add_argument("--fps", type=float, help="Frame rate for timestamps (default: the video's; 1 for images)")
+    parser.add_argument("--chunk", type=int, default=8, help="Frames per worker task (default: 8)")
+    parser.add_argument("--in-flight", type=int, help="Chunks queued for the pool at once (default: 2 per worker)")
+    parser.add_argument("--max-gap", type=float, default=1.0,
+                        help="Seconds without a decode that end a sighting (default: 1.0)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        parser.error(f"No such file or directory: {args.path}")
+
+    import app as gate_app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    started = time.perf_counter()
+    counts = {"frames": 0, "decodes": 0, "sightings": 0, "unknown": 0, "not_checked_in": 0}
+
+    def counted(decodes):
+        for item in decodes:
+            counts["frames"] += 1
+            counts["decodes"] += item[2] is not None
+            yield item
+
+    try:
+        with gate_app.app.app_context():
+            frames = iter_frames(args.path, args.fps, max(1, args.stride))
+            decodes = counted(decode_parallel(frames, args.workers, args.chunk, args.in_flight))
+            for sighting in iter_sightings(decodes, args.max_gap):
+                record = audit(sighting, gate_app.verify_qr_code)
+                counts["sightings"] += 1
+                counts["unknown"] += record["attendee_id"] is None
+                counts["not_checked_in"] += record["checked_in"] is False
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"Decoded {counts['frames']} frames in {elapsed:.1f}s ({counts['frames'] / elapsed:.1f} frames/s, "
+          f"{args.workers} workers): {counts['decodes']} decodes, {counts['sightings']} sightings, "
+          f"{counts['unknown']} unknown codes, {counts['not_checked_in']} never checked in", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+In-process event hub for live dashboard updates (Server-Sent Events).
+
+Check-in paths publish small deltas (attendee checked in, band assigned)
+to the hub; every connected dashboard has its own bounded queue and streams
+from it. A slow or stalled client can never block a gate: when its queue is
+full, the queue is dropped and replaced by a single "resync" event, after
+which the page reloads itself. Recent events are kept in a short history so
+a reconnecting EventSource (Last-Event-ID) gets what it missed. Event ids
+start from the hub's creation time in milliseconds, so an id from before a
+restart is never mistaken for one of this process; such clients get a
+resync.
+
+The hub is per process: with several workers, a dashboard sees the
+check-ins made through the worker it is connected to.
+"""
+from collections import deque
+import json
+import queue
+import threading
+import time
+
+import metrics
+
+EVENTS_PUBLISHED = metrics.REGISTRY.counter("gate_events_published_total", "Dashboard events published, by type")
+EVENTS_DROPPED = metrics.REGISTRY.counter("gate_events_dropped_total", "Dashboard subscribers resynced after overflowing")
+
+RESYNC = "resync"
+# Sent first on every stream: reconnect after 3 s if the connection drops
+SSE_PREAMBLE = "retry: 3000\n\n"
+
+
+class Subscription:
+    """One connected client: a bounded queue of (id, type, data) events"""
+
+    def __init__(self, maxsize, notify=None):
+        self.queue = queue.Queue(maxsize)
+        self.notify = notify
+
+    def offer(self, event):
+        """Queue an event without blocking; on overflow replace the backlog with a resync"""
+        try:
+            self.queue.put_nowait(event)
+            queued = True
+        except queue.Full:
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            self.queue.put_nowait((event[0], RESYNC, {}))
+            EVENTS_DROPPED.inc()
+            queued = False
+        if self.notify is not None:
+            self.notify()
+        return queued
+
+
+class EventHub:
+    """Fan-out of published events to every subscriber"""
+
+    def __init__(self, queue_size=100, history=500):
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._seq = int(time.time() * 1000)
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        """Send an event to every subscriber; never blocks on a slow client"""
+        with self._lock:
+            self._seq += 1
+            event = (self._seq, event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(event)
+        EVENTS_PUBLISHED.inc(type=event_type)
+
+    def subscribe(self, last_event_id=None, notify=None):
+        """
+        Register a subscriber; with last_event_id, events published after it are
+        queued first (or a resync if they are no longer in the history, or the
+        id is not one this hub has given out, e.g. from before a restart)
+        notify() is called from the publishing thread whenever an event is queued
+        """
+        subscription = Subscription(self.queue_size, notify)
+        with self._lock:
+            if last_event_id is not None and last_event_id != self._seq:
+                missed = [event for event in self._history if event[0] > last_event_id]
+                if not missed or missed[0][0] != last_event_id + 1 or len(missed) >= self.queue_size:
+                    subscription.offer((self._seq, RESYNC, {}))
+                else:
+                    for event in missed:
+                        subscription.offer(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stream(self, subscription, initial=(), keepalive=15.0):
+        """
+        Yield Server-Sent Events text for a subscription until the client goes
+        away: the initial (type, data) events first, then published events,
+        with a comment line every keepalive seconds of silence
+        """
+        try:
+            yield SSE_PREAMBLE
+            for event_type, data in initial:
+                yield format_sse(None, event_type, data)
+            while True:
+                try:
+                    event_id, event_type, data = subscription.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event_id, event_type, data)
+        finally:
+            self.unsubscribe(subscription)
+
+
+def format_sse(event_id, event_type, data):
+    """Encode one event in the text/event-stream format"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,110 @@
+"""
+Streaming attendance export.
+
+Attendees and their check-in status (band, gate and time of check-in) are
+read with a server-side cursor in chunks of yield_per rows and written out
+as CSV or JSONL as they arrive, so memory use does not grow with the number
+of attendees. Status and institute filters are applied in SQL. Used by the
+/export route and as a command-line tool.
+
+Usage:
+    python export_attendees.py attendance.csv
+    python export_attendees.py present.jsonl --status present --institute "IIT Delhi"
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+from sqlalchemy import func
+
+from models import db, Attendee, CheckinEvent
+
+COLUMNS = ('id', 'first_name', 'last_name', 'email', 'institute', 'entry', 'band_id', 'gate', 'checked_in_at')
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+STATUSES = ('all', 'present', 'absent')
+
+
+def export_query(status='all', institute=None):
+    """Attendee rows with their latest check-in event, filtered in SQL and ordered by id"""
+    latest = db.session.query(func.max(CheckinEvent.id).label('event_id')) \
+        .group_by(CheckinEvent.attendee_id).subquery()
+    query = db.session.query(
+        Attendee.id, Attendee.first_name, Attendee.last_name, Attendee.email, Attendee.institute,
+        Attendee.entry, Attendee.band_id, CheckinEvent.gate, CheckinEvent.checked_in_at,
+    ).outerjoin(CheckinEvent, (CheckinEvent.attendee_id == Attendee.id)
+                & CheckinEvent.id.in_(db.session.query(latest.c.event_id)))
+    if status == 'present':
+        query = query.filter(Attendee.entry.is_(True))
+    elif status == 'absent':
+        query = query.filter(Attendee.entry.is_(False))
+    if institute:
+        query = query.filter(Attendee.institute == institute)
+    return query.order_by(Attendee.id)
+
+def iter_records(query, yield_per=1000):
+    """Yield one dict per row, fetching yield_per rows at a time"""
+    for row in query.yield_per(yield_per):
+        record = dict(zip(COLUMNS, row))
+        record['entry'] = bool(record['entry'])
+        if record['checked_in_at'] is not None:
+            record['checked_in_at'] = record['checked_in_at'].isoformat()
+        yield record
+
+def iter_export(records, fmt='csv', chunk_rows=500):
+    """Encode records as CSV (with a header row) or JSONL, yielding text in chunks of chunk_rows rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS) if fmt == 'csv' else None
+    if writer is not None:
+        writer.writeheader()
+    rows = 0
+    for record in records:
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            buffer.write(json.dumps(record) + "\n")
+        rows += 1
+        if rows % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export attendees and check-in status as CSV or JSONL")
+    parser.add_argument('path', nargs='?', help="Output file (default: stdout)")
+    parser.add_argument('--format', choices=sorted(FORMATS), help="Output format (default: from the file extension, else csv)")
+    parser.add_argument('--status', choices=STATUSES, default='all', help="Only present or absent attendees")
+    parser.add_argument('--institute', help="Only attendees of this institute")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('jsonl' if args.path and args.path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+    from app import app
+
+    out = open(args.path, 'w', newline='') if args.path else sys.stdout
+    exported = 0
+
+    def counted(records):
+        nonlocal exported
+        for record in records:
+            exported += 1
+            yield record
+
+    try:
+        with app.app_context():
+            for chunk in iter_export(counted(iter_records(export_query(args.status, args.institute))), fmt):
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.path:
+        print(f"Exported {exported} attendees to {args.path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Frame sources for the scan pipeline.
+
+Everything the pipeline reads frames from looks like a cv2.VideoCapture
+(read(), isOpened(), set(), release()), so a gate can run on a webcam, a
+recorded video, a directory of still images or synthetic QR frames without
+any change to the capture/detect/encode stages. Non-camera sources are
+paced to a fixed FPS, like a real camera.
+
+Source specs (GATES entries and FRAME_SOURCE):
+    0, camera:0             webcam index 0
+    video:/path/clip.mp4    replay a video file (looped)
+    images:/path/to/dir     replay the images of a directory (sorted, looped)
+    synthetic               synthetic lobby frames; QR codes are shown on demand
+    synthetic:ID:12|ID:13   synthetic frames cycling through these QR payloads
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class PacedSource(ABC):
+    """
+    Base for non-camera sources: read() returns frames at most fps times a second
+    Subclasses implement _next_frame()
+    """
+
+    def __init__(self, fps=30):
+        self.fps = fps
+        self._next_at = None
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def set(self, prop, value):
+        """Camera properties do not apply; accepted and ignored like an unsupported camera setting"""
+        return False
+
+    def release(self):
+        self._opened = False
+
+    def _pace(self):
+        if not self.fps:
+            return
+        now = time.monotonic()
+        if self._next_at is None or self._next_at < now - 1.0:
+            # First frame, or we fell far behind: do not burst to catch up
+            self._next_at = now
+        elif self._next_at > now:
+            time.sleep(self._next_at - now)
+        self._next_at += 1.0 / self.fps
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        self._pace()
+        frame = self._next_frame()
+        return frame is not None, frame
+
+    @abstractmethod
+    def _next_frame(self):
+        """Return the next BGR frame, or None when no frame can be produced"""
+
+
+class VideoFileSource(PacedSource):
+    """Replays a video file, looping at the end, at the file's own frame rate unless fps is given"""
+
+    def __init__(self, path, fps=None, loop=True):
+        self.capture = cv2.VideoCapture(path)
+        super().__init__(fps or self.capture.get(cv2.CAP_PROP_FPS) or 30)
+        self.path = path
+        self.loop = loop
+        self._opened = self.capture.isOpened()
+
+    def _next_frame(self):
+        success, frame = self.capture.read()
+        if not success and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture.read()
+        return frame if success else None
+
+    def release(self):
+        super().release()
+        self.capture.release()
+
+
+class ImageDirectorySource(PacedSource):
+    """Replays the images of a directory in name order, looping"""
+
+    def __init__(self, path, fps=30, loop=True):
+        super().__init__(fps)
+        self.paths = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.loop = loop
+        self._index = 0
+        self._opened = bool(self.paths)
+
+    def _next_frame(self):
+        if self._index >= len(self.paths):
+            if not self.loop:
+                return None
+            self._index = 0
+        frame = cv2.imread(self.paths[self._index])
+        self._index += 1
+        return frame
+
+
+class SyntheticSource(PacedSource):
+    """
+    Synthetic gate frames built with the bench_qr corpus helpers: a cluttered
+    background, with a QR code held up for hold_frames frames whenever one is
+    presented. present(payload) queues a code (used by the load test);
+    with a payloads list the source cycles through it on its own
+    """
+
+    def __init__(self, fps=30, payloads=None, hold_frames=15, gap_frames=5, category="clean", seed=0):
+        super().__init__(fps)
+        import bench_qr
+        self._bench = bench_qr
+        self._rng = np.random.RandomState(seed)
+        self.payloads = list(payloads or [])
+        self.hold_frames = hold_frames
+        self.gap_frames = gap_frames
+        self.category = category
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._cycle = 0
+        self._current = None     # Frame being held up, and how many more reads it stays
+        self._remaining = 0
+        self._gap = 0
+        self._background = bench_qr.make_background(self._rng)
+
+    def present(self, payload):
+        """Hold up a QR code with this payload for the next hold_frames frames (after any queued ones)"""
+        with self._lock:
+            self._queue.append(payload)
+
+    def clear(self):
+        """Stop showing the current code (the attendee lowers their phone) and drop queued ones"""
+        with self._lock:
+            self._queue.clear()
+            self._remaining = 0
+
+    def _next_payload(self):
+        with self._lock:
+            if self._queue:
+                return self._queue.popleft()
+        if self.payloads:
+            payload = self.payloads[self._cycle % len(self.payloads)]
+            self._cycle += 1
+            return payload
+        return None
+
+    def _next_frame(self):
+        if self._remaining > 0:
+            self._remaining -= 1
+            return self._current.copy()
+        if self._gap > 0:
+            self._gap -= 1
+            return self._background.copy()
+
+        payload = self._next_payload()
+        if payload is None:
+            return self._background.copy()
+        self._current = self._bench.make_frame(self.category, payload, self._rng)
+        self._remaining = self.hold_frames - 1
+        self._gap = self.gap_frames
+        return self._current.copy()
+
+
+def open_camera(index, width=640, height=480, fps=30):
+    """Open a webcam with the gate capture settings; None if it cannot be opened"""
+    camera = cv2.VideoCapture(index)
+    if not camera.isOpened():
+        return None
+    # Set camera properties for better performance
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    camera.set(cv2.CAP_PROP_FPS, fps)
+    # Additional settings for better QR detection
+    try:
+        camera.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)
+        camera.set(cv2.CAP_PROP_EXPOSURE, -6)
+    except:
+        pass  # Some cameras don't support these settings
+    return camera
+
+def open_frame_source(spec, width=640, height=480, fps=30):
+    """
+    Open a frame source from a spec (see the module docstring); returns None
+    if it cannot be opened. fps is the camera rate, and the replay rate of
+    image and synthetic sources
+    """
+    spec = str(spec).strip()
+    kind, _, arg = spec.partition(':')
+    try:
+        if spec.isdigit():
+            return open_camera(int(spec), width, height, fps)
+        if kind == 'camera':
+            return open_camera(int(arg or 0), width, height, fps)
+        if kind == 'video':
+            source = VideoFileSource(arg)
+        elif kind == 'images':
+            source = ImageDirectorySource(arg, fps)
+        elif kind == 'synthetic':
+            payloads = [p for p in arg.split('|') if p] if arg else None
+            source = SyntheticSource(fps, payloads)
+        else:
+            raise ValueError(f"Unknown frame source: {spec}")
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not open frame source {spec}: {e}")
+        return None
+    return source if source.isOpened() else None
@@ -0,0 +1,257 @@
+"""
+Per-gate scan state.
+
+Each Gate (a lane with its own camera) carries its own QR-then-barcode state
+machine. The durable part of that state - whether the gate is waiting for a
+barcode, for which attendee, and when the last QR was read - lives in a
+pluggable StateStore so that several worker processes can serve the same
+gate: the worker that owns the camera detects QR codes, while barcode
+submissions and resets may land on any worker.
+
+Stores:
+    memory://                       in-process only (single worker)
+    sqlite:///path/to/gates.db      shared by all processes on the machine
+    redis://localhost:6379/0        shared via Redis (needs the redis package)
+
+The frozen frame, the camera (frame source) and the video pipeline stay
+process-local.
+"""
+from collections import namedtuple
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+GateState = namedtuple('GateState', ['waiting_for_barcode', 'current_attendee_id', 'last_qr_time', 'version'])
+INITIAL_STATE = GateState(False, None, 0.0, 0)
+
+
+class MemoryStateStore:
+    """Gate state kept in this process; changes wake waiters immediately"""
+
+    shared = False
+
+    def __init__(self):
+        self._states = {}
+        self._cond = threading.Condition()
+
+    def get(self, gate_id):
+        with self._cond:
+            return self._states.get(gate_id, INITIAL_STATE)
+
+    def update(self, gate_id, **changes):
+        """Apply changes to a gate's state and bump its version; returns the new state"""
+        with self._cond:
+            state = self._states.get(gate_id, INITIAL_STATE)
+            state = state._replace(version=state.version + 1, **changes)
+            self._states[gate_id] = state
+            self._cond.notify_all()
+            return state
+
+    def wait_for_change(self, gate_id, version, timeout):
+        """Block until the gate's state version differs from version, or timeout"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._states.get(gate_id, INITIAL_STATE).version != version, timeout)
+            return self._states.get(gate_id, INITIAL_STATE)
+
+
+class SQLiteStateStore:
+    """Gate state in a small SQLite file shared by all worker processes on the machine"""
+
+    shared = True
+
+    def __init__(self, path, poll_interval=0.1):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS gate_state (
+                gate_id TEXT PRIMARY KEY,
+                waiting_for_barcode INTEGER NOT NULL DEFAULT 0,
+                current_attendee_id INTEGER,
+                last_qr_time REAL NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0
+            )""")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, conn, gate_id):
+        row = conn.execute("SELECT waiting_for_barcode, current_attendee_id, last_qr_time, version "
+                           "FROM gate_state WHERE gate_id = ?", (gate_id,)).fetchone()
+        if row is None:
+            return INITIAL_STATE
+        return GateState(bool(row[0]), row[1], row[2], row[3])
+
+    def get(self, gate_id):
+        return self._read(self._connect(), gate_id)
+
+    def update(self, gate_id, **changes):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = self._read(conn, gate_id)
+            state = state._replace(version=state.version + 1, **changes)
+            conn.execute("INSERT OR REPLACE INTO gate_state "
+                         "(gate_id, waiting_for_barcode, current_attendee_id, last_qr_time, version) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         (gate_id, int(state.waiting_for_barcode), state.current_attendee_id,
+                          state.last_qr_time, state.version))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return state
+
+    def wait_for_change(self, gate_id, version, timeout):
+        deadline = time.monotonic() + timeout
+        state = self.get(gate_id)
+        while state.version == version and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            state = self.get(gate_id)
+        return state
+
+
+class RedisStateStore:
+    """Gate state in Redis hashes (one per gate), shared by processes on any machine"""
+
+    shared = True
+
+    def __init__(self, url, poll_interval=0.1):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def _key(gate_id):
+        return f"gate_state:{gate_id}"
+
+    @staticmethod
+    def _parse(values):
+        if not values:
+            return INITIAL_STATE
+        attendee_id = values.get('current_attendee_id')
+        return GateState(values.get('waiting_for_barcode') == '1',
+                         int(attendee_id) if attendee_id else None,
+                         float(values.get('last_qr_time', 0)),
+                         int(values.get('version', 0)))
+
+    def get(self, gate_id):
+        return self._parse(self._redis.hgetall(self._key(gate_id)))
+
+    def update(self, gate_id, **changes):
+        key = self._key(gate_id)
+
+        def apply(pipe):
+            state = self._parse(pipe.hgetall(key))
+            state = state._replace(version=state.version + 1, **changes)
+            pipe.multi()
+            pipe.hset(key, mapping={
+                'waiting_for_barcode': '1' if state.waiting_for_barcode else '0',
+                'current_attendee_id': '' if state.current_attendee_id is None else str(state.current_attendee_id),
+                'last_qr_time': repr(state.last_qr_time),
+                'version': str(state.version),
+            })
+            return state
+
+        return self._redis.transaction(apply, key, value_from_callable=True)
+
+    def wait_for_change(self, gate_id, version, timeout):
+        deadline = time.monotonic() + timeout
+        state = self.get(gate_id)
+        while state.version == version and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            state = self.get(gate_id)
+        return state
+
+
+def make_state_store(url):
+    """
+    Build a StateStore from a URL (memory://, sqlite:///path, redis://...)
+    Raises ImportError for a redis:// URL when the optional redis package is missing
+    """
+    if not url or url.startswith('memory://'):
+        return MemoryStateStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteStateStore(url[len('sqlite:///'):])
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        try:
+            return RedisStateStore(url)
+        except ImportError as e:
+            # Not the URL itself: it may carry a password
+            raise ImportError(f"GATE_STATE_STORE={url.split(':', 1)[0]}://... needs the optional redis package "
+                              f"(pip install redis, see requirements.txt): {e}") from e
+    raise ValueError(f"Unsupported gate state store: {url}")
+
+def parse_gates(spec):
+    """
+    Parse a GATES spec like "main:0,side:1" into an ordered {gate_id: source} dict
+    The source is a camera index or any frame source spec ("side:video:/clips/side.mp4")
+    """
+    gates = {}
+    for entry in (spec or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        gate_id, _, source = entry.partition(':')
+        gates[gate_id.strip()] = source.strip() or '0'
+    return gates or {'main': '0'}
+
+
+class Gate:
+    """
+    One scanning lane: its camera (frame source) and video pipeline, its
+    frozen frame and detection tracker (process-local), and its state in the
+    shared store
+    """
+
+    def __init__(self, gate_id, source, store, poll_interval=0.2):
+        self.id = gate_id
+        self.source = source
+        self.store = store
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()      # Guards state changes made from this process
+        self.frozen_frame = None
+        self.camera = None
+        self.pipeline = None
+        self.tracker = None
+        self._cached_state = None
+        self._cached_at = 0.0
+
+    def state(self):
+        """Current GateState; shared stores are re-read at most every poll_interval seconds"""
+        if not self.store.shared:
+            return self.store.get(self.id)
+        now = time.monotonic()
+        if self._cached_state is None or now - self._cached_at >= self.poll_interval:
+            self._cached_state = self.store.get(self.id)
+            self._cached_at = now
+        return self._cached_state
+
+    def update(self, **changes):
+        state = self.store.update(self.id, **changes)
+        self._cached_state, self._cached_at = state, time.monotonic()
+        if self.pipeline is not None:
+            self.pipeline.wake()
+        return state
+
+    def reset(self):
+        """Back to "please scan": no attendee, no frozen frame, no cooldown"""
+        with self.lock:
+            self.frozen_frame = None
+            self.update(waiting_for_barcode=False, current_attendee_id=None, last_qr_time=0.0)
+        logging.info(f"Gate {self.id}: state reset")
+
+    def __repr__(self):
+        return f'<Gate {self.id} source={self.source}>'
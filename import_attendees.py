@@ -0,0 +1,174 @@
+"""
+Bulk attendee import from a registration export.
+
+Streams a CSV (with a header row) or JSONL file and upserts attendees on
+email in large batched INSERT ... ON CONFLICT (email) DO UPDATE statements,
+one transaction per batch. Only the registration fields (first_name,
+last_name, email, institute) are written: band_id and entry of attendees
+already in the database are left alone, so re-importing an updated export
+mid-event keeps every check-in. Memory use is bounded by the batch size.
+
+Usage:
+    python import_attendees.py attendees.csv
+    python import_attendees.py attendees.jsonl --batch-size 5000 --rejects rejects.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import text
+
+from models import db, Attendee
+
+FIELDS = ('first_name', 'last_name', 'email', 'institute')
+# Column length limits, taken from the model so rejected rows never reach the database
+MAX_LENGTHS = {name: Attendee.__table__.c[name].type.length for name in FIELDS}
+
+
+def iter_rows(path, fmt=None):
+    """Yield (line_number, dict) for each record of a CSV or JSONL file, streaming"""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_number, {'_error': f"invalid JSON: {e}"}
+                    continue
+                yield line_number, record if isinstance(record, dict) else {'_error': "not a JSON object"}
+
+def clean_row(row):
+    """
+    Normalize one input record to {field: value}
+    Returns (values, None) or (None, reason) for rows that cannot be imported
+    """
+    if '_error' in row:
+        return None, row['_error']
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    values = {}
+    for name in FIELDS:
+        value = str(row.get(name) or '').strip()
+        if not value:
+            return None, f"missing {name}"
+        if len(value) > MAX_LENGTHS[name]:
+            return None, f"{name} longer than {MAX_LENGTHS[name]} characters"
+        values[name] = value
+    if '@' not in values['email']:
+        return None, "invalid email"
+    return values, None
+
+def upsert_statement():
+    """INSERT ... ON CONFLICT (email) DO UPDATE of the registration fields, for the current dialect"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise RuntimeError(f"Bulk upsert is not supported on {dialect}")
+    stmt = insert(Attendee)
+    return stmt.on_conflict_do_update(
+        index_elements=[Attendee.email],
+        set_={name: stmt.excluded[name] for name in FIELDS if name != 'email'},
+    )
+
+def upsert_attendees(rows, batch_size=5000):
+    """
+    Upsert an iterable of {first_name, last_name, email, institute} dicts on
+    email, committing every batch_size rows; returns the number of rows written
+    """
+    stmt = upsert_statement()
+    written = 0
+    batch = {}
+    for values in rows:
+        # Last occurrence of an email within a batch wins
+        batch[values['email']] = values
+        if len(batch) >= batch_size:
+            written += _flush(stmt, batch)
+    if batch:
+        written += _flush(stmt, batch)
+    return written
+
+def _flush(stmt, batch):
+    db.session.execute(stmt, list(batch.values()))
+    db.session.commit()
+    count = len(batch)
+    batch.clear()
+    return count
+
+def analyze_attendees():
+    """
+    Refresh SQLite's statistics for the attendees table. Without them the
+    planner walks the sort index instead of using the lower() indexes for a
+    dashboard search (other databases keep their statistics themselves)
+    """
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text("ANALYZE attendees"))
+        db.session.commit()
+
+def import_file(path, fmt=None, batch_size=5000, rejects=None):
+    """
+    Import one file; rejected rows are written to the rejects file object as
+    JSON lines (when given) and counted
+    Returns a stats dict: read, written, rejected, seconds, rows_per_second
+    """
+    stats = {'read': 0, 'rejected': 0}
+    started = time.perf_counter()
+
+    def accepted():
+        for line_number, row in iter_rows(path, fmt):
+            stats['read'] += 1
+            values, reason = clean_row(row)
+            if values is None:
+                stats['rejected'] += 1
+                if rejects is not None:
+                    rejects.write(json.dumps({'line': line_number, 'reason': reason, 'row': row}) + "\n")
+                continue
+            yield values
+
+    stats['written'] = upsert_attendees(accepted(), batch_size)
+    analyze_attendees()
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_second'] = stats['read'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a CSV/JSONL registration export into the attendees table")
+    parser.add_argument('path', help="CSV file with a header row, or JSONL file")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file extension)")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT/commit (default: 5000)")
+    parser.add_argument('--rejects', help="Write rejected rows to this JSONL file")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        parser.error(f"No such file: {args.path}")
+
+    from app import app  # create_app() creates any missing tables
+
+    rejects = open(args.rejects, 'w') if args.rejects else None
+    try:
+        with app.app_context():
+            stats = import_file(args.path, args.format, args.batch_size, rejects)
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+    print(f"Read {stats['read']} rows in {stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/sec)")
+    print(f"Upserted {stats['written']} attendees, rejected {stats['rejected']} rows"
+          + (f" (see {args.rejects})" if args.rejects and stats['rejected'] else ""))
+    return 1 if stats['rejected'] and not stats['written'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+End-to-end load test for the gate app, no cameras needed.
+
+Runs the app in-process with N gates fed by synthetic frame sources
+(frame_sources.SyntheticSource) at a fixed FPS, against a scratch SQLite
+database seeded with generated attendees. Each simulated gate repeatedly:
+
+1. holds up an attendee's QR code and waits until the pipeline has detected
+   and verified it (the gate is waiting for a barcode)       -> "scan"
+2. POSTs /attach_barcode_manual/<gate> with a new band       -> "checkin"
+
+while dashboard clients page through /dashboard               -> "dashboard"
+
+and reports throughput and p50/p95/p99 latency per operation.
+
+Usage:
+    python loadtest.py --gates 4 --duration 30
+    python loadtest.py --gates 8 --dashboards 4 --fps 15 --json loadtest.json
+"""
+import argparse
+from collections import Counter
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from bench_qr import percentile
+
+
+class Recorder:
+    """Thread-safe latency samples and error counts per operation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = Counter()
+
+    def record(self, op, seconds):
+        with self._lock:
+            self.latencies.setdefault(op, []).append(seconds * 1000.0)
+
+    def error(self, op, reason):
+        with self._lock:
+            self.errors[f"{op}:{reason}"] += 1
+
+    def report(self, elapsed):
+        with self._lock:
+            ops = {}
+            for op, samples in sorted(self.latencies.items()):
+                ops[op] = {
+                    "n": len(samples),
+                    "per_second": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+                    "p50_ms": round(percentile(samples, 50), 2),
+                    "p95_ms": round(percentile(samples, 95), 2),
+                    "p99_ms": round(percentile(samples, 99), 2),
+                    "max_ms": round(max(samples), 2),
+                }
+            return {"elapsed_s": round(elapsed, 2), "operations": ops, "errors": dict(self.errors)}
+
+
+def configure_environment(args):
+    """Point the app at synthetic gates and a scratch database; must run before app is imported"""
+    os.environ['GATES'] = ",".join(f"lt{i}:synthetic" for i in range(args.gates))
+    os.environ['FRAME_SOURCE'] = ''
+    os.environ['FRAME_SOURCE_FPS'] = str(args.fps)
+    os.environ['GATE_STATE_STORE'] = 'memory://'
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='gate-loadtest-'), 'loadtest.db')
+    os.environ['DATABASE_URI'] = f"sqlite:///{database}"
+    return database
+
+def seed_attendees(count):
+    """Upsert count generated attendees (create_app made the tables); returns the ids not checked in yet"""
+    from models import db, Attendee
+    from import_attendees import upsert_attendees
+
+    institutes = [f"Institute {i}" for i in range(20)]
+    upsert_attendees({'first_name': f"Load{i}", 'last_name': f"Tester{i}",
+                      'email': f"load{i}@example.com", 'institute': institutes[i % len(institutes)]}
+                     for i in range(count))
+    return [attendee_id for (attendee_id,) in
+            db.session.query(Attendee.id).filter(Attendee.entry.is_(False)).order_by(Attendee.id)]
+
+
+def run_gate(gate_app, gate, next_attendee, recorder, stop_at, scan_timeout):
+    """One simulated gate: scan a QR code, then attach a barcode, until stop_at or out of attendees"""
+    client = gate_app.app.test_client()
+    pipeline = gate_app.get_pipeline(gate)
+    if pipeline is None:
+        recorder.error("gate", "no_frame_source")
+        return
+    pipeline.attach()  # Stands in for a viewer, which is what starts the pipeline
+    source = gate.camera
+    try:
+        while time.monotonic() < stop_at:
+            attendee_id = next_attendee()
+            if attendee_id is None:
+                return
+
+            started = time.perf_counter()
+            source.present(f"ID:{attendee_id}")
+            deadline = time.monotonic() + scan_timeout
+            state = gate.store.get(gate.id)
+            while not (state.waiting_for_barcode and state.current_attendee_id == attendee_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                state = gate.store.wait_for_change(gate.id, state.version, remaining)
+            source.clear()
+            if not (state.waiting_for_barcode and state.current_attendee_id == attendee_id):
+                recorder.error("scan", "timeout")
+                client.post(f"/reset/{gate.id}")
+                continue
+            recorder.record("scan", time.perf_counter() - started)
+
+            started = time.perf_counter()
+            response = client.post(f"/attach_barcode_manual/{gate.id}", data={"barcode": f"LT-{attendee_id}"})
+            recorder.record("checkin", time.perf_counter() - started)
+            if response.status_code != 302:
+                recorder.error("checkin", f"http_{response.status_code}")
+            elif gate.store.get(gate.id).waiting_for_barcode:
+                recorder.error("checkin", "not_reset")
+    finally:
+        pipeline.detach()
+
+def run_dashboard(gate_app, recorder, stop_at, pages, interval, seed):
+    """One supervisor paging through the dashboard"""
+    client = gate_app.app.test_client()
+    rng = random.Random(seed)
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        response = client.get(f"/dashboard?page={rng.randint(1, pages)}")
+        recorder.record("dashboard", time.perf_counter() - started)
+        if response.status_code != 200:
+            recorder.error("dashboard", f"http_{response.status_code}")
+        if interval:
+            time.sleep(interval)
+
+
+def print_report(report, args):
+    print(f"\n=== Load test: {args.gates} gates @ {args.fps} fps, {args.dashboards} dashboards, "
+          f"{report['elapsed_s']}s ===")
+    header = f"{'operation':<12} {'n':>7} {'per sec':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for op, s in report["operations"].items():
+        print(f"{op:<12} {s['n']:>7} {s['per_second']:>9.2f} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} "
+              f"{s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    if report["errors"]:
+        print("\nErrors: " + ", ".join(f"{name}={count}" for name, count in sorted(report["errors"].items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive simulated gates and dashboards against the app in-process")
+    parser.add_argument("--gates", type=int, default=2, help="Simulated gates (default: 2)")
+    parser.add_argument("--fps", type=int, default=30, help="Synthetic camera frame rate per gate (default: 30)")
+    parser.add_argument("--dashboards", type=int, default=1, help="Concurrent dashboard clients (default: 1)")
+    parser.add_argument("--dashboard-interval", type=float, default=0.5,
+                        help="Seconds between a dashboard client's requests (default: 0.5)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (default: 30)")
+    parser.add_argument("--attendees", type=int, default=5000, help="Attendees to seed (default: 5000)")
+    parser.add_argument("--scan-timeout", type=float, default=5.0, help="Seconds to wait for a QR decode (default: 5)")
+    parser.add_argument("--database", help="SQLite file to use (default: a scratch file)")
+    parser.add_argument("--json", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    database = configure_environment(args)
+    import app as gate_app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with gate_app.app.app_context():
+        attendee_ids = seed_attendees(args.attendees)
+    print(f"Seeded {len(attendee_ids)} attendees in {database}")
+
+    pool = iter(attendee_ids)
+    pool_lock = threading.Lock()
+    def next_attendee():
+        with pool_lock:
+            return next(pool, None)
+
+    recorder = Recorder()
+    started = time.monotonic()
+    stop_at = started + args.duration
+    pages = max(1, args.attendees // gate_app.app.config['DASHBOARD_PER_PAGE'])
+    threads = [threading.Thread(target=run_gate, name=f"loadtest-{gate.id}",
+                                args=(gate_app, gate, next_attendee, recorder, stop_at, args.scan_timeout))
+               for gate in gate_app.GATES.values()]
+    threads += [threading.Thread(target=run_dashboard, name=f"loadtest-dashboard-{i}",
+                                 args=(gate_app, recorder, stop_at, pages, args.dashboard_interval, i))
+                for i in range(args.dashboards)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = recorder.report(time.monotonic() - started)
+    report["config"] = vars(args)
+    print_report(report, args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
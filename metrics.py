@@ -0,0 +1,200 @@
+"""
+Lightweight in-process metrics for the gate hot path.
+
+Counters and histograms are kept in a module-level registry and rendered in
+the Prometheus text exposition format by the /metrics route. A sampling
+profiler can be switched on at runtime to see where CPU time goes without
+attaching a debugger.
+"""
+from collections import Counter as _Tally
+from contextlib import contextmanager
+import sys
+import threading
+import time
+
+# Latency buckets in seconds: 0.5 ms .. 2.5 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=None):
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in items)
+    return "{" + body + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (seconds), optionally split by labels"""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    """Holds all metrics and renders them for /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- HOT PATH METRICS ---
+CAPTURE_SECONDS = REGISTRY.histogram("gate_capture_seconds", "Time spent in cam.read()")
+CAPTURE_FAILURES = REGISTRY.counter("gate_capture_failures_total", "Failed cam.read() calls")
+DETECT_STAGE_SECONDS = REGISTRY.histogram("gate_detect_stage_seconds", "Time per QR detection stage")
+DETECT_FRAMES = REGISTRY.counter("gate_detect_frames_total", "Frames seen by detect_qr_code, by outcome")
+DB_SECONDS = REGISTRY.histogram("gate_db_seconds", "Time per database operation")
+DRAW_SECONDS = REGISTRY.histogram("gate_overlay_draw_seconds", "Time spent drawing the status overlay")
+ENCODE_SECONDS = REGISTRY.histogram("gate_jpeg_encode_seconds", "Time spent in cv2.imencode")
+FRAMES_PUBLISHED = REGISTRY.counter("gate_frames_published_total", "Encoded frames published to viewers")
+CHECKINS = REGISTRY.counter("gate_checkins_total", "Check-in attempts, by result")
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all threads every interval seconds and
+    aggregates them as collapsed stacks (one "frame;frame;frame count" line
+    per distinct stack, the input format of flamegraph tools)
+    """
+
+    def __init__(self):
+        self._stacks = _Tally()
+        self._samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.interval = None
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.005):
+        """Start sampling; clears the previous profile"""
+        if self.running:
+            return
+        with self._lock:
+            self._stacks = _Tally()
+            self._samples = 0
+        self.interval = interval
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self._samples += 1
+
+    def report(self):
+        """Return the collapsed stacks collected so far, most frequent first"""
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+            samples = self._samples
+        header = f"# samples={samples} interval={self.interval} running={self.running}"
+        return "\n".join([header] + lines) + "\n"
+
+
+profiler = SamplingProfiler()
@@ -1,4 +1,8 @@
+import os
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func
+from sqlalchemy.schema import CreateIndex
 
 db = SQLAlchemy()
 
@@ -15,7 +19,72 @@ class Attendee(db.Model):
     institute = db.Column(db.String(150), nullable=False)
     band_id = db.Column(db.String(50), nullable=True, unique=True)
     # <-- NEW FEATURE: Add an 'entry' column to track attendance
-    entry = db.Column(db.Boolean, default=False, nullable=False)
+    entry = db.Column(db.Boolean, default=False, nullable=False, index=True)
+
+    # Case-insensitive prefix search and sorting on the dashboard
+    __table_args__ = (
+        db.Index('ix_attendees_first_name_lower', func.lower(first_name)),
+        db.Index('ix_attendees_last_name_lower', func.lower(last_name)),
+        db.Index('ix_attendees_email_lower', func.lower(email)),
+        db.Index('ix_attendees_institute_lower', func.lower(institute)),
+    )
+
+    def __repr__(self):
+        return f'<Attendee {self.first_name} {self.last_name}>'
+
+class CheckinEvent(db.Model):
+    """
+    One successful check-in: when, at which gate, who and with which band.
+    """
+    __tablename__ = 'checkin_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    attendee_id = db.Column(db.Integer, db.ForeignKey('attendees.id'), nullable=False, index=True)
+    band_id = db.Column(db.String(50), nullable=False)
+    gate = db.Column(db.String(50), nullable=True)
+    checked_in_at = db.Column(db.DateTime, nullable=False, index=True)
 
     def __repr__(self):
-        return f'<Attendee {self.first_name} {self.last_name}>'
\ No newline at end of file
+        return f'<CheckinEvent attendee={self.attendee_id} gate={self.gate} at={self.checked_in_at}>'
+
+def configure_sqlite(app):
+    """Apply SQLITE_PRAGMAS from the config to every new SQLite connection"""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite' or not pragmas:
+            return
+
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+        # Connections opened before the listener was added do not have the pragmas
+        engine.dispose()
+
+def ensure_indexes():
+    """
+    Create indexes added after a table was first created (create_all skips
+    existing tables). IF NOT EXISTS rather than checkfirst: SQLite reflection
+    does not report the lower() expression indexes, so checkfirst would try
+    to create them again
+    """
+    with db.engine.begin() as connection:
+        for model in (Attendee, CheckinEvent):
+            for index in model.__table__.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+
+def init_db(app):
+    """
+    Create missing tables and indexes; the one place the schema is created
+    (called by app.create_app). SQLite's database directory is created too
+    """
+    with app.app_context():
+        url = db.engine.url
+        if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+        db.create_all()
+        ensure_indexes()
@@ -0,0 +1,309 @@
+"""
+Threaded capture -> detect -> encode pipeline for the video feed.
+
+The camera is read by its own thread, which only ever keeps the latest frame,
+so slow consumers drop stale frames instead of queueing them. Detection runs
+on a small worker pool (OpenCV releases the GIL while decoding) and is fed
+only when a worker is free, while the encode stage draws and JPEG-encodes
+frames at camera rate. Each JPEG is encoded once and published to a
+FrameBroadcaster, from which every connected viewer streams.
+
+While the display is frozen (render() keeps returning the same image) nothing
+is re-encoded: the encode stage sleeps until woken or until the idle poll
+interval passes, and viewers re-send the cached JPEG at a keep-alive rate.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+import cv2
+
+import metrics
+
+
+class LatestFrameCapture:
+    """Reads frames from a camera on a background thread, keeping only the latest one"""
+
+    def __init__(self, camera, max_failures=30):
+        self.camera = camera
+        self.max_failures = max_failures
+        self.running = False
+        self._frame = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="frame-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=False, timeout=2.0):
+        """Stop reading; with wait, also wait (up to timeout) for a camera.read() in progress"""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if wait:
+            _join(self._thread, timeout)
+
+    def _run(self):
+        failures = 0
+        while self.running:
+            with metrics.CAPTURE_SECONDS.time():
+                success, frame = self.camera.read()
+            if not success:
+                metrics.CAPTURE_FAILURES.inc()
+                failures += 1
+                if failures >= self.max_failures:
+                    logging.error("Failed to read from camera")
+                    self.stop()
+                continue
+            failures = 0
+            with self._cond:
+                self._frame = frame
+                self._seq += 1
+                self._cond.notify_all()
+
+    def wait_for_frame(self, after_seq, timeout=1.0):
+        """
+        Wait for a frame newer than after_seq
+        Returns (seq, frame), or (after_seq, None) on timeout or when stopped
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or not self.running, timeout)
+            if self._seq > after_seq:
+                return self._seq, self._frame
+            return after_seq, None
+
+
+def _join(thread, timeout):
+    """Join a stage thread (unless called from it); warn if it does not finish in time"""
+    if thread is None or thread is threading.current_thread():
+        return
+    thread.join(timeout)
+    if thread.is_alive():
+        logging.warning(f"{thread.name} thread did not stop within {timeout}s")
+
+
+class FrameBroadcaster:
+    """Ring buffer of encoded frames, written once by the pipeline and read by every viewer"""
+
+    def __init__(self, size=4):
+        self._frames = deque(maxlen=size)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._listeners = []
+        self.closed = False
+
+    def add_listener(self, callback):
+        """Call callback() (from the publishing thread) after every publish and on close"""
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify_listeners(self):
+        with self._cond:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Error in frame listener: {e}")
+
+    def publish(self, data):
+        with self._cond:
+            self._seq += 1
+            self._frames.append((self._seq, data))
+            self._cond.notify_all()
+        self._notify_listeners()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._notify_listeners()
+
+    def latest(self):
+        """Return the newest (seq, data) without waiting; (0, None) before the first frame"""
+        with self._cond:
+            return self._frames[-1] if self._frames else (0, None)
+
+    def wait_for(self, after_seq, timeout=1.0):
+        """
+        Wait for a frame newer than after_seq and return the newest one
+        Returns (seq, data), or (after_seq, None) on timeout or when closed
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or self.closed, timeout)
+            if self._seq > after_seq and self._frames:
+                return self._frames[-1]
+            return after_seq, None
+
+    def stream(self, keepalive=None):
+        """
+        Yield each new frame until the broadcaster is closed; slow readers skip frames
+        With a keepalive interval, the last frame is re-sent when nothing new arrives
+        """
+        seq, last = 0, None
+        while not self.closed:
+            new_seq, data = self.wait_for(seq, keepalive or 1.0)
+            if data is not None:
+                seq, last = new_seq, data
+                yield data
+            elif keepalive and last is not None and not self.closed:
+                yield last
+
+
+class ScanPipeline:
+    """
+    Runs capture, detection and encoding as separate stages for one camera.
+
+    analyze(frame) is called on a detection worker and is expected to update
+    the scan state itself; render(frame) is called on the encode thread and
+    returns the image to display for the latest camera frame.
+
+    Viewers call attach() to get a JPEG stream; the stages start with the first
+    viewer and stop when the last one detaches, so the camera is read and every
+    frame is detected and encoded once no matter how many viewers there are.
+    """
+
+    def __init__(self, camera, analyze, render, workers=1, jpeg_quality=85, buffer_size=4,
+                 idle_poll=0.1):
+        self.camera = camera
+        self.analyze = analyze
+        self.render = render
+        self.workers = workers
+        self.jpeg_quality = jpeg_quality
+        self.buffer_size = buffer_size
+        self.idle_poll = idle_poll
+        self.running = False
+        self._wake = threading.Event()
+        self.capture = None
+        self.broadcaster = None
+        self._executor = None
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._viewers = 0
+        self._viewers_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def viewers(self):
+        return self._viewers
+
+    def start(self):
+        self.running = True
+        self.capture = LatestFrameCapture(self.camera)
+        self.broadcaster = FrameBroadcaster(self.buffer_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qr-detect")
+        self.capture.start()
+        self._thread = threading.Thread(target=self._encode_loop, name="frame-encode", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        """Re-render immediately, e.g. after the scan state changed"""
+        self._wake.set()
+
+    def stop(self, wait=False, timeout=2.0):
+        """
+        Stop every stage. With wait, return only once the capture and encode
+        threads have exited and in-flight detections finished (each thread
+        waited for up to timeout), so the camera is free to be read again
+        """
+        self.running = False
+        self._wake.set()
+        if self.capture is not None:
+            self.capture.stop(wait=wait, timeout=timeout)
+        if self.broadcaster is not None:
+            self.broadcaster.close()
+        if wait:
+            _join(self._thread, timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def attach(self):
+        """Register a viewer and return the broadcaster to stream from"""
+        with self._viewers_lock:
+            self._viewers += 1
+            if not self.running or self.broadcaster.closed:
+                # First viewer, or the camera dropped out since the last start; the
+                # old stages must be gone before new ones read the same camera
+                self.stop(wait=True)
+                self.start()
+            logging.info(f"Viewer attached ({self._viewers} watching)")
+            return self.broadcaster
+
+    def detach(self):
+        """Unregister a viewer; the last one out stops the pipeline"""
+        with self._viewers_lock:
+            self._viewers -= 1
+            logging.info(f"Viewer detached ({self._viewers} watching)")
+            if self._viewers <= 0:
+                self._viewers = 0
+                self.stop()
+
+    def _submit_detection(self, frame):
+        """Hand a frame to a free detection worker; drop it if all workers are busy"""
+        with self._in_flight_lock:
+            if self._in_flight >= self.workers:
+                return
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(self._analyze, frame)
+        except RuntimeError:
+            # Executor shut down by stop() while this frame was in flight
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            return
+        future.add_done_callback(self._detection_done)
+
+    def _analyze(self, frame):
+        try:
+            self.analyze(frame)
+        except Exception as e:
+            logging.error(f"Error in frame detection: {e}")
+
+    def _detection_done(self, future):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _encode_loop(self):
+        capture, broadcaster = self.capture, self.broadcaster
+        seq = 0
+        last_display = None
+        while self.running and not broadcaster.closed:
+            new_seq, frame = capture.wait_for_frame(seq)
+            if frame is None:
+                if not capture.running:
+                    broadcaster.close()
+                continue
+            seq = new_seq
+
+            try:
+                display_frame = self.render(frame)
+            except Exception as e:
+                logging.error(f"Error rendering frame: {e}")
+                continue
+
+            if display_frame is last_display:
+                # Frozen frame already encoded and published; idle until the state changes
+                self._wake.wait(self.idle_poll)
+                self._wake.clear()
+                continue
+            last_display = display_frame
+
+            if self.running:
+                self._submit_detection(frame)
+            try:
+                with metrics.ENCODE_SECONDS.time():
+                    _, buffer = cv2.imencode('.jpg', display_frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            except Exception as e:
+                logging.error(f"Error encoding frame: {e}")
+                continue
+            broadcaster.publish(buffer.tobytes())
+            metrics.FRAMES_PUBLISHED.inc()
@@ -0,0 +1,187 @@
+"""
+Incrementally maintained attendance statistics.
+
+AttendanceStats is loaded once from aggregate queries (and the recent
+CheckinEvent rows) and then updated in memory by every check-in, so the
+stats endpoint never touches the database: totals, present/absent, per
+institute and per gate counts, check-ins per minute over a rolling window
+and the peak arrival rate.
+
+Like the attendee cache, the counters are per process. Check-ins made by
+other workers or machines are picked up by poll_events(), which counts the
+CheckinEvent rows committed since the last load or poll (LIVE_EVENTS=db);
+attendees added by an import show up after a reload (STATS_RELOAD_INTERVAL).
+"""
+from calendar import timegm
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+
+from sqlalchemy import case, func
+
+from models import db, Attendee, CheckinEvent
+
+
+def _minute(timestamp):
+    return int(timestamp // 60)
+
+def _timestamp(naive_utc):
+    return timegm(naive_utc.timetuple())
+
+
+class AttendanceStats:
+    """Attendance counters kept current by record_checkin() / record_reverted()"""
+
+    def __init__(self, window_minutes=60):
+        self.window_minutes = window_minutes
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.last_event_id = 0            # Newest CheckinEvent counted (see poll_events)
+        self._reset()
+
+    def _reset(self):
+        self.total = 0
+        self.present = 0
+        self.by_institute = {}            # institute -> [registered, present]
+        self.by_gate = {}                 # gate -> check-ins
+        self._minutes = deque()           # (minute, check-ins), oldest first, within the window
+        self.peak_per_minute = 0
+        self.peak_minute = None
+
+    # --- loading ---
+    def load(self):
+        """Rebuild every counter from the database (needs an app context)"""
+        # Read first: the queries below share its snapshot (SQLite), so
+        # poll_events continues exactly where this load stops counting
+        last_event_id = db.session.query(func.max(CheckinEvent.id)).scalar() or 0
+        present_case = func.sum(case((Attendee.entry.is_(True), 1), else_=0))
+        institutes = db.session.query(Attendee.institute, func.count(Attendee.id), present_case) \
+            .group_by(Attendee.institute).all()
+        gates = db.session.query(CheckinEvent.gate, func.count(CheckinEvent.id)) \
+            .group_by(CheckinEvent.gate).all()
+        peak = self._load_peak()
+        since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=self.window_minutes)
+        recent = db.session.query(CheckinEvent.checked_in_at) \
+            .filter(CheckinEvent.checked_in_at >= since).order_by(CheckinEvent.checked_in_at).all()
+
+        with self._lock:
+            self._reset()
+            for institute, registered, present in institutes:
+                self.by_institute[institute] = [registered, present or 0]
+                self.total += registered
+                self.present += present or 0
+            self.by_gate = {gate or "unknown": count for gate, count in gates}
+            for (checked_in_at,) in recent:
+                self._count_minute(_minute(_timestamp(checked_in_at)))
+            if peak and peak[1] > self.peak_per_minute:
+                self.peak_minute, self.peak_per_minute = peak
+            self.last_event_id = last_event_id
+            self.loaded_at = time.time()
+
+    def _load_peak(self):
+        """(minute, check-ins) of the busiest minute so far, grouped in the database"""
+        if db.engine.dialect.name == 'sqlite':
+            bucket = func.strftime('%Y-%m-%d %H:%M:00', CheckinEvent.checked_in_at)
+        else:
+            bucket = func.date_trunc('minute', CheckinEvent.checked_in_at)
+        row = db.session.query(bucket, func.count(CheckinEvent.id)).group_by(bucket) \
+            .order_by(func.count(CheckinEvent.id).desc()).first()
+        if row is None:
+            return None
+        started = row[0] if isinstance(row[0], datetime) else datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
+        return _minute(_timestamp(started)), row[1]
+
+    # --- incremental updates ---
+    def _count_minute(self, minute, delta=1):
+        if self._minutes and self._minutes[-1][0] == minute:
+            count = self._minutes[-1][1] + delta
+            self._minutes[-1] = (minute, count)
+        elif not self._minutes or self._minutes[-1][0] < minute:
+            count = delta
+            self._minutes.append((minute, count))
+        else:
+            # Out of order (e.g. a replayed journal entry): rare, so rebuild the window
+            counts = dict(self._minutes)
+            count = counts[minute] = counts.get(minute, 0) + delta
+            self._minutes = deque(sorted(counts.items()))
+        if count > self.peak_per_minute:
+            self.peak_per_minute, self.peak_minute = count, minute
+        self._expire(max(minute, self._minutes[-1][0]))
+
+    def _expire(self, now_minute):
+        while self._minutes and self._minutes[0][0] <= now_minute - self.window_minutes:
+            self._minutes.popleft()
+
+    def _count_checkin(self, institute, gate, at):
+        self.present += 1
+        self.by_institute.setdefault(institute, [0, 0])[1] += 1
+        self.by_gate[gate or "unknown"] = self.by_gate.get(gate or "unknown", 0) + 1
+        self._count_minute(_minute(at if at is not None else time.time()))
+
+    def record_checkin(self, institute, gate, at=None):
+        """Count one check-in of an attendee from institute at gate (at: Unix time, default now)"""
+        with self._lock:
+            if self.loaded_at is None:
+                return
+            self._count_checkin(institute, gate, at)
+
+    def poll_events(self, limit=500):
+        """
+        Count the CheckinEvent rows committed (by any process) since the last
+        load or poll; returns the newly counted (event, attendee) pairs,
+        oldest first. Needs an app context
+        """
+        if self.loaded_at is None:
+            return []
+        rows = db.session.query(CheckinEvent, Attendee) \
+            .join(Attendee, Attendee.id == CheckinEvent.attendee_id) \
+            .filter(CheckinEvent.id > self.last_event_id).order_by(CheckinEvent.id).limit(limit).all()
+        counted = []
+        with self._lock:
+            for event, attendee in rows:
+                if event.id <= self.last_event_id:
+                    continue  # Counted by a reload that ran meanwhile
+                self._count_checkin(attendee.institute, event.gate, _timestamp(event.checked_in_at))
+                self.last_event_id = event.id
+                counted.append((event, attendee))
+        return counted
+
+    def record_reverted(self, institute, gate, at=None):
+        """Undo record_checkin for a check-in the database later rejected"""
+        with self._lock:
+            if self.loaded_at is None:
+                return
+            self.present -= 1
+            if institute in self.by_institute:
+                self.by_institute[institute][1] -= 1
+            if self.by_gate.get(gate or "unknown"):
+                self.by_gate[gate or "unknown"] -= 1
+            self._count_minute(_minute(at if at is not None else time.time()), -1)
+
+    # --- reporting ---
+    def snapshot(self):
+        """Current statistics as a JSON-ready dict"""
+        now_minute = _minute(time.time())
+        with self._lock:
+            self._expire(now_minute)
+            per_minute = dict(self._minutes)
+            result = {
+                "total": self.total,
+                "present": self.present,
+                "absent": self.total - self.present,
+                "by_institute": {institute: {"registered": registered, "present": present}
+                                 for institute, (registered, present) in sorted(self.by_institute.items())},
+                "by_gate": dict(self.by_gate),
+                "peak_per_minute": self.peak_per_minute,
+                "peak_minute": None if self.peak_minute is None else
+                    datetime.fromtimestamp(self.peak_minute * 60, timezone.utc).isoformat(),
+                "loaded_at": self.loaded_at,
+            }
+        result["checkins_last_minute"] = per_minute.get(now_minute - 1, 0)
+        result["checkins_this_minute"] = per_minute.get(now_minute, 0)
+        result["per_minute"] = [per_minute.get(minute, 0)
+                                for minute in range(now_minute - self.window_minutes + 1, now_minute + 1)]
+        for span in (5, 15):
+            result[f"rate_{span}m"] = sum(result["per_minute"][-span - 1:-1]) / span
+        return result
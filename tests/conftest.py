@@ -0,0 +1,84 @@
+"""
+Shared fixtures. Every test app is built with create_app() against its own
+SQLite file, so the schema is created the same way as in production.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py builds a default app when imported: keep it off the instance
+# database and off real cameras, whatever the environment says
+_scratch = tempfile.mkdtemp(prefix='gate-tests-')
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_scratch, 'import.db')}"
+os.environ['GATES'] = 'main:synthetic'
+os.environ['GATE_STATE_STORE'] = 'memory://'
+os.environ['CHECKIN_WRITE_BEHIND'] = '0'
+os.environ.pop('APP_ROLES', None)
+
+import pytest
+
+from config import Config, engine_options
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """create_app(roles, **config overrides) against a fresh SQLite file in tmp_path"""
+    import app as gate_app
+
+    def make(roles=None, **overrides):
+        overrides.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+        overrides.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(overrides['SQLALCHEMY_DATABASE_URI']))
+        overrides.setdefault('TESTING', True)
+        return gate_app.create_app(roles, type('TestConfig', (Config,), overrides))
+    return make
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def seed():
+    """seed(app, count): upsert count attendees (institutes 'Institute 0' and 'Institute 1'); returns their ids"""
+    from import_attendees import upsert_attendees
+    from models import db, Attendee
+
+    def seed(app, count=3):
+        with app.app_context():
+            upsert_attendees({'first_name': f"First{i}", 'last_name': f"Last{i}", 'email': f"a{i}@example.com",
+                              'institute': f"Institute {i % 2}"} for i in range(count))
+            return [attendee_id for (attendee_id,) in db.session.query(Attendee.id).order_by(Attendee.id)]
+    return seed
+
+@pytest.fixture
+def outside_view():
+    """
+    outside_view(app): a list that gets, after every statement the app runs,
+    the number of checked-in attendees a second connection can see
+    """
+    import sqlite3
+    from sqlalchemy import event
+    from models import db
+    watched = []
+
+    def watch(app):
+        with app.app_context():
+            engine = db.engine
+        other = sqlite3.connect(engine.url.database)
+        seen = []
+
+        def look(*args):
+            seen.append(other.execute("SELECT count(*) FROM attendees WHERE entry = 1").fetchone()[0])
+        event.listen(engine, 'after_cursor_execute', look)
+        watched.append((engine, look, other))
+        return seen
+    yield watch
+    for engine, look, other in watched:
+        event.remove(engine, 'after_cursor_execute', look)
+        other.close()
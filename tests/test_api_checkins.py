@@ -0,0 +1,55 @@
+from models import db, Attendee, CheckinEvent
+
+
+def test_batch_checkin_reports_each_item(app, client, seed):
+    first, second, third = seed(app)
+    response = client.post('/api/checkins', json={"items": [
+        {"qr_payload": f"ID:{first}", "band_id": "B-1"},
+        {"qr_payload": "hello", "band_id": "B-2"},
+        {"qr_payload": f"ID:{second}", "band_id": " "},
+        {"qr_payload": f"ID:{second}", "band_id": "B-1"},
+        {"qr_payload": "ID:9999", "band_id": "B-9"},
+        {"qr_payload": str(third), "band_id": "B-3"},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [(r["index"], r["attendee_id"], r["status"]) for r in body["results"]] == [
+        (0, first, "checked_in"), (1, None, "invalid_qr"), (2, second, "invalid_band"),
+        (3, second, "duplicate_in_batch"), (4, 9999, "not_found"), (5, third, "checked_in")]
+    assert body["summary"] == {"checked_in": 2, "invalid_qr": 1, "invalid_band": 1,
+                               "duplicate_in_batch": 1, "not_found": 1}
+
+    with app.app_context():
+        assert {a.id: (a.entry, a.band_id) for a in db.session.query(Attendee)} == \
+            {first: (True, "B-1"), second: (False, None), third: (True, "B-3")}
+        assert db.session.query(CheckinEvent.gate).distinct().all() == [("api",)]
+
+def test_batch_checkin_against_existing_state(app, client, seed):
+    first, second, _ = seed(app)
+    client.post('/api/checkins', json=[{"qr_payload": f"ID:{first}", "band_id": "B-1"}])
+    # A bare item, then a list: the attendee is already in, the band is taken
+    assert client.post('/api/checkins', json={"qr_payload": f"ID:{first}", "band_id": "B-7"}) \
+        .get_json()["results"][0]["status"] == "already_checked_in"
+    results = client.post('/api/checkins', json=[{"qr_payload": f"ID:{second}", "band_id": "B-1"}]).get_json()["results"]
+    assert results[0]["status"] == "barcode_in_use"
+    with app.app_context():
+        assert db.session.get(Attendee, second).entry is False
+
+def test_batch_checkin_rejects_bad_bodies(app, client):
+    assert client.post('/api/checkins', data="not json", content_type='application/json').status_code == 400
+    assert client.post('/api/checkins', json={"items": []}).status_code == 400
+    app.config['CHECKIN_BATCH_MAX'] = 2
+    items = [{"qr_payload": f"ID:{i}", "band_id": f"B-{i}"} for i in range(3)]
+    assert client.post('/api/checkins', json=items).status_code == 413
+
+def test_batch_is_one_transaction(app, client, seed, outside_view):
+    first, second, third = seed(app)
+    seen = outside_view(app)
+    results = client.post('/api/checkins', json=[{"qr_payload": f"ID:{first}", "band_id": "B-1"},
+                                                 {"qr_payload": f"ID:{second}", "band_id": "B-2"},
+                                                 {"qr_payload": f"ID:{third}", "band_id": "B-3"}]).get_json()["results"]
+    assert [r["status"] for r in results] == ["checked_in"] * 3
+    # Nothing is visible to another connection until the batch commits
+    assert seen and set(seen) == {0}
+    with app.app_context():
+        assert db.session.query(Attendee).filter(Attendee.entry.is_(True)).count() == 3
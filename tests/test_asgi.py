@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from flask import Flask
+
+from asgi import ThreadPoolWsgiToAsgi
+
+
+async def _get(application, path):
+    """Issue one GET through an ASGI app; returns (status, body)"""
+    sent = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+             'root_path': '', 'headers': [], 'server': ('test', 80), 'client': ('test', 1234)}
+    await application(scope, receive, send)
+    body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+    return sent[0]['status'], body
+
+def test_wsgi_requests_run_concurrently():
+    wsgi = Flask(__name__)
+
+    @wsgi.route('/slow')
+    def slow():
+        time.sleep(0.5)
+        return 'done'
+
+    application = ThreadPoolWsgiToAsgi(wsgi, threads=4)
+
+    async def main():
+        return await asyncio.gather(*[_get(application, '/slow') for _ in range(4)])
+
+    started = time.perf_counter()
+    responses = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    assert responses == [(200, b'done')] * 4
+    # One shared thread would take 4 x 0.5s
+    assert elapsed < 1.2, f"requests did not overlap: {elapsed:.2f}s"
+
+def test_response_is_cut_to_content_length_and_closed():
+    closed = []
+
+    class Body:
+        def __iter__(self):
+            yield b'hello'
+            yield b' world'
+
+        def close(self):
+            closed.append(True)
+
+    def wsgi(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', '8')])
+        return Body()
+
+    assert asyncio.run(_get(ThreadPoolWsgiToAsgi(wsgi, threads=1), '/')) == (200, b'hello wo')
+    assert closed == [True]
@@ -0,0 +1,122 @@
+import attendee_cache
+from attendee_cache import AttendeeCache, AttendeeSnapshot
+import app as gate_app
+from checkin import atomic_checkin
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def snapshot(attendee_id, band_id=None, entry=False):
+    return AttendeeSnapshot(attendee_id, f"First{attendee_id}", f"Last{attendee_id}", f"a{attendee_id}@example.com",
+                            "Institute", band_id, entry)
+
+class Loader:
+    """Loads from a dict of snapshots and counts the calls"""
+
+    def __init__(self, *snapshots):
+        self.rows = {s.id: s for s in snapshots}
+        self.calls = 0
+
+    def __call__(self, attendee_id):
+        self.calls += 1
+        return self.rows.get(attendee_id)
+
+    def by_band(self, band_id):
+        self.calls += 1
+        return next((s for s in self.rows.values() if s.band_id == band_id), None)
+
+def test_lru_eviction():
+    cache = AttendeeCache(maxsize=2)
+    load = Loader(snapshot(1), snapshot(2), snapshot(3))
+    cache.get_by_id(1, load)
+    cache.get_by_id(2, load)
+    cache.get_by_id(1, load)     # 1 is now the most recently used
+    cache.get_by_id(3, load)     # evicts 2
+    assert load.calls == 3
+    cache.get_by_id(1, load)
+    assert load.calls == 3
+    cache.get_by_id(2, load)
+    assert load.calls == 4
+
+def test_ttl_and_negative_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(attendee_cache, "time", clock)
+    cache = AttendeeCache(ttl=60, negative_ttl=5)
+    load = Loader(snapshot(1))
+
+    assert cache.get_by_id(1, load) == snapshot(1)
+    assert cache.get_by_id(99, load) is None
+    assert load.calls == 2
+    clock.now += 4
+    cache.get_by_id(1, load)
+    cache.get_by_id(99, load)
+    assert load.calls == 2
+    # The negative entry expires first
+    clock.now += 2
+    assert cache.get_by_id(99, load) is None
+    cache.get_by_id(1, load)
+    assert load.calls == 3
+    clock.now += 60
+    cache.get_by_id(1, load)
+    assert load.calls == 4
+
+def test_negative_band_entries():
+    cache = AttendeeCache()
+    load = Loader(snapshot(1, band_id="B-1", entry=True))
+    assert cache.get_by_band("B-9", load.by_band) is None
+    assert cache.get_by_band("B-9", load.by_band) is None
+    assert cache.get_by_band("B-1", load.by_band).id == 1
+    assert cache.cached_band_holder("B-1").id == 1
+    assert load.calls == 2
+
+def test_get_many_loads_only_the_misses():
+    cache = AttendeeCache()
+    load = Loader(snapshot(1), snapshot(2))
+    cache.get_by_id(1, load)
+    batches = []
+
+    def load_many(ids):
+        batches.append(list(ids))
+        return {i: load.rows[i] for i in ids if i in load.rows}
+    assert cache.get_many_by_id([1, 2, 3], load_many) == {1: snapshot(1), 2: snapshot(2)}
+    assert cache.get_many_by_id([1, 2, 3], load_many) == {1: snapshot(1), 2: snapshot(2)}
+    assert batches == [[2, 3]]
+
+def test_invalidate_after_checkin():
+    cache = AttendeeCache()
+    load = Loader(snapshot(1))
+    cache.get_by_id(1, load)
+    cache.put(snapshot(1, band_id="B-1", entry=True))
+    assert cache.cached_band_holder("B-1").entry is True
+
+    cache.invalidate(attendee_id=1)
+    assert cache.cached_band_holder("B-1") is None
+    assert cache.get_by_id(1, load) == snapshot(1)
+    assert load.calls == 2
+
+    # A band that changed hands: only the band entry goes
+    cache.put(snapshot(1, band_id="B-1", entry=True))
+    cache.invalidate(band_id="B-1")
+    assert cache.cached_band_holder("B-1") is None
+    assert cache.get_by_id(1, load).band_id == "B-1"
+
+def test_stale_entry_from_another_worker_is_caught_by_the_checkin(app, client, seed):
+    attendee_id = seed(app)[0]
+    with app.app_context():
+        assert gate_app.get_attendee(attendee_id).entry is False
+        # Another worker checks the attendee in; this worker's cache still says absent
+        atomic_checkin(attendee_id, "B-1", gate="side")
+        assert gate_app.get_attendee(attendee_id).entry is False
+
+    result = client.post('/api/checkins', json=[{"qr_payload": f"ID:{attendee_id}", "band_id": "B-2"}]) \
+        .get_json()["results"][0]
+    assert result["status"] == "already_checked_in"
+    with app.app_context():
+        # The failed check-in dropped the stale entry
+        attendee = gate_app.get_attendee(attendee_id)
+        assert (attendee.entry, attendee.band_id) == (True, "B-1")
@@ -0,0 +1,57 @@
+import threading
+
+from checkin import atomic_checkin, CHECKED_IN, NOT_ELIGIBLE, BAND_IN_USE
+from models import db, Attendee, CheckinEvent
+
+
+def test_checkin_results(app, seed):
+    first, second, _ = seed(app)
+    with app.app_context():
+        assert atomic_checkin(first, "B-1", gate="main") == CHECKED_IN
+        assert atomic_checkin(first, "B-2", gate="main") == NOT_ELIGIBLE
+        assert atomic_checkin(second, "B-1", gate="main") == BAND_IN_USE
+        assert atomic_checkin(9999, "B-9", gate="main") == NOT_ELIGIBLE
+        # The session is usable again after the constraint violation
+        assert atomic_checkin(second, "B-2", gate="side") == CHECKED_IN
+        assert {a.id: (a.entry, a.band_id) for a in db.session.query(Attendee).filter(Attendee.entry.is_(True))} == \
+            {first: (True, "B-1"), second: (True, "B-2")}
+        assert sorted(db.session.query(CheckinEvent.attendee_id, CheckinEvent.gate)) == \
+            [(first, "main"), (second, "side")]
+
+def _race(app, *checkins):
+    """Run each (attendee_id, band_id, gate) check-in on its own thread at the same time"""
+    barrier = threading.Barrier(len(checkins))
+    results = [None] * len(checkins)
+
+    def run(index, attendee_id, band_id, gate):
+        with app.app_context():
+            barrier.wait()
+            results[index] = atomic_checkin(attendee_id, band_id, gate=gate)
+    threads = [threading.Thread(target=run, args=(i, *checkin)) for i, checkin in enumerate(checkins)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_two_gates_race_for_one_attendee(app, seed):
+    attendee_id = seed(app)[0]
+    for _ in range(5):
+        with app.app_context():
+            db.session.query(CheckinEvent).delete()
+            db.session.query(Attendee).update({"entry": False, "band_id": None})
+            db.session.commit()
+        results = _race(app, (attendee_id, "B-north", "north"), (attendee_id, "B-south", "south"))
+        assert sorted(results) == sorted([CHECKED_IN, NOT_ELIGIBLE])
+        winner = ("B-north", "north") if results[0] == CHECKED_IN else ("B-south", "south")
+        with app.app_context():
+            assert db.session.get(Attendee, attendee_id).band_id == winner[0]
+            assert db.session.query(CheckinEvent.band_id, CheckinEvent.gate).all() == [winner]
+
+def test_two_gates_race_for_one_band(app, seed):
+    first, second, _ = seed(app)
+    results = _race(app, (first, "B-1", "north"), (second, "B-1", "south"))
+    assert sorted(results) == sorted([CHECKED_IN, BAND_IN_USE])
+    with app.app_context():
+        assert db.session.query(Attendee).filter(Attendee.entry.is_(True)).count() == 1
+        assert db.session.query(CheckinEvent).count() == 1
@@ -0,0 +1,126 @@
+import fcntl
+import json
+import os
+
+import pytest
+
+import app as gate_app
+import checkin_journal
+from checkin import atomic_checkin, NOT_ELIGIBLE
+from checkin_journal import CheckinJournal
+from models import db, Attendee, CheckinEvent
+
+
+def write_journal(path, *records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+def checked_in(app):
+    with app.app_context():
+        return {a.id: a.band_id for a in Attendee.query.filter(Attendee.entry.is_(True))}
+
+def test_orphan_journal_is_replayed_once(make_app, seed, tmp_path):
+    app = make_app()
+    first, second, third = seed(app)
+    directory = tmp_path / "journal"
+    directory.mkdir()
+    orphan = directory / "checkins-999999.jsonl"
+    write_journal(orphan,
+                  {"seq": 1, "attendee_id": first, "band_id": "B-1", "gate": "main", "ts": 1.0},
+                  {"committed": 1},
+                  {"seq": 2, "attendee_id": second, "band_id": "B-2", "gate": "main", "ts": 2.0},
+                  {"seq": 3, "attendee_id": third, "band_id": "B-3", "gate": "main", "ts": 3.0})
+
+    CheckinJournal(app, str(directory)).replay_orphans()
+    # Only the entries after the commit marker are applied, and the orphan is gone
+    assert checked_in(app) == {second: "B-2", third: "B-3"}
+    assert not orphan.exists()
+
+    write_journal(orphan, {"seq": 1, "attendee_id": second, "band_id": "B-2", "gate": "main", "ts": 2.0})
+    journal = CheckinJournal(app, str(directory))
+    journal.replay_orphans()
+    with app.app_context():
+        assert db.session.query(CheckinEvent).count() == 2
+    assert journal.recent_failures() == []
+
+def test_locked_journal_is_left_to_its_owner(make_app, seed, tmp_path):
+    app = make_app()
+    attendee_id = seed(app)[0]
+    directory = tmp_path / "journal"
+    directory.mkdir()
+    owned = directory / "checkins-999999.jsonl"
+    write_journal(owned, {"seq": 1, "attendee_id": attendee_id, "band_id": "B-1", "gate": "main", "ts": 1.0})
+
+    with open(owned, 'a') as handle:
+        # As a live worker holds its own journal
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        CheckinJournal(app, str(directory)).replay_orphans()
+        assert checked_in(app) == {}
+        assert owned.exists()
+
+    CheckinJournal(app, str(directory)).replay_orphans()
+    assert checked_in(app) == {attendee_id: "B-1"}
+
+def test_start_replays_own_leftover_entries(make_app, seed, tmp_path):
+    app = make_app()
+    attendee_id = seed(app)[0]
+    journal = CheckinJournal(app, str(tmp_path))
+    write_journal(tmp_path / os.path.basename(journal.path),
+                  {"seq": 1, "attendee_id": attendee_id, "band_id": "B-1", "gate": "main", "ts": 1.0})
+
+    journal.start()
+    try:
+        assert checked_in(app) == {attendee_id: "B-1"}
+        assert os.path.getsize(journal.path) == 0
+    finally:
+        journal.stop()
+
+def test_group_commit_is_one_transaction(make_app, seed, tmp_path, outside_view):
+    app = make_app()
+    attendee_ids = seed(app)
+    journal = CheckinJournal(app, str(tmp_path / "journal"), flush_interval=3600)
+    journal.start()
+    try:
+        for attendee_id in attendee_ids:
+            journal.submit(attendee_id, f"B-{attendee_id}", gate="main")
+        seen = outside_view(app)
+        journal._commit_pending()
+        # No entry is visible to another connection before the batch commits
+        assert seen and set(seen) == {0}
+        assert checked_in(app) == {attendee_id: f"B-{attendee_id}" for attendee_id in attendee_ids}
+    finally:
+        journal.stop()
+
+def test_rejected_checkin_is_taken_back(make_app, seed, tmp_path):
+    app = make_app(CHECKIN_WRITE_BEHIND=True, CHECKIN_JOURNAL_DIR=str(tmp_path / "journal"),
+                   CHECKIN_JOURNAL_FLUSH_INTERVAL=3600)
+    attendee_id = seed(app)[0]
+    with app.app_context():
+        stats = gate_app.get_attendance_stats()
+    subscription = gate_app.event_hub.subscribe()
+    gate = gate_app.get_gate("main")
+    gate.update(waiting_for_barcode=True, current_attendee_id=attendee_id)
+    with app.test_request_context():
+        gate_app.link_barcode(gate, "B-1")
+    assert stats.snapshot()["present"] == 1
+
+    # Another gate checks the attendee in before the journal commits
+    with app.app_context():
+        atomic_checkin(attendee_id, "B-9", gate="side")
+    journal = gate_app.checkin_journal
+    journal._commit_pending()
+    journal.stop()
+    assert [failure["result"] for failure in journal.recent_failures()] == [NOT_ELIGIBLE]
+    assert stats.snapshot()["present"] == 0
+    events = [subscription.queue.get_nowait() for _ in range(2)]
+    assert [event_type for _, event_type, _ in events] == ["checkin", "checkin_reverted"]
+    assert events[1][2] == {"id": attendee_id, "band_id": "B-1", "present": True, "current_band_id": "B-9"}
+
+def test_no_write_behind_without_file_locks(make_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(checkin_journal, "fcntl", None)
+    directory = tmp_path / "journal"
+    app = make_app(CHECKIN_WRITE_BEHIND=True, CHECKIN_JOURNAL_DIR=str(directory))
+    # Check-ins fall back to synchronous commits
+    assert app.config['CHECKIN_WRITE_BEHIND'] is False
+    assert gate_app.get_checkin_journal() is None
+    with pytest.raises(RuntimeError, match="file locks"):
+        CheckinJournal(app, str(directory)).start()
@@ -0,0 +1,83 @@
+import re
+
+import app as gate_app
+from checkin import atomic_checkin
+from import_attendees import upsert_attendees, analyze_attendees
+from models import db, Attendee
+
+PEOPLE = [
+    ("Ada", "Lovelace", "ada@analytical.org", "Analytical Society"),
+    ("alan", "Turing", "ALAN@bletchley.uk", "Bletchley Park"),
+    ("Grace", "Hopper", "grace@navy.mil", "US Navy"),
+    ("Edsger", "dijkstra", "ewd@tue.nl", "TU Eindhoven"),
+    ("Barbara", "Liskov", "liskov@mit.edu", "MIT"),
+]
+
+
+def _seed(app):
+    """Upsert PEOPLE, check Ada in with band B-100; returns {first_name: id}"""
+    with app.app_context():
+        upsert_attendees({'first_name': f, 'last_name': l, 'email': e, 'institute': i} for f, l, e, i in PEOPLE)
+        ids = {first: attendee_id for attendee_id, first in db.session.query(Attendee.id, Attendee.first_name)}
+        atomic_checkin(ids["Ada"], "B-100")
+    return ids
+
+def _rows(client, **params):
+    """Attendee ids of the dashboard rows, in page order"""
+    response = client.get('/dashboard', query_string=params)
+    assert response.status_code == 200
+    return [int(i) for i in re.findall(r'data-attendee-id="(\d+)"', response.get_data(as_text=True))]
+
+def _names(ids, rows):
+    by_id = {attendee_id: first for first, attendee_id in ids.items()}
+    return [by_id[row] for row in rows]
+
+def test_search_is_a_case_insensitive_prefix_match(app, client):
+    ids = _seed(app)
+    assert _names(ids, _rows(client, q="ADA")) == ["Ada"]
+    assert _names(ids, _rows(client, q="lov")) == ["Ada"]             # last name
+    assert _names(ids, _rows(client, q="alan@")) == ["alan"]          # email, stored upper case
+    assert _names(ids, _rows(client, q="bletchley")) == ["alan"]      # institute
+    assert _names(ids, _rows(client, q="navy.mil")) == []             # the email domain is not a prefix
+    assert _names(ids, _rows(client, q="us hop")) == ["Grace"]        # every term must match (institute, last name)
+    assert _names(ids, _rows(client, q="us nav")) == []               # ...each on its own
+    assert _names(ids, _rows(client, q="Dijk")) == ["Edsger"]
+    assert _names(ids, _rows(client, q="b-1")) == []                  # band IDs are case-sensitive
+    assert _names(ids, _rows(client, q="B-1")) == ["Ada"]
+    assert _names(ids, _rows(client, q=str(ids["Barbara"]))) == ["Barbara"]
+    assert _names(ids, _rows(client, q="ring")) == []                 # not a prefix
+    assert _names(ids, _rows(client, q="a")) == ["Ada", "alan"]       # Analytical is Ada's too
+
+def test_status_and_sort(app, client):
+    ids = _seed(app)
+    assert _names(ids, _rows(client, status="present")) == ["Ada"]
+    assert _names(ids, _rows(client, status="absent")) == ["alan", "Barbara", "Edsger", "Grace"]
+    assert _names(ids, _rows(client, sort="last_name")) == ["Edsger", "Grace", "Barbara", "Ada", "alan"]
+    assert _names(ids, _rows(client, sort="institute", dir="desc")) == ["Grace", "Edsger", "Barbara", "alan", "Ada"]
+    assert _rows(client, sort="id", dir="desc") == sorted(ids.values(), reverse=True)
+    # Unknown values fall back to the defaults instead of failing
+    assert _rows(client, sort="password", status="maybe", dir="sideways") == _rows(client)
+    assert _names(ids, _rows(client)) == ["Ada", "alan", "Barbara", "Edsger", "Grace"]
+
+def test_page_bounds(make_app):
+    app = make_app(DASHBOARD_PER_PAGE=2, DASHBOARD_MAX_PER_PAGE=3)
+    client = app.test_client()
+    ids = _seed(app)
+    assert _names(ids, _rows(client)) == ["Ada", "alan"]
+    assert _names(ids, _rows(client, page=3)) == ["Grace"]
+    assert _rows(client, page=4) == []                     # past the end: an empty page, not a 404
+    assert _names(ids, _rows(client, per_page=100)) == ["Ada", "alan", "Barbara"]
+    assert _names(ids, _rows(client, page=0)) == ["Ada", "alan"]
+    page = client.get('/dashboard', query_string={"q": "zzz"}).get_data(as_text=True)
+    assert re.search(r'id="count-total">\s*5<', page) and re.search(r'id="count-present">\s*1<', page)
+
+def test_search_uses_the_lower_indexes(app):
+    with app.app_context():
+        upsert_attendees({'first_name': f"First{i}", 'last_name': f"Last{i}", 'email': f"a{i}@example.com",
+                          'institute': f"Institute {i % 7}"} for i in range(500))
+        analyze_attendees()
+        query = gate_app.search_attendees("smi", sort="last_name").limit(50)
+        sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        plan = " | ".join(row[-1] for row in db.session.execute(db.text("EXPLAIN QUERY PLAN " + sql)))
+    for column in ("first_name", "last_name", "email", "institute"):
+        assert f"USING INDEX ix_attendees_{column}_lower (<expr>>? AND <expr><?)" in plan
@@ -0,0 +1,50 @@
+import time
+
+from events import EventHub, RESYNC
+
+
+def queued(subscription):
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return [(event_type, data) for _, event_type, data in events]
+
+def test_reconnect_gets_missed_events_or_a_resync():
+    hub = EventHub(queue_size=10, history=5)
+    hub.publish("checkin", {"id": 1})
+    seen = hub._seq
+    hub.publish("checkin", {"id": 2})
+    hub.publish("checkin", {"id": 3})
+    assert queued(hub.subscribe(seen)) == [("checkin", {"id": 2}), ("checkin", {"id": 3})]
+    assert queued(hub.subscribe(hub._seq)) == []
+    # Fallen out of the history
+    for i in range(5):
+        hub.publish("checkin", {"id": 4 + i})
+    assert queued(hub.subscribe(seen)) == [(RESYNC, {})]
+
+def test_reconnect_after_restart_resyncs():
+    before = EventHub()
+    for i in range(3):
+        before.publish("checkin", {"id": i})
+    last_seen = before._seq
+
+    time.sleep(0.01)  # A restart takes longer than publishing a few events
+    restarted = EventHub()
+    # Nothing published since the restart, and ids at or above the new hub's
+    assert queued(restarted.subscribe(last_seen)) == [(RESYNC, {})]
+    assert queued(restarted.subscribe(restarted._seq + 5)) == [(RESYNC, {})]
+    restarted.publish("checkin", {"id": 9})
+    assert queued(restarted.subscribe(last_seen)) == [(RESYNC, {})]
+
+def test_dashboard_stream_resyncs_a_client_from_before_a_restart(make_app):
+    make_app()
+    import app as gate_app
+    gate_app.event_hub.publish("checkin", {"id": 1})
+    last_seen = gate_app.event_hub._seq
+
+    client = make_app().test_client()
+    response = client.get('/dashboard/stream', headers={'Last-Event-ID': str(last_seen)}, buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks) == b"retry: 3000\n\n"
+    assert b"event: resync" in next(chunks)
+    response.close()
@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+
+from checkin import atomic_checkin
+from export_attendees import COLUMNS, iter_export
+
+
+def test_export_csv(app, client, seed):
+    first, second, third = seed(app)
+    with app.app_context():
+        atomic_checkin(second, "B-2", gate="north")
+
+    response = client.get('/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=attendance-all.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert tuple(rows[0]) == COLUMNS
+    assert [(int(r["id"]), r["entry"], r["band_id"], r["gate"]) for r in rows] == \
+        [(first, "False", "", ""), (second, "True", "B-2", "north"), (third, "False", "", "")]
+    assert rows[1]["email"] == "a1@example.com" and rows[1]["institute"] == "Institute 1"
+    assert rows[1]["checked_in_at"] and not rows[0]["checked_in_at"]
+
+def test_export_jsonl_filters(app, client, seed):
+    first, second, third = seed(app)
+    with app.app_context():
+        atomic_checkin(first, "B-1", gate="main")
+        atomic_checkin(second, "B-2", gate="main")
+
+    def export(query):
+        response = client.get(f'/export?format=jsonl&{query}')
+        assert response.mimetype == 'application/x-ndjson'
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    present = export('status=present')
+    assert [(r["id"], r["entry"], r["band_id"]) for r in present] == [(first, True, "B-1"), (second, True, "B-2")]
+    assert [r["id"] for r in export('status=absent')] == [third]
+    assert [r["id"] for r in export('institute=Institute+0')] == [first, third]
+    assert [r["id"] for r in export('status=present&institute=Institute+0')] == [first]
+    assert client.get('/export?format=xml').status_code == 400
+    assert client.get('/export?status=maybe').status_code == 400
+
+def test_iter_export_chunks_rows():
+    records = [dict.fromkeys(COLUMNS, i) for i in range(5)]
+    chunks = list(iter_export(records, 'jsonl', chunk_rows=2))
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
+    csv_chunks = list(iter_export(records, 'csv', chunk_rows=2))
+    # The header goes out with the first chunk
+    assert [chunk.count("\n") for chunk in csv_chunks] == [3, 2, 1]
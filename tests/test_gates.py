@@ -0,0 +1,58 @@
+import sys
+import threading
+
+import pytest
+
+import app as gate_app
+from gates import SQLiteStateStore, INITIAL_STATE, make_state_store
+
+
+def test_sqlite_store_updates_and_versions(make_app, tmp_path):
+    path = tmp_path / "gates.db"
+    make_app(GATE_STATE_STORE=f"sqlite:///{path}")
+    gate = gate_app.get_gate("main")
+    assert isinstance(gate.store, SQLiteStateStore)
+    assert gate.store.get("main") == INITIAL_STATE
+
+    state = gate.update(waiting_for_barcode=True, current_attendee_id=7, last_qr_time=12.5)
+    assert state == (True, 7, 12.5, 1)
+    # Another worker process opens the same file and sees the same state
+    other = SQLiteStateStore(str(path))
+    assert other.get("main") == state
+    assert other.update("main", last_qr_time=13.0) == (True, 7, 13.0, 2)
+    assert other.get("side") == INITIAL_STATE
+
+    gate.reset()
+    assert gate.store.get("main") == (False, None, 0.0, 3)
+
+def test_sqlite_store_does_not_lose_concurrent_updates(tmp_path):
+    path = str(tmp_path / "gates.db")
+    stores = [SQLiteStateStore(path) for _ in range(4)]
+
+    def bump(store):
+        for _ in range(25):
+            store.update("main", last_qr_time=1.0)
+    threads = [threading.Thread(target=bump, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stores[0].get("main").version == 100
+
+def test_sqlite_store_wait_for_change(tmp_path):
+    path = str(tmp_path / "gates.db")
+    store, other = SQLiteStateStore(path, poll_interval=0.01), SQLiteStateStore(path)
+    version = store.get("main").version
+    assert store.wait_for_change("main", version, 0.05).version == version
+
+    timer = threading.Timer(0.05, other.update, args=("main",), kwargs={"waiting_for_barcode": True})
+    timer.start()
+    state = store.wait_for_change("main", version, 5.0)
+    timer.join()
+    assert (state.waiting_for_barcode, state.version) == (True, version + 1)
+
+def test_redis_store_without_the_redis_package(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    with pytest.raises(ImportError, match=r"GATE_STATE_STORE=redis://\.\.\. needs the optional redis package") as e:
+        make_state_store("redis://:secret@cache:6379/0")
+    assert "secret" not in str(e.value)
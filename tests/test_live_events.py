@@ -0,0 +1,36 @@
+import app as gate_app
+from checkin import atomic_checkin
+
+
+def test_dashboard_worker_sees_checkins_made_by_another_process(make_app, seed):
+    app = make_app('dashboard,api', CHECKIN_POLL_INTERVAL=3600)
+    assert app.config['LIVE_EVENTS'] == 'db'
+    first, second, _ = seed(app)
+    with app.app_context():
+        stats = gate_app.get_attendance_stats()
+        subscription = gate_app.event_hub.subscribe()
+
+        # As a scanner worker would: commit the check-in, nothing in this process's memory
+        atomic_checkin(first, "B-1", gate="north")
+        atomic_checkin(second, "B-2", gate="south")
+        assert stats.snapshot()["present"] == 0
+
+        assert gate_app.poll_checkins() == 2
+        assert gate_app.poll_checkins() == 0
+    snapshot = stats.snapshot()
+    assert (snapshot["present"], snapshot["absent"]) == (2, 1)
+    assert snapshot["by_gate"] == {"north": 1, "south": 1}
+    assert snapshot["checkins_this_minute"] == 2
+    events = [subscription.queue.get_nowait() for _ in range(2)]
+    assert [(event_type, data["id"], data["band_id"], data["gate"]) for _, event_type, data in events] == \
+        [("checkin", first, "B-1", "north"), ("checkin", second, "B-2", "south")]
+
+def test_scanner_worker_counts_its_own_checkins(make_app, seed):
+    app = make_app()
+    assert app.config['LIVE_EVENTS'] == 'local'
+    attendee_id = seed(app)[0]
+    with app.app_context():
+        stats = gate_app.get_attendance_stats()
+        atomic_checkin(attendee_id, "B-1", gate="main")
+        gate_app.record_checkin(gate_app.get_attendee(attendee_id), "main")
+    assert stats.snapshot()["present"] == 1
@@ -0,0 +1,38 @@
+import threading
+import time
+
+import numpy as np
+
+from pipeline import ScanPipeline
+
+
+class SlowCamera:
+    """Camera whose read() takes a while and records how many threads were inside it at once"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reading = 0
+        self.max_reading = 0
+
+    def read(self):
+        with self._lock:
+            self.reading += 1
+            self.max_reading = max(self.max_reading, self.reading)
+        time.sleep(0.05)
+        with self._lock:
+            self.reading -= 1
+        return True, np.zeros((48, 64, 3), np.uint8)
+
+def test_restart_waits_for_the_old_capture_thread():
+    camera = SlowCamera()
+    pipeline = ScanPipeline(camera, analyze=lambda frame: None, render=lambda frame: frame)
+    for _ in range(5):
+        pipeline.attach()
+        time.sleep(0.02)
+        pipeline.detach()  # stops without waiting; the next attach() must wait instead
+    pipeline.attach()
+    time.sleep(0.1)
+    pipeline.detach()
+    pipeline.stop(wait=True)
+    assert camera.max_reading == 1
+    assert not any(t.name in ("frame-capture", "frame-encode") for t in threading.enumerate())
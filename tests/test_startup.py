@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+from models import db, Attendee, CheckinEvent
+from conftest import ROOT
+
+
+def test_create_app_on_fresh_and_existing_database(make_app):
+    # First run creates the tables and indexes, the second re-opens them
+    for _ in range(2):
+        app = make_app()
+        with app.app_context():
+            assert db.session.query(Attendee).count() == 0
+            assert db.session.query(CheckinEvent).count() == 0
+
+def test_roles_register_only_their_routes(make_app):
+    app = make_app('dashboard,api')
+    assert {'dashboard', 'dashboard_stream', 'api_checkins', 'export', 'metrics_endpoint'} <= set(app.view_functions)
+    assert 'video_feed' not in app.view_functions and 'index' not in app.view_functions
+    assert make_app('scanner').view_functions.keys() >= {'index', 'video_feed', 'attach_barcode_manual'}
+
+def test_dashboard_worker_does_not_load_the_vision_stack(tmp_path):
+    env = dict(os.environ, APP_ROLES='dashboard,api', DATABASE_URI=f"sqlite:///{tmp_path / 'roles.db'}")
+    code = "import sys, app; assert not {'cv2', 'numpy', 'vision'} & set(sys.modules), sorted(sys.modules)"
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True)
+
+def test_create_app_on_in_memory_sqlite(make_app):
+    app = make_app(SQLALCHEMY_DATABASE_URI='sqlite://')
+    assert 'pool_size' not in app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    with app.app_context():
+        assert db.session.query(Attendee).count() == 0
+
+def test_default_config_on_in_memory_sqlite(tmp_path):
+    # SQLALCHEMY_ENGINE_OPTIONS is derived from DATABASE_URI when config is imported
+    env = dict(os.environ, DATABASE_URI='sqlite://')
+    code = "import app; from models import Attendee\nwith app.app.app_context(): assert Attendee.query.count() == 0"
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True)
@@ -0,0 +1,53 @@
+import time
+
+import app as gate_app
+from checkin import atomic_checkin
+
+
+def test_stats_load_and_incremental_counts_agree(app, client, seed):
+    first, second, third, fourth = seed(app, 4)
+    with app.app_context():
+        atomic_checkin(first, "B-1", gate="north")
+        atomic_checkin(second, "B-2", gate="south")
+
+    stats = client.get('/api/stats').get_json()
+    assert (stats["total"], stats["present"], stats["absent"]) == (4, 2, 2)
+    assert stats["by_institute"] == {"Institute 0": {"registered": 2, "present": 1},
+                                     "Institute 1": {"registered": 2, "present": 1}}
+    assert stats["by_gate"] == {"north": 1, "south": 1}
+    assert stats["peak_per_minute"] == 2
+
+    client.post('/api/checkins', json=[{"qr_payload": f"ID:{third}", "band_id": "B-3"}])
+    incremental = client.get('/api/stats').get_json()
+    assert (incremental["present"], incremental["absent"]) == (3, 1)
+    assert incremental["by_institute"]["Institute 0"] == {"registered": 2, "present": 2}
+    assert incremental["by_gate"] == {"north": 1, "south": 1, "api": 1}
+
+    reloaded = client.post('/api/stats/reload').get_json()
+    for key in ("total", "present", "absent", "by_institute", "by_gate", "peak_per_minute"):
+        assert reloaded[key] == incremental[key], key
+
+def test_stats_per_minute_window_and_reverts(app):
+    with app.app_context():
+        stats = gate_app.get_attendance_stats()
+    if time.time() % 60 > 55:
+        time.sleep(60 - time.time() % 60)  # Keep the snapshots in the same minute as now
+    now = time.time()
+    for _ in range(3):
+        stats.record_checkin("Institute 0", "main", at=now - 120)
+    stats.record_checkin("Institute 1", "main", at=now)
+    # Older than the window: counted as present, not per minute
+    stats.record_checkin("Institute 1", "main", at=now - 3600 * 2)
+
+    snapshot = stats.snapshot()
+    assert snapshot["present"] == 5 and snapshot["by_gate"] == {"main": 5}
+    assert snapshot["per_minute"][-3:] == [3, 0, 1]
+    assert sum(snapshot["per_minute"]) == 4
+    assert (snapshot["checkins_this_minute"], snapshot["checkins_last_minute"]) == (1, 0)
+    assert snapshot["peak_per_minute"] == 3
+    assert snapshot["rate_5m"] == 3 / 5
+
+    stats.record_reverted("Institute 1", "main", at=now)
+    snapshot = stats.snapshot()
+    assert (snapshot["present"], snapshot["checkins_this_minute"]) == (4, 0)
+    assert snapshot["by_institute"]["Institute 1"]["present"] == 1
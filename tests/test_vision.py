@@ -0,0 +1,133 @@
+import threading
+
+import cv2
+import numpy as np
+
+import bench_qr
+import vision
+
+
+def _gray(frame):
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+def test_motion_gate_sees_a_small_code_held_up():
+    rng = np.random.RandomState(0)
+    lobby = bench_qr.make_background(rng)
+    with_code = lobby.copy()
+    with_code[300:400, 400:500] = cv2.cvtColor(bench_qr.render_qr("ID:7", 100), cv2.COLOR_GRAY2BGR)
+
+    tracker = vision.DetectionTracker(motion_threshold=3.0)
+    tracker.record_failure(tracker.thumbnail(_gray(lobby)))
+    thumb = tracker.thumbnail(_gray(with_code))
+    # The whole-thumbnail mean barely moves; the tile the code is in does
+    assert cv2.absdiff(thumb, tracker.thumbnail(_gray(lobby))).mean() < 3.0
+    assert not tracker.scene_unchanged(thumb)
+
+def test_motion_gate_skips_an_unchanged_scene_but_not_forever():
+    lobby = _gray(bench_qr.make_background(np.random.RandomState(1)))
+    tracker = vision.DetectionTracker(motion_threshold=3.0, max_skipped=3)
+    thumb = tracker.thumbnail(lobby)
+    tracker.record_failure(thumb)
+    assert [tracker.scene_unchanged(thumb) for _ in range(8)] == [True, True, True, False,
+                                                                   True, True, True, False]
+
+def _qr_frame(payload="ID:7"):
+    return cv2.cvtColor(cv2.copyMakeBorder(bench_qr.render_qr(payload, 120), 20, 20, 20, 20,
+                                           cv2.BORDER_CONSTANT, value=255), cv2.COLOR_GRAY2BGR)
+
+def _counting_stages(works):
+    """Stages that pass the frame through when works[name] is set and blank it otherwise, counting calls"""
+    calls = dict.fromkeys(works, 0)
+
+    def stage(name):
+        def run(frame, cache):
+            calls[name] += 1
+            return frame if works[name] else np.full_like(frame, 255)
+        return name, run
+    return [stage(name) for name in works], calls
+
+def test_adaptive_order_prunes_a_failing_stage_and_re_explores_it(monkeypatch):
+    works = {"works": True, "never": False}
+    stages, calls = _counting_stages(works)
+    order = vision.AdaptiveStageOrder(stages, explore_every=25, decay=0.95, prune_after=200, prune_rate=0.01)
+    monkeypatch.setattr(vision, "stage_order", order)
+    # As the gate runs it: every other frame is a false-positive candidate on
+    # which no stage decodes, so the whole cascade runs on it
+    frames = [_qr_frame(), np.full((160, 160, 3), 255, dtype=np.uint8)] * 100
+
+    decoded = [vision.detect_qr_code_opencv(frame, adaptive=True)[0] for frame in frames]
+    assert decoded == ["ID:7", None] * 100
+    # Pruned after a few blank frames, then only tried on exploration frames
+    assert calls["never"] < 40
+    assert [(stage["stage"], stage["pruned"]) for stage in order.snapshot()["stages"]] == \
+        [("works", False), ("never", True)]
+
+    # Conditions change: the pruned stage is the only one that decodes now. An
+    # exploration frame re-admits it, after which every code decodes again
+    works.update(works=False, never=True)
+    decoded = [vision.detect_qr_code_opencv(frame, adaptive=True)[0] for frame in frames]
+    assert decoded[26:] == ["ID:7", None] * 87
+    assert order.snapshot()["stages"][0]["stage"] == "never"
+
+def test_adaptive_order_keeps_a_stage_when_nothing_decodes(monkeypatch):
+    stages, calls = _counting_stages({"first": False, "second": False})
+    order = vision.AdaptiveStageOrder(stages, explore_every=25, decay=0.95, prune_after=200, prune_rate=0.01)
+    monkeypatch.setattr(vision, "stage_order", order)
+    blank = np.full((160, 160, 3), 255, dtype=np.uint8)
+    for _ in range(100):
+        before = sum(calls.values())
+        assert vision.detect_qr_code_opencv(blank, adaptive=True) == (None, None)
+        assert sum(calls.values()) > before
+
+def test_each_thread_gets_its_own_qr_decoder():
+    decoders = []
+    threads = [threading.Thread(target=lambda: decoders.append(vision.qr_decoder())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert vision.qr_decoder() is vision.qr_decoder()
+    assert len({id(decoder) for decoder in decoders + [vision.qr_decoder()]}) == 4
+
+def _lobby_with_code(x, y, payload="ID:7"):
+    frame = np.full((480, 640, 3), 255, dtype=np.uint8)
+    frame[y:y + 120, x:x + 120] = cv2.cvtColor(bench_qr.render_qr(payload, 120), cv2.COLOR_GRAY2BGR)
+    return frame
+
+def _count_cascades(monkeypatch):
+    """Record the shape of every frame or crop the decode cascade runs on"""
+    shapes = []
+    decode = vision._decode_qr
+
+    def counting(frame, cache):
+        shapes.append(frame.shape[:2])
+        return decode(frame, cache)
+    monkeypatch.setattr(vision, "_decode_qr", counting)
+    return shapes
+
+def test_roi_replaces_the_full_frame_until_it_expires(monkeypatch):
+    shapes = _count_cascades(monkeypatch)
+    tracker = vision.DetectionTracker(roi_ttl=3)
+
+    def detect(frame):
+        return vision.detect_qr_code(frame, localize='off', tracker=tracker, motion_gate=False,
+                                     roi_tracking=True, pyramid_levels=0)[0]
+
+    assert detect(_lobby_with_code(40, 40)) == "ID:7"
+    assert detect(_lobby_with_code(50, 45)) == "ID:7"      # Found again in the crop
+    # The code moves out of the crop: only the crop is decoded until the ROI expires
+    moved = _lobby_with_code(480, 320)
+    assert [detect(moved) for _ in range(4)] == [None, None, None, "ID:7"]
+    assert [shape == (480, 640) for shape in shapes] == [True, False, False, False, False, True]
+
+def test_undecoded_candidates_do_not_start_an_roi(monkeypatch):
+    shapes = _count_cascades(monkeypatch)
+    candidate = np.array([[[100, 100], [200, 100], [200, 200], [100, 200]]], dtype=np.float32)
+    monkeypatch.setattr(vision, "localize_qr_code", lambda *args: candidate)
+    tracker = vision.DetectionTracker()
+    blank = np.full((480, 640, 3), 255, dtype=np.uint8)
+    for _ in range(3):
+        assert vision.detect_qr_code(blank, localize='finder', tracker=tracker, motion_gate=False,
+                                     roi_tracking=True, pyramid_levels=0)[0] is None
+    assert shapes == [(480, 640)] * 3
+    assert tracker.next_roi() is None
@@ -0,0 +1,605 @@
+"""
+QR detection stack for the scanner.
+
+Everything that needs OpenCV, numpy or pyzbar lives here: the preprocessing
+stages and decode cascade, the localize gate, motion gating and ROI
+tracking, and the overlays drawn on the video feed. app.py imports this
+module on the first video stream (see app.get_vision), so dashboard and API
+workers never load the vision libraries.
+
+Detection settings are the QR_* values of config.Config, overridden with
+configure(app.config).
+"""
+import logging
+import random
+import threading
+
+import cv2
+import numpy as np
+
+from config import Config
+import metrics
+
+# --- GLOBAL VARIABLES ---
+PYZBAR_AVAILABLE = False
+
+# Try to import pyzbar, but don't fail if it's not available
+try:
+    from pyzbar import pyzbar
+    PYZBAR_AVAILABLE = True
+    logging.info("pyzbar library loaded successfully")
+except ImportError as e:
+    PYZBAR_AVAILABLE = False
+    logging.warning(f"pyzbar not available: {e}. Using OpenCV only for QR detection.")
+
+# --- SETTINGS ---
+# QR_* detection settings, read on every call so they can be changed at runtime
+settings = {key: getattr(Config, key) for key in dir(Config) if key.startswith('QR_')}
+
+# --- QR CODE DETECTORS ---
+# QRCodeDetector objects are not thread-safe, and detection runs on several
+# pipeline workers and gates at once: each thread gets its own detector
+_local = threading.local()
+
+def qr_decoder():
+    """The calling thread's cv2.QRCodeDetector, created on first use"""
+    decoder = getattr(_local, 'decoder', None)
+    if decoder is None:
+        decoder = _local.decoder = cv2.QRCodeDetector()
+    return decoder
+
+FINDER_MIN_AREA = 16  # Smallest finder pattern (in pixels) accepted by the localize gate
+
+# --- PREPROCESSING STAGES ---
+# Each stage takes the original frame plus a per-frame cache dict, so that
+# shared intermediates (grayscale, blurred) are computed at most once.
+def _gray(frame, cache):
+    """Return the grayscale version of the frame, computed once per frame"""
+    gray = cache.get('gray')
+    if gray is None:
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        cache['gray'] = gray
+    return gray
+
+def _blurred(frame, cache):
+    """Return the lightly blurred grayscale frame used by the threshold stages"""
+    blurred = cache.get('blurred')
+    if blurred is None:
+        blurred = cv2.GaussianBlur(_gray(frame, cache), (3, 3), 0)
+        cache['blurred'] = blurred
+    return blurred
+
+def _pyramid_gray(frame, cache, levels):
+    """Return the grayscale frame downscaled 2**levels times, each level computed once"""
+    key = f'pyr{levels}'
+    scaled = cache.get(key)
+    if scaled is None:
+        scaled = _gray(frame, cache) if levels <= 0 else cv2.pyrDown(_pyramid_gray(frame, cache, levels - 1))
+        cache[key] = scaled
+    return scaled
+
+def _stage_raw(frame, cache):
+    return frame
+
+def _stage_gray(frame, cache):
+    return _gray(frame, cache)
+
+def _stage_thresh_gaussian(frame, cache):
+    return cv2.adaptiveThreshold(_blurred(frame, cache), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+
+def _stage_thresh_mean(frame, cache):
+    return cv2.adaptiveThreshold(_blurred(frame, cache), 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 15, 4)
+
+def _stage_thresh_otsu(frame, cache):
+    return cv2.threshold(_blurred(frame, cache), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+def _stage_morph_close(frame, cache):
+    kernel = np.ones((3, 3), np.uint8)
+    return cv2.morphologyEx(_gray(frame, cache), cv2.MORPH_CLOSE, kernel)
+
+def _make_contrast_stage(alpha, beta):
+    def _stage_contrast(frame, cache):
+        return cv2.convertScaleAbs(_gray(frame, cache), alpha=alpha, beta=beta)
+    return _stage_contrast
+
+# Cascade order used by detect_qr_code_opencv: (stage name, stage function)
+OPENCV_STAGES = [
+    ("raw", _stage_raw),
+    ("gray", _stage_gray),
+    ("thresh_gaussian", _stage_thresh_gaussian),
+    ("thresh_mean", _stage_thresh_mean),
+    ("thresh_otsu", _stage_thresh_otsu),
+    ("morph_close", _stage_morph_close),
+] + [
+    (f"contrast_{alpha}_{beta}", _make_contrast_stage(alpha, beta))
+    for alpha in [0.7, 1.3, 1.5]  # contrast
+    for beta in [-20, 0, 20, 40]  # brightness
+]
+
+def run_opencv_cascade(frame, stages=None, cache=None):
+    """
+    Run detectAndDecode over the preprocessing stages in order
+    Returns the decoded data, bbox and the name of the stage that succeeded
+    """
+    stages = OPENCV_STAGES if stages is None else stages
+    cache = {} if cache is None else cache
+    for name, stage in stages:
+        with metrics.DETECT_STAGE_SECONDS.time(stage=name):
+            data, bbox, _ = qr_decoder().detectAndDecode(stage(frame, cache))
+        if data and bbox is not None:
+            return data, bbox, name
+    return None, None, None
+
+class AdaptiveStageOrder:
+    """
+    Keeps decayed per-stage attempt/success counts for the OpenCV cascade and
+    derives the stage order from them: stages that decode most often under the
+    current lighting go first, stages that never succeed are pruned. Every
+    explore_every-th frame runs all stages in a shuffled order so that pruned
+    or low-ranked stages can earn their place back when conditions change.
+    A stage's counts only decay when it is tried, so a pruned stage stays
+    pruned until an exploration frame sees it decode; the top-ranked stage is
+    never pruned, so some stage always runs.
+    """
+
+    def __init__(self, stages, explore_every=25, decay=0.995, prune_after=200, prune_rate=0.01):
+        self.stages = list(stages)
+        self.explore_every = explore_every
+        self.decay = decay
+        self.prune_after = prune_after
+        self.prune_rate = prune_rate
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all learned statistics and return to the default order"""
+        with self._lock:
+            self._attempts = {name: 0.0 for name, _ in self.stages}
+            self._successes = {name: 0.0 for name, _ in self.stages}
+            self._runs = 0
+
+    def _rate(self, name):
+        attempts = self._attempts[name]
+        return self._successes[name] / attempts if attempts else None
+
+    def _prune_threshold(self):
+        # Decayed attempt counts level off at 1 / (1 - decay), so prune_after
+        # is capped at half of that or pruning could never fire
+        if self.decay >= 1.0:
+            return self.prune_after
+        return min(self.prune_after, 0.5 / (1.0 - self.decay))
+
+    def _is_pruned(self, name):
+        rate = self._rate(name)
+        return self._attempts[name] >= self._prune_threshold() and rate is not None and rate < self.prune_rate
+
+    def _kept(self, ranked):
+        """The ranked stages minus the pruned ones; the top-ranked stage is always kept"""
+        return ranked[:1] + [s for s in ranked[1:] if not self._is_pruned(s[0])]
+
+    def _ranked(self):
+        default_index = {name: i for i, (name, _) in enumerate(self.stages)}
+        # Untried stages rank as if they always succeed so they get tried at least once
+        return sorted(self.stages, key=lambda s: (-(self._rate(s[0]) if self._rate(s[0]) is not None else 1.0),
+                                                  default_index[s[0]]))
+
+    def order(self):
+        """Return the (name, stage) list to run on the next frame"""
+        with self._lock:
+            self._runs += 1
+            if self._runs % self.explore_every == 0:
+                stages = list(self.stages)
+                random.shuffle(stages)
+                return stages
+            return self._kept(self._ranked())
+
+    def record(self, tried, winner):
+        """Record the stage names that were tried on a frame and the one that decoded (or None)"""
+        with self._lock:
+            for name in tried:
+                self._attempts[name] = self._attempts[name] * self.decay + 1
+                self._successes[name] *= self.decay
+            if winner:
+                self._successes[winner] += 1
+
+    def snapshot(self):
+        """Return the learned order and per-stage statistics for display"""
+        with self._lock:
+            stats = []
+            ranked = self._ranked()
+            kept = {name for name, _ in self._kept(ranked)}
+            for rank, (name, _) in enumerate(ranked):
+                rate = self._rate(name)
+                stats.append({
+                    "rank": rank,
+                    "stage": name,
+                    "attempts": round(self._attempts[name], 2),
+                    "successes": round(self._successes[name], 2),
+                    "success_rate": round(rate, 4) if rate is not None else None,
+                    "pruned": name not in kept,
+                })
+            return {"runs": self._runs, "explore_every": self.explore_every, "stages": stats}
+
+stage_order = AdaptiveStageOrder(
+    OPENCV_STAGES,
+    explore_every=settings['QR_ADAPTIVE_EXPLORE_EVERY'],
+    decay=settings['QR_ADAPTIVE_DECAY'],
+    prune_after=settings['QR_ADAPTIVE_PRUNE_AFTER'],
+    prune_rate=settings['QR_ADAPTIVE_PRUNE_RATE'],
+)
+
+def detect_qr_code_opencv(frame, cache=None, adaptive=None):
+    """Detect QR codes using OpenCV with multiple preprocessing methods"""
+    adaptive = settings['QR_ADAPTIVE_ORDER'] if adaptive is None else adaptive
+    try:
+        if adaptive:
+            stages = stage_order.order()
+            data, bbox, winner = run_opencv_cascade(frame, stages, cache)
+            names = [name for name, _ in stages]
+            tried = names[:names.index(winner) + 1] if winner else names
+            stage_order.record(tried, winner)
+        else:
+            data, bbox, _ = run_opencv_cascade(frame, cache=cache)
+        if data and bbox is not None:
+            return data, bbox
+    except Exception as e:
+        logging.error(f"Error in OpenCV QR detection: {e}")
+        
+    return None, None
+
+def detect_qr_code_pyzbar(frame, cache=None):
+    """Detect QR codes using pyzbar library as fallback"""
+    global PYZBAR_AVAILABLE
+    
+    if not PYZBAR_AVAILABLE:
+        return None, None
+        
+    try:
+        # Convert to grayscale for pyzbar (reuses the cascade's conversion if cached)
+        gray_frame = _gray(frame, {} if cache is None else cache)
+        
+        # Try pyzbar detection
+        qr_codes = pyzbar.decode(gray_frame)
+        if qr_codes:
+            # Return the first QR code found
+            qr_code = qr_codes[0]
+            data = qr_code.data.decode('utf-8')
+            # Convert pyzbar rect to OpenCV bbox format
+            rect = qr_code.rect
+            bbox = np.array([[[rect.left, rect.top],
+                            [rect.left + rect.width, rect.top],
+                            [rect.left + rect.width, rect.top + rect.height],
+                            [rect.left, rect.top + rect.height]]], dtype=np.float32)
+            return data, bbox
+            
+        # Try with preprocessing for pyzbar
+        blurred = cv2.GaussianBlur(gray_frame, (3, 3), 0)
+        qr_codes = pyzbar.decode(blurred)
+        if qr_codes:
+            qr_code = qr_codes[0]
+            data = qr_code.data.decode('utf-8')
+            rect = qr_code.rect
+            bbox = np.array([[[rect.left, rect.top],
+                            [rect.left + rect.width, rect.top],
+                            [rect.left + rect.width, rect.top + rect.height],
+                            [rect.left, rect.top + rect.height]]], dtype=np.float32)
+            return data, bbox
+            
+    except Exception as e:
+        logging.error(f"Error in pyzbar QR detection: {e}")
+        
+    return None, None
+
+# --- LOCALIZATION GATE ---
+def find_finder_patterns(gray):
+    """
+    Find QR finder-pattern candidates (a dark square ring around a dark center)
+    Returns a list of contours, one per candidate pattern
+    """
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    contours, hierarchy = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+
+    hierarchy = hierarchy[0]
+    patterns = []
+    for i, contour in enumerate(contours):
+        # A finder pattern is a contour with at least two levels of nesting
+        child = hierarchy[i][2]
+        if child < 0 or hierarchy[child][2] < 0:
+            continue
+        area = cv2.contourArea(contour)
+        if area < FINDER_MIN_AREA:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        if not 0.5 < w / float(h) < 2.0:
+            continue
+        # The nested contour of a real pattern covers a sizeable part of the outer one
+        inner_area = cv2.contourArea(contours[hierarchy[child][2]])
+        if inner_area < area * 0.04:
+            continue
+        patterns.append(contour)
+    return patterns
+
+def localize_qr_code(frame, cache=None, mode=None, levels=0):
+    """
+    Cheap check for something QR-like in the frame, run before any decoding
+    With levels > 0 the search runs on the grayscale frame downscaled 2**levels times
+    Returns a candidate bbox in full-frame coordinates (same format as detectAndDecode) or None
+    """
+    mode = settings['QR_LOCALIZE_MODE'] if mode is None else mode
+    cache = {} if cache is None else cache
+    gray = _pyramid_gray(frame, cache, levels)
+    scale = float(2 ** levels)
+
+    if mode == 'detect':
+        found, points = qr_decoder().detect(gray)
+        return points * scale if found and points is not None else None
+
+    patterns = find_finder_patterns(gray)
+    if len(patterns) < settings['QR_FINDER_MIN_PATTERNS']:
+        return None
+    x, y, w, h = cv2.boundingRect(np.vstack(patterns))
+    return np.array([[[x, y], [x + w, y], [x + w, y + h], [x, y + h]]], dtype=np.float32) * scale
+
+def roi_around(bbox, frame_shape, margin):
+    """Return the (x0, y0, x1, y1) region around bbox grown by margin on each side, clipped to the frame"""
+    x, y, w, h = cv2.boundingRect(bbox.reshape(-1, 2).astype(np.float32))
+    mx, my = int(w * margin), int(h * margin)
+    frame_h, frame_w = frame_shape[:2]
+    x0, y0 = max(0, x - mx), max(0, y - my)
+    x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+    if x1 - x0 < 16 or y1 - y0 < 16:
+        return None
+    return x0, y0, x1, y1
+
+# --- MOTION GATING AND ROI TRACKING ---
+class DetectionTracker:
+    """
+    Frame-to-frame memory for detect_qr_code:
+    - motion gating: a small thumbnail of the last frame that failed to decode,
+      so an unchanged scene is not decoded again. The thumbnails are compared
+      tile by tile (the most-changed tile decides), so a small code held up in
+      one corner counts as a change, and every max_skipped-th skipped frame is
+      decoded anyway
+    - ROI tracking: the region around the last decoded code, so the next
+      roi_ttl frames are decoded on that crop instead of the full frame
+      (decoding there refreshes it; candidates that did not decode do not)
+    """
+
+    def __init__(self, motion_threshold=3.0, roi_margin=0.5, roi_ttl=15, thumb_size=(80, 60),
+                 tile_grid=(8, 6), max_skipped=10):
+        self.motion_threshold = motion_threshold
+        self.roi_margin = roi_margin
+        self.roi_ttl = roi_ttl
+        self.thumb_size = thumb_size
+        self.tile_grid = tile_grid
+        self.max_skipped = max_skipped
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._failed_thumb = None
+            self._skipped = 0
+            self._roi = None
+            self._roi_frames_left = 0
+
+    def thumbnail(self, gray):
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA)
+
+    def tile_difference(self, thumb, other):
+        """Largest mean abs difference over the tiles of two thumbnails"""
+        # INTER_AREA averages each tile_grid cell, giving the per-tile mean in one call
+        tiles = cv2.resize(cv2.absdiff(thumb, other), self.tile_grid, interpolation=cv2.INTER_AREA)
+        return float(tiles.max())
+
+    def scene_unchanged(self, thumb):
+        """True if thumb matches the last frame that failed to decode and the frame may be skipped"""
+        with self._lock:
+            failed_thumb = self._failed_thumb
+            if failed_thumb is None or self._skipped >= self.max_skipped:
+                self._skipped = 0
+                return False
+        if self.tile_difference(thumb, failed_thumb) >= self.motion_threshold:
+            return False
+        with self._lock:
+            self._skipped += 1
+        return True
+
+    def record_failure(self, thumb):
+        with self._lock:
+            self._failed_thumb = thumb
+            self._skipped = 0
+
+    def record_success(self):
+        with self._lock:
+            self._failed_thumb = None
+
+    def track(self, bbox, frame_shape):
+        """Remember the region around bbox (frame coordinates) for the next roi_ttl frames"""
+        roi = roi_around(bbox, frame_shape, self.roi_margin)
+        with self._lock:
+            self._roi = roi
+            self._roi_frames_left = self.roi_ttl if roi is not None else 0
+
+    def next_roi(self):
+        """Return the tracked (x0, y0, x1, y1) region for this frame, or None once it has expired"""
+        with self._lock:
+            if self._roi is None or self._roi_frames_left <= 0:
+                self._roi = None
+                return None
+            self._roi_frames_left -= 1
+            return self._roi
+
+def _decode_qr(frame, cache):
+    """Run the decode cascade (OpenCV, then pyzbar) on a frame; returns data, bbox"""
+    # Try OpenCV first (faster)
+    data, bbox = detect_qr_code_opencv(frame, cache)
+    if data and bbox is not None:
+        logging.info(f"QR Code detected (OpenCV): '{data}'")
+        return data, bbox
+    
+    # Try pyzbar as fallback if available
+    if PYZBAR_AVAILABLE:
+        with metrics.DETECT_STAGE_SECONDS.time(stage="pyzbar"):
+            data, bbox = detect_qr_code_pyzbar(frame, cache)
+        if data and bbox is not None:
+            logging.info(f"QR Code detected (pyzbar): '{data}'")
+            return data, bbox
+        
+    return None, None
+
+def _decode_roi(frame, cache, roi):
+    """Decode only the (x0, y0, x1, y1) crop of frame; bbox is returned in frame coordinates"""
+    x0, y0, x1, y1 = roi
+    crop_cache = {'gray': _gray(frame, cache)[y0:y1, x0:x1]}
+    data, bbox = _decode_qr(frame[y0:y1, x0:x1], crop_cache)
+    if data and bbox is not None:
+        bbox = bbox + np.array([x0, y0], dtype=np.float32)
+    return data, bbox
+
+def detect_qr_code(frame, localize=None, tracker=None, motion_gate=None, roi_tracking=None,
+                   pyramid_levels=None):
+    """
+    Comprehensive QR code detection using multiple methods
+    Returns the decoded data, bbox, and processed frame
+    When a localize mode is active ('finder' or 'detect'), the decode cascade
+    only runs if a QR-like candidate is found in the frame
+    With pyramid_levels > 0, candidates are located on a 2x/4x downscaled
+    grayscale frame and only the candidate crop is decoded at full resolution
+    With a DetectionTracker, motion gating skips frames that look the same as
+    the last failed one, and ROI tracking decodes only a crop around the last
+    decoded code; the full frame is searched again once the ROI expires
+    """
+    global PYZBAR_AVAILABLE
+
+    localize = settings['QR_LOCALIZE_MODE'] if localize is None else localize
+    pyramid_levels = settings['QR_PYRAMID_LEVELS'] if pyramid_levels is None else pyramid_levels
+    motion_gate = settings['QR_MOTION_GATE'] if motion_gate is None else motion_gate
+    roi_tracking = settings['QR_ROI_TRACKING'] if roi_tracking is None else roi_tracking
+    cache = {}
+    thumb = None
+
+    if tracker is not None and motion_gate:
+        with metrics.DETECT_STAGE_SECONDS.time(stage="motion_gate"):
+            thumb = tracker.thumbnail(_pyramid_gray(frame, cache, pyramid_levels))
+            unchanged = tracker.scene_unchanged(thumb)
+        if unchanged:
+            metrics.DETECT_FRAMES.inc(outcome="motion_skipped")
+            return None, None, frame
+
+    if tracker is not None and roi_tracking:
+        roi = tracker.next_roi()
+        if roi is not None:
+            with metrics.DETECT_STAGE_SECONDS.time(stage="roi"):
+                data, bbox = _decode_roi(frame, cache, roi)
+            if data:
+                tracker.track(bbox, frame.shape)
+                tracker.record_success()
+                metrics.DETECT_FRAMES.inc(outcome="roi_decoded")
+                return data, bbox, frame
+            # The crop replaces the full-frame cascade until the ROI expires
+            if thumb is not None:
+                tracker.record_failure(thumb)
+            metrics.DETECT_FRAMES.inc(outcome="roi_not_decoded")
+            return None, None, frame
+
+    candidate = None
+    if localize != 'off':
+        try:
+            with metrics.DETECT_STAGE_SECONDS.time(stage="localize"):
+                candidate = localize_qr_code(frame, cache, localize, pyramid_levels)
+            if candidate is None:
+                if thumb is not None:
+                    tracker.record_failure(thumb)
+                metrics.DETECT_FRAMES.inc(outcome="no_candidate")
+                return None, None, frame
+        except Exception as e:
+            # Never let the gate hide a code; fall through to the full cascade
+            logging.error(f"Error in QR localization: {e}")
+    
+    candidate_roi = None
+    if pyramid_levels > 0 and candidate is not None:
+        candidate_roi = roi_around(candidate, frame.shape, settings['QR_ROI_MARGIN'])
+    if candidate_roi is not None:
+        # Decode only the candidate region, at native resolution
+        data, bbox = _decode_roi(frame, cache, candidate_roi)
+    else:
+        data, bbox = _decode_qr(frame, cache)
+    metrics.DETECT_FRAMES.inc(outcome="decoded" if data else "not_decoded")
+    if tracker is not None:
+        if data:
+            if roi_tracking:
+                tracker.track(bbox, frame.shape)
+            tracker.record_success()
+        elif thumb is not None:
+            tracker.record_failure(thumb)
+    return data, bbox, frame
+
+def draw_qr_detection_box(frame, bbox):
+    """Draw a box around detected QR code"""
+    if bbox is not None:
+        bbox = bbox.astype(int)
+        cv2.polylines(frame, [bbox], True, (0, 255, 0), 3)
+    return frame
+
+def draw_status_overlay(frame, current_info, waiting_for_barcode=False):
+    """Draw the status panel (message, details, status and state indicator) on a frame"""
+    status_colors = {
+        "Info": (255, 200, 0),      # Blue
+        "Success": (0, 255, 0),     # Green
+        "Error": (0, 0, 255),       # Red
+        "Warning": (0, 165, 255)    # Orange
+    }
+    
+    color = status_colors.get(current_info["status"], (255, 255, 255))
+    
+    # Add semi-transparent background for text
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (5, 5), (frame.shape[1] - 5, 120), (0, 0, 0), -1)
+    display_frame = cv2.addWeighted(frame, 0.7, overlay, 0.3, 0)
+    
+    # Draw main message
+    cv2.putText(display_frame, current_info["message"], (10, 35), 
+               cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2)
+    
+    # Draw details if available
+    if current_info.get("details"):
+        cv2.putText(display_frame, current_info["details"], (10, 70), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+    
+    # Add status indicator
+    status_text = f"Status: {current_info['status']}"
+    cv2.putText(display_frame, status_text, (10, 95), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    
+    # Add frame state indicator
+    if waiting_for_barcode:
+        cv2.putText(display_frame, "WAITING FOR BARCODE", (10, 115), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
+    return display_frame
+
+def draw_error_message(frame, message):
+    """Return a copy of frame with an error message in the corner"""
+    display_frame = frame.copy()
+    cv2.putText(display_frame, message, (10, 30),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    return display_frame
+
+def configure(config):
+    """Take the QR_* settings from an app config (or any mapping) and apply them"""
+    settings.update({key: value for key, value in config.items() if key.startswith('QR_')})
+    stage_order.explore_every = settings['QR_ADAPTIVE_EXPLORE_EVERY']
+    stage_order.decay = settings['QR_ADAPTIVE_DECAY']
+    stage_order.prune_after = settings['QR_ADAPTIVE_PRUNE_AFTER']
+    stage_order.prune_rate = settings['QR_ADAPTIVE_PRUNE_RATE']
+
+def make_tracker():
+    """A DetectionTracker with the configured motion gate and ROI settings"""
+    return DetectionTracker(
+        motion_threshold=settings['QR_MOTION_THRESHOLD'],
+        roi_margin=settings['QR_ROI_MARGIN'],
+        roi_ttl=settings['QR_ROI_TTL'],
+        max_skipped=settings['QR_MOTION_MAX_SKIP'],
+    )